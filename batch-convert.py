@@ -9,107 +9,462 @@ Date: 2025-07-23
 Version: 1.0
 """
 
+__version__ = "1.0"
+
 import os
+import io
 import sys
 import argparse
+import contextlib
 import glob
+import hashlib
+import importlib.util
+import multiprocessing
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-import subprocess
+from queue import Empty
 import json
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+
+# load_tool lives in encoding-converter.py, which every tool uses
+if 'encoding_converter' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        'encoding_converter', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encoding-converter.py'))
+    sys.modules['encoding_converter'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['encoding_converter'])
+load_tool = sys.modules['encoding_converter'].load_tool
+
+MANIFEST_FILE = ".conversion-manifest.json"
+
+def file_hash(file_path: str, block_size: int = 1 << 20, open_file: Callable = open) -> str:
+    """Return a content hash of a file, read in blocks (open_file may open e.g. archive members)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open_file(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# A BaseException, so the conversion steps' broad except Exception handlers cannot swallow it
+class FileTimeout(BaseException):
+    """Raised inside a worker when a file exceeds its processing time budget"""
+
+def _raise_file_timeout(signum, frame):
+    raise FileTimeout()
+
+class FileCancelled(BaseException):
+    """Raised inside a worker when the batch is cancelled while a file is being converted"""
+
+# Per-process converter used by pool workers, created once by _init_worker
+_worker_converter = None
+
+def _init_worker(encoding_tool: str, field_tool: str, mapping_file: str, use_cache: bool = True,
+                 hardlink: bool = False, timings: bool = False, references: bool = False,
+                 compress: Optional[str] = None) -> None:
+    """Initialise a pool worker with its own converters and mapping tables"""
+    global _worker_converter
+    _worker_converter = BatchConverter(encoding_tool, field_tool, mapping_file, use_cache, hardlink, timings,
+                                       references, compress)
+
+def _process_file_worker(input_file: str, output_dir: str, asset_type: str,
+                         timeout: float = None) -> Tuple[Dict, str, Dict, Dict]:
+    """Process one file in a pool worker, returning its result, log, new cache entries and stage timings"""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = _worker_converter.process_file_with_timeout(input_file, output_dir, asset_type, timeout)
+        _worker_converter.add_manifest_entry(result)
+    cache_updates = _worker_converter.cache.pop_updates() if _worker_converter.cache else {}
+    return result, log.getvalue(), cache_updates, _worker_converter.timer.pop_stats()
+
+def done_event(result: Dict, seconds: float) -> Dict:
+    """Build the progress event that closes a file"""
+    return {
+        "event": "done",
+        "file": result["input_file"],
+        "success": result["overall_success"],
+        "cancelled": result.get("cancelled", False),
+        "timed_out": result.get("timed_out", False),
+        "seconds": round(seconds, 6),
+        "stage_timings": result.get("stage_timings", {}),
+    }
+
+# Progress queue and cancellation flag shared with the parent, set by _init_async_worker
+_worker_events = None
+_worker_cancel = None
+
+def _init_async_worker(events, cancel, *args) -> None:
+    """Initialise a pool worker for AsyncBatchOrchestrator"""
+    global _worker_events, _worker_cancel
+    # Ctrl-C reaches the whole process group; only the parent decides to cancel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Forked workers inherit the event loop's SIGTERM handler and wakeup fd: without
+    # this, terminating a worker (as a broken pool does) cancels the parent's batch instead
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    _worker_events = events
+    _worker_cancel = cancel
+    _init_worker(*args)
+
+def _report_worker_event(event: Dict) -> None:
+    """Forward a progress event to the parent, stopping the file if the batch was cancelled"""
+    _worker_events.put(event)
+    if _worker_cancel.is_set():
+        raise FileCancelled()
+
+def _process_file_async_worker(input_file: str, output_dir: str, asset_type: str,
+                               timeout: float = None) -> Tuple[Dict, str, Dict, Dict]:
+    """Process one file in a pool worker, streaming progress events to the parent"""
+    started = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            result = _worker_converter.process_file_with_timeout(
+                input_file, output_dir, asset_type, timeout, progress=_report_worker_event
+            )
+            _worker_converter.add_manifest_entry(result)
+        except FileCancelled:
+            result = _worker_converter.failed_result(input_file, output_dir, asset_type, "Cancelled")
+            result["cancelled"] = True
+            print("    ✗ Cancelled")
+    _worker_events.put(done_event(result, time.perf_counter() - started))
+    cache_updates = _worker_converter.cache.pop_updates() if _worker_converter.cache else {}
+    return result, log.getvalue(), cache_updates, _worker_converter.timer.pop_stats()
+
+def _validate_file_worker(task: Tuple[str, str]) -> Tuple[Dict, Dict]:
+    """Validate one converted file in a pool worker, returning its result and stage timings"""
+    output_file, encoding = task
+    detail = _worker_converter.validate_file(output_file, encoding)
+    return detail, _worker_converter.timer.pop_stats()
+
+@dataclass(slots=True)
+class FileReport:
+    """Per-file entry of a batch report"""
+    input_file: str
+    output_file: str
+    asset_type: str
+    success: bool
+    encoding_success: bool = False
+    field_success: bool = False
+    encoding_message: str = ''
+    field_message: str = ''
+    skipped: bool = False
+    noop: bool = False
+    cancelled: bool = False
+    timed_out: bool = False
+    encoding: Optional[str] = None
+    encoding_confidence: Optional[float] = None
+    rows: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    chinese_characters: int = 0
+    field_mappings: List[Tuple[str, str]] = field(default_factory=list)
+    unmapped_fields: List[str] = field(default_factory=list)
+    misses: Dict = field(default_factory=dict)
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    
+    @classmethod
+    def from_result(cls, result: Dict) -> 'FileReport':
+        """Build the entry from a process_file result"""
+        conversion = result.get("conversion") or {}
+        return cls(
+            input_file=result["input_file"],
+            output_file=result["output_file"],
+            asset_type=result["asset_type"],
+            success=result["overall_success"],
+            encoding_success=result["encoding_success"],
+            field_success=result["field_success"],
+            encoding_message=result["encoding_message"],
+            field_message=result["field_message"],
+            skipped=result.get("skipped", False),
+            noop=result.get("noop", False),
+            cancelled=result.get("cancelled", False),
+            timed_out=result.get("timed_out", False),
+            encoding=conversion.get("encoding"),
+            encoding_confidence=conversion.get("encoding_confidence"),
+            rows=conversion.get("rows", 0),
+            bytes_read=conversion.get("bytes_read", 0),
+            bytes_written=conversion.get("bytes_written", 0),
+            chinese_characters=conversion.get("chinese_characters", 0),
+            field_mappings=conversion.get("field_mappings", []),
+            unmapped_fields=conversion.get("unmapped_fields", []),
+            misses=conversion.get("misses", {}),
+            stage_timings=result.get("stage_timings", {}),
+        )
+
+@dataclass(slots=True)
+class BatchReport:
+    """Structured batch report; the text report is rendered from it by render()"""
+    files: List[FileReport]
+    misses: Optional['MissCollector'] = None
+    
+    def summary(self) -> Dict:
+        """Totals over all files"""
+        successful = [f for f in self.files if f.success]
+        return {
+            "total_files": len(self.files),
+            "successful": len(successful),
+            "failed": len(self.files) - len(successful),
+            "skipped": sum(1 for f in self.files if f.skipped),
+            "noop": sum(1 for f in self.files if f.noop),
+            "rows": sum(f.rows for f in self.files),
+            "bytes_read": sum(f.bytes_read for f in self.files),
+            "bytes_written": sum(f.bytes_written for f in self.files),
+            "seconds": round(sum(sum(f.stage_timings.values()) for f in self.files), 6),
+            "unmapped": self.misses.total() if self.misses else 0,
+            "misses": self.misses.to_dict() if self.misses else {},
+        }
+    
+    def to_json(self) -> str:
+        """One JSON document with the summary and every file"""
+        return json.dumps({"summary": self.summary(), "files": [asdict(f) for f in self.files]},
+                          ensure_ascii=False, indent=2)
+    
+    def to_jsonl(self) -> str:
+        """One JSON line per file followed by a summary line, for cheap aggregation across runs"""
+        lines = [json.dumps(dict(asdict(f), type="file"), ensure_ascii=False) for f in self.files]
+        lines.append(json.dumps(dict(self.summary(), type="summary"), ensure_ascii=False))
+        return "\n".join(lines) + "\n"
+    
+    def render(self) -> str:
+        """Render the text report"""
+        summary = self.summary()
+        total_files = summary["total_files"]
+        successful_files = summary["successful"]
+        failed_files = summary["failed"]
+        
+        report = f"Batch Conversion Report\n"
+        report += f"=" * 50 + "\n\n"
+        report += f"Total files processed: {total_files}\n"
+        report += f"Successful conversions: {successful_files}\n"
+        if summary["skipped"]:
+            report += f"Skipped (unchanged since last run): {summary['skipped']}\n"
+        if summary["noop"]:
+            report += f"Copied without conversion (already UTF-8, English headers): {summary['noop']}\n"
+        report += f"Failed conversions: {failed_files}\n"
+        report += f"Success rate: {(successful_files/max(total_files, 1)*100):.1f}%\n\n"
+        
+        # Successful files
+        if successful_files > 0:
+            report += f"Successfully Converted Files:\n"
+            report += f"-" * 30 + "\n"
+            for file_report in self.files:
+                if file_report.success:
+                    filename = os.path.basename(file_report.input_file)
+                    output_filename = os.path.basename(file_report.output_file)
+                    note = " (no conversion needed)" if file_report.noop else ""
+                    report += f"✓ {filename} → {output_filename}{note}\n"
+            report += "\n"
+        
+        # Failed files
+        if failed_files > 0:
+            report += f"Failed Conversions:\n"
+            report += f"-" * 20 + "\n"
+            for file_report in self.files:
+                if not file_report.success:
+                    filename = os.path.basename(file_report.input_file)
+                    report += f"✗ {filename}\n"
+                    if not file_report.encoding_success:
+                        report += f"  Encoding error: {file_report.encoding_message}\n"
+                    elif not file_report.field_success:
+                        report += f"  Field conversion error: {file_report.field_message}\n"
+            report += "\n"
+        
+        # Mapping misses, once for the whole batch
+        if self.misses:
+            report += f"Headers and Values Without a Mapping:\n"
+            report += f"-" * 37 + "\n"
+            report += self.misses.render()
+            report += "\n"
+        
+        # Next steps
+        report += f"Next Steps:\n"
+        report += f"-" * 10 + "\n"
+        if successful_files > 0:
+            report += f"1. Review converted files in the output directory\n"
+            report += f"2. Validate the converted CSV files before importing\n"
+            report += f"3. Import the files to Snipe-IT using web interface or command line,\n"
+            report += f"   or push them through the REST API: batch-convert.py push <output_dir> --url <snipe-it url>\n"
+        
+        if failed_files > 0:
+            report += f"4. Review and fix the failed conversions manually\n"
+            report += f"5. Check the error messages for specific issues\n"
+        
+        return report
 
 class BatchConverter:
     """Batch converter for multiple CSV files"""
     
     def __init__(self, encoding_tool: str = "encoding-converter.py", 
-                 field_tool: str = "csv-field-converter.py"):
+                 field_tool: str = "csv-field-converter.py",
+                 mapping_file: str = "chinese-field-mapping.json", use_cache: bool = True,
+                 hardlink: bool = False, timings: bool = False, references: bool = False,
+                 compress: Optional[str] = None):
         """Initialize batch converter"""
         self.encoding_tool = encoding_tool
         self.field_tool = field_tool
+        self.mapping_file = mapping_file
+        self.use_cache = use_cache
+        self.hardlink = hardlink
+        self.references = references
+        self.compress = compress
         self.results = []
+        self.timeout_warned = False
+        
+        encoding_tools = load_tool(encoding_tool)
+        field_tools = load_tool(field_tool)
+        self.cache = encoding_tools.DetectionCache() if use_cache else None
+        self.timer = encoding_tools.StageTimer(enabled=timings)
+        self.encoding_converter = encoding_tools.EncodingConverter(self.cache, self.timer)
+        self.field_converter = field_tools.CSVFieldConverter(mapping_file, self.cache, self.timer,
+                                                             mapping_cache=use_cache)
+        self.field_tools = field_tools
+        self.encoding_tools = encoding_tools
+        
+        # Outputs are only reused when produced by the same tools and mapping
+        self.tool_version = f"batch {__version__}, encoding {encoding_tools.__version__}, field {field_tools.__version__}"
+        self._mapping_hash = None
+    
+    @property
+    def mapping_hash(self) -> str:
+        """Content hash of the mapping file, taken once it has loaded (or exited with load_mappings' error)"""
+        if self._mapping_hash is None:
+            self.field_converter.mappings
+            self._mapping_hash = file_hash(self.mapping_file)
+        return self._mapping_hash
     
     def find_csv_files(self, directory: str, pattern: str = "*.csv") -> List[str]:
-        """Find all CSV files in directory"""
-        search_pattern = os.path.join(directory, pattern)
-        files = glob.glob(search_pattern)
-        return sorted(files)
+        """Find all CSV files in directory, including compressed ones and zip archive members"""
+        files = glob.glob(os.path.join(directory, pattern))
+        for suffix in self.encoding_tools.COMPRESSION_SUFFIXES:
+            files.extend(glob.glob(os.path.join(directory, pattern + suffix)))
+        files = [file for file in files if not file.endswith('.zip')]
+        for archive in glob.glob(os.path.join(directory, '*.zip')):
+            files.extend(self.encoding_tools.archive_members(archive, pattern))
+        return sorted(set(files))
+    
+    def output_name(self, input_file: str) -> str:
+        """Return the converted file name for an input: <name>_converted.csv, plus .gz or .zst with compress"""
+        archive, member = self.encoding_tools.split_archive_member(input_file)
+        name = self.encoding_tools.strip_compression_suffix(os.path.basename(member or input_file))
+        name = os.path.splitext(name)[0]
+        if member is not None:
+            name = f"{os.path.splitext(os.path.basename(archive))[0]}_{name}"
+        suffix = f".{self.compress}" if self.compress else ""
+        return f"{name}_converted.csv{suffix}"
     
-    def process_file(self, input_file: str, output_dir: str, asset_type: str = "assets") -> Dict:
+    def process_file(self, input_file: str, output_dir: str, asset_type: str = "assets",
+                     progress: Optional[Callable[[Dict], None]] = None) -> Dict:
         """Process a single CSV file"""
         filename = os.path.basename(input_file)
-        name_without_ext = os.path.splitext(filename)[0]
         
-        # Create output filenames
-        temp_file = os.path.join(output_dir, f"{name_without_ext}_temp.csv")
-        final_file = os.path.join(output_dir, f"{name_without_ext}_converted.csv")
+        # Create output filename
+        final_file = os.path.join(output_dir, self.output_name(input_file))
         
         result = {
             "input_file": input_file,
-            "temp_file": temp_file,
             "output_file": final_file,
             "asset_type": asset_type,
             "encoding_success": False,
             "field_success": False,
             "encoding_message": "",
             "field_message": "",
-            "overall_success": False
+            "overall_success": False,
+            "stage_timings": {}
         }
         
+        def emit(event: str, **fields) -> None:
+            if progress is not None:
+                progress(dict(event=event, file=input_file, **fields))
+        
+        def report_rows(rows: int, bytes_read: int) -> None:
+            emit("progress", rows=rows, bytes_read=bytes_read)
+        
+        def finish_stage(stage: str, started: float) -> None:
+            seconds = round(time.perf_counter() - started, 6)
+            result["stage_timings"][stage] = seconds
+            emit("stage", stage=stage, seconds=seconds)
+        
         try:
-            # Step 1: Fix encoding
+            # Step 1: Detect encoding
             print(f"Processing {filename}...")
-            print("  Step 1: Fixing encoding...")
+            print("  Step 1: Detecting encoding...")
+            started = time.perf_counter()
+            references = self.field_tools.ReferenceCollector() if self.references else None
+            # Hashed for the manifest as the input is read
+            digest = hashlib.blake2b(digest_size=20)
             
-            encoding_cmd = [
-                "python", self.encoding_tool, "fix", 
-                input_file, temp_file
-            ]
+            if self.field_converter.passthrough_check(input_file, asset_type):
+                finish_stage("detect", started)
+                result["encoding_success"] = True
+                result["encoding_message"] = "Already UTF-8 with English headers"
+                print("    ✓ Already UTF-8 with English headers")
+                print("  Step 2: Copying unchanged file...")
+                
+                started = time.perf_counter()
+                conversion = self.field_converter.pass_through(input_file, final_file, asset_type, self.hardlink,
+                                                               references, digest)
+                finish_stage("copy", started)
+                result["conversion"] = asdict(conversion)
+                if conversion.success:
+                    if references is not None:
+                        result["references"] = references.to_dict()
+                    size = self.encoding_tools.content_size(input_file)
+                    if size is not None:
+                        report_rows(0, size)
+                    result["field_success"] = True
+                    result["field_message"] = "No conversion needed"
+                    result["overall_success"] = True
+                    result["output_encoding"] = "utf-8"
+                    result["noop"] = True
+                    print("    ✓ Copied without conversion")
+                else:
+                    result["field_message"] = conversion.message
+                    print(f"    ✗ Copy failed: {conversion.message}")
+                return result
             
-            encoding_result = subprocess.run(
-                encoding_cmd, 
-                capture_output=True, 
-                text=True, 
-                encoding='utf-8'
-            )
+            # Tool output is captured, as it was when the tools ran as subprocesses
+            with contextlib.redirect_stdout(io.StringIO()):
+                encoding, confidence = self.encoding_converter.detect_encoding(input_file)
+            finish_stage("detect", started)
             
-            if encoding_result.returncode == 0:
-                result["encoding_success"] = True
-                result["encoding_message"] = "Encoding fixed successfully"
-                print("    ✓ Encoding fixed")
-            else:
-                result["encoding_message"] = encoding_result.stderr
-                print(f"    ✗ Encoding failed: {encoding_result.stderr}")
+            if confidence < 0.5:
+                result["encoding_message"] = f"Could not reliably detect encoding for {input_file}"
+                print(f"    ✗ Encoding failed: {result['encoding_message']}")
                 return result
             
-            # Step 2: Convert field names
-            print("  Step 2: Converting field names...")
+            result["encoding_success"] = True
+            result["encoding_message"] = f"Detected {encoding} (confidence: {confidence:.2f})"
+            print(f"    ✓ Encoding detected: {encoding}")
             
-            field_cmd = [
-                "python", self.field_tool, "convert",
-                temp_file, final_file,
-                "--type", asset_type
-            ]
+            # Step 2: Convert to UTF-8 and translate field names in one pass
+            print("  Step 2: Converting encoding and field names...")
+            started = time.perf_counter()
             
-            field_result = subprocess.run(
-                field_cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8'
-            )
+            with contextlib.redirect_stdout(io.StringIO()):
+                conversion = self.field_converter.convert_csv_result(
+                    input_file, final_file, asset_type, encoding=encoding, fast_path=False,
+                    progress=report_rows if progress is not None else None, references=references,
+                    input_digest=digest
+                )
+            finish_stage("convert", started)
+            conversion.encoding_confidence = confidence
+            result["conversion"] = asdict(conversion)
             
-            if field_result.returncode == 0:
+            if conversion.success:
+                if references is not None:
+                    result["references"] = references.to_dict()
                 result["field_success"] = True
                 result["field_message"] = "Field names converted successfully"
                 result["overall_success"] = True
+                result["output_encoding"] = "utf-8"
                 print("    ✓ Field names converted")
-                
-                # Clean up temp file
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    
             else:
-                result["field_message"] = field_result.stderr
-                print(f"    ✗ Field conversion failed: {field_result.stderr}")
+                result["field_message"] = conversion.message
+                print(f"    ✗ Field conversion failed: {conversion.message}")
             
         except Exception as e:
             result["encoding_message"] = f"Exception during processing: {str(e)}"
@@ -117,8 +472,121 @@ class BatchConverter:
         
         return result
     
+    def failed_result(self, input_file: str, output_dir: str, asset_type: str, message: str) -> Dict:
+        """Build the result of a file that was abandoned, removing any half-written output"""
+        final_file = os.path.join(output_dir, self.output_name(input_file))
+        
+        # Do not leave half-written output behind
+        if os.path.exists(final_file):
+            os.remove(final_file)
+        
+        return {
+            "input_file": input_file,
+            "output_file": final_file,
+            "asset_type": asset_type,
+            "encoding_success": False,
+            "field_success": False,
+            "encoding_message": message,
+            "field_message": "",
+            "overall_success": False
+        }
+    
+    def process_file_with_timeout(self, input_file: str, output_dir: str,
+                                  asset_type: str = "assets", timeout: float = None,
+                                  progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Process a single CSV file, giving up after timeout seconds (POSIX main thread only)"""
+        if not timeout:
+            return self.process_file(input_file, output_dir, asset_type, progress)
+        
+        if not hasattr(signal, 'SIGALRM') or threading.current_thread() is not threading.main_thread():
+            if not self.timeout_warned:
+                self.timeout_warned = True
+                reason = ("SIGALRM is not available on this platform" if not hasattr(signal, 'SIGALRM')
+                          else "not running on the main thread")
+                print(f"⚠ Timeout of {timeout:g}s is not enforced: {reason}", file=sys.stderr)
+            return self.process_file(input_file, output_dir, asset_type, progress)
+        
+        previous_handler = signal.signal(signal.SIGALRM, _raise_file_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return self.process_file(input_file, output_dir, asset_type, progress)
+        except FileTimeout:
+            print(f"    ✗ Timed out after {timeout:g}s")
+            result = self.failed_result(input_file, output_dir, asset_type, f"Timed out after {timeout:g}s")
+            result["timed_out"] = True
+            return result
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    def load_manifest(self, output_dir: str) -> Dict:
+        """Load the manifest of previously converted outputs, keyed by output filename"""
+        try:
+            with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def save_manifest(self, output_dir: str, manifest: Dict) -> None:
+        """Atomically write the manifest to the output directory"""
+        fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.chmod(temp_path, self.encoding_tools.new_file_mode())
+            os.replace(temp_path, os.path.join(output_dir, MANIFEST_FILE))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    def add_manifest_entry(self, result: Dict) -> None:
+        """Record what a successful result was produced from, for later incremental runs"""
+        if not result["overall_success"] or result.get("skipped"):
+            return
+        
+        # Zip members are dated by their archive
+        stat = os.stat(self.encoding_tools.split_archive_member(result["input_file"])[0])
+        result["manifest"] = {
+            "input_file": os.path.abspath(result["input_file"]),
+            "input_size": stat.st_size,
+            "input_mtime_ns": stat.st_mtime_ns,
+            "input_hash": (result.get("conversion") or {}).get("input_hash"),
+            "mapping_hash": self.mapping_hash,
+            "tool_version": self.tool_version,
+            "asset_type": result["asset_type"]
+        }
+    
+    def input_hash(self, input_file: str) -> str:
+        """Hash an input file for the manifest, decompressing .gz/.zst files and zip members"""
+        with self.timer.stage('manifest.hash', bytes=self.encoding_tools.source_size(input_file)):
+            return file_hash(input_file, open_file=self.encoding_tools.open_binary)
+    
+    def is_up_to_date(self, entry: Dict, input_file: str, output_file: str, asset_type: str) -> bool:
+        """Check whether an output still matches its input, mapping file and tools"""
+        if not entry or not os.path.exists(output_file):
+            return False
+        
+        if (entry.get("mapping_hash") != self.mapping_hash
+                or entry.get("tool_version") != self.tool_version
+                or entry.get("asset_type") != asset_type
+                or entry.get("input_file") != os.path.abspath(input_file)):
+            return False
+        
+        stat = os.stat(self.encoding_tools.split_archive_member(input_file)[0])
+        if stat.st_size != entry.get("input_size"):
+            return False
+        if stat.st_mtime_ns == entry.get("input_mtime_ns"):
+            return True
+        
+        # Touched but possibly unchanged: fall back to comparing content
+        if not entry.get("input_hash") or self.input_hash(input_file) != entry.get("input_hash"):
+            return False
+        entry["input_mtime_ns"] = stat.st_mtime_ns
+        return True
+    
     def process_directory(self, input_dir: str, output_dir: str, 
-                         asset_type: str = "assets", pattern: str = "*.csv") -> List[Dict]:
+                         asset_type: str = "assets", pattern: str = "*.csv",
+                         jobs: int = 1, timeout: float = None, force: bool = False) -> List[Dict]:
         """Process all CSV files in a directory"""
         
         # Create output directory if it doesn't exist
@@ -133,77 +601,170 @@ class BatchConverter:
         
         print(f"Found {len(csv_files)} CSV files to process:")
         for file in csv_files:
-            print(f"  - {os.path.basename(file)}")
+            print(f"  - {os.path.relpath(file, input_dir)}")
         print()
         
-        # Process each file
-        results = []
-        for csv_file in csv_files:
-            result = self.process_file(csv_file, output_dir, asset_type)
-            results.append(result)
-            self.results.append(result)
+        if jobs is not None and jobs < 1:
+            jobs = os.cpu_count() or 1
+        
+        # Work out which inputs changed since the last run
+        manifest = {} if force else self.load_manifest(output_dir)
+        results = [None] * len(csv_files)
+        pending = []
+        for index, csv_file in enumerate(csv_files):
+            output_name = self.output_name(csv_file)
+            output_file = os.path.join(output_dir, output_name)
+            if self.is_up_to_date(manifest.get(output_name), csv_file, output_file, asset_type):
+                print(f"Skipping {os.path.basename(csv_file)} (unchanged since last run)")
+                results[index] = self.skipped_result(csv_file, output_file, asset_type)
+            else:
+                pending.append(index)
         
+        # Process each changed file
+        try:
+            if jobs == 1 or len(pending) <= 1:
+                for index in pending:
+                    result = self.process_file_with_timeout(csv_files[index], output_dir, asset_type, timeout)
+                    self.add_manifest_entry(result)
+                    results[index] = result
+            else:
+                print(f"Using {jobs} worker processes")
+                with ProcessPoolExecutor(
+                    max_workers=jobs,
+                    initializer=_init_worker,
+                    initargs=(self.encoding_tool, self.field_tool, self.mapping_file, self.use_cache, self.hardlink,
+                              self.timer.enabled, self.references, self.compress)
+                ) as executor:
+                    futures = [
+                        (index, executor.submit(_process_file_worker, csv_files[index], output_dir, asset_type,
+                                                timeout))
+                        for index in pending
+                    ]
+                    
+                    # Collect in submission order so the log and report stay deterministic
+                    for index, future in futures:
+                        try:
+                            result, log, cache_updates, timings = future.result()
+                        except Exception as e:
+                            # e.g. BrokenProcessPool when a worker was killed
+                            results[index] = self.failed_result(csv_files[index], output_dir, asset_type,
+                                                                f"Worker failed: {type(e).__name__}: {e}")
+                            continue
+                        print(log, end='')
+                        results[index] = result
+                        self.timer.merge(timings)
+                        if self.cache is not None:
+                            self.cache.merge(cache_updates)
+        finally:
+            # Files that finished are recorded even if the batch was interrupted
+            self.finish_run(output_dir, manifest, [result for result in results if result is not None])
         return results
     
-    def generate_report(self, results: List[Dict], output_file: str = None) -> str:
-        """Generate processing report"""
-        total_files = len(results)
-        successful_files = sum(1 for r in results if r["overall_success"])
-        failed_files = total_files - successful_files
-        
-        report = f"Batch Conversion Report\n"
-        report += f"=" * 50 + "\n\n"
-        report += f"Total files processed: {total_files}\n"
-        report += f"Successful conversions: {successful_files}\n"
-        report += f"Failed conversions: {failed_files}\n"
-        report += f"Success rate: {(successful_files/total_files*100):.1f}%\n\n"
-        
-        # Successful files
-        if successful_files > 0:
-            report += f"Successfully Converted Files:\n"
-            report += f"-" * 30 + "\n"
-            for result in results:
-                if result["overall_success"]:
-                    filename = os.path.basename(result["input_file"])
-                    output_filename = os.path.basename(result["output_file"])
-                    report += f"✓ {filename} → {output_filename}\n"
-            report += "\n"
-        
-        # Failed files
-        if failed_files > 0:
-            report += f"Failed Conversions:\n"
-            report += f"-" * 20 + "\n"
-            for result in results:
-                if not result["overall_success"]:
-                    filename = os.path.basename(result["input_file"])
-                    report += f"✗ {filename}\n"
-                    if not result["encoding_success"]:
-                        report += f"  Encoding error: {result['encoding_message']}\n"
-                    elif not result["field_success"]:
-                        report += f"  Field conversion error: {result['field_message']}\n"
-            report += "\n"
-        
-        # Next steps
-        report += f"Next Steps:\n"
-        report += f"-" * 10 + "\n"
-        if successful_files > 0:
-            report += f"1. Review converted files in the output directory\n"
-            report += f"2. Validate the converted CSV files before importing\n"
-            report += f"3. Import the files to Snipe-IT using web interface or command line\n"
+    def skipped_result(self, input_file: str, output_file: str, asset_type: str) -> Dict:
+        """Build the result of a file whose output is still up to date"""
+        return {
+            "input_file": input_file,
+            "output_file": output_file,
+            "asset_type": asset_type,
+            "encoding_success": True,
+            "field_success": True,
+            "encoding_message": "Unchanged since last run",
+            "field_message": "Unchanged since last run",
+            "overall_success": True,
+            "output_encoding": "utf-8",
+            "skipped": True
+        }
+    
+    def finish_run(self, output_dir: str, manifest: Dict, results: List[Dict]) -> None:
+        """Record the results of a run in the manifest and save the detection cache"""
+        for result in results:
+            output_name = os.path.basename(result["output_file"])
+            if "manifest" in result:
+                manifest[output_name] = result.pop("manifest")
+            elif not result["overall_success"]:
+                manifest.pop(output_name, None)
+        self.save_manifest(output_dir, manifest)
         
-        if failed_files > 0:
-            report += f"4. Review and fix the failed conversions manually\n"
-            report += f"5. Check the error messages for specific issues\n"
+        if self.cache is not None:
+            self.cache.save()
+        self.results.extend(results)
+    
+    def generate_report(self, results: List[Dict], output_file: str = None,
+                        report_format: str = 'text') -> str:
+        """Generate processing report"""
+        batch_report = BatchReport([FileReport.from_result(result) for result in results],
+                                   self.batch_misses(results))
+        report = batch_report.render()
         
         # Save report to file if specified
         if output_file:
+            if report_format == 'json':
+                content = batch_report.to_json()
+            elif report_format == 'jsonl':
+                content = batch_report.to_jsonl()
+            else:
+                content = report
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(report)
+                f.write(content)
             print(f"Report saved to: {output_file}")
         
         return report
     
-    def validate_converted_files(self, results: List[Dict]) -> Dict:
+    def batch_misses(self, results: List[Dict]):
+        """Merge the mapping misses of every converted file into one MissCollector"""
+        misses = self.field_tools.MissCollector()
+        for result in results:
+            conversion = result.get("conversion") or {}
+            if conversion.get("misses"):
+                misses.update(conversion["misses"])
+        return misses
+    
+    def batch_references(self, results: List[Dict]):
+        """Merge the reference entities of every file, in file order, into one ReferenceCollector"""
+        references = self.field_tools.ReferenceCollector()
+        for result in results:
+            if result.get("skipped") and os.path.exists(result["output_file"]):
+                self.field_converter.collect_references(result["output_file"], references, result["asset_type"])
+            elif result.get("references"):
+                references.update(result.pop("references"))
+        return references
+    
+    def validate_file(self, output_file: str, encoding: str = None) -> Dict:
+        """Validate one converted file in-process and return a structured result"""
+        detail = {
+            "file": os.path.basename(output_file),
+            "path": output_file,
+            "status": "Error",
+            "valid": False,
+            "encoding": encoding,
+            "field_count": 0,
+            "missing_fields": [],
+            "issues": [],
+            "message": ""
+        }
+        
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), self.timer.stage('validate'):
+                check = self.field_converter.check_csv_header(output_file, encoding)
+        except Exception as e:
+            detail["message"] = str(e)
+            return detail
+        
+        detail.update({
+            "status": "Valid" if check.valid else "Invalid",
+            "valid": check.valid,
+            "encoding": check.encoding,
+            "field_count": len(check.fields),
+            "missing_fields": check.missing_fields,
+            "issues": check.issues,
+            "message": "; ".join(
+                ([f"Missing required fields: {', '.join(check.missing_fields)}"] if check.missing_fields else [])
+                + check.issues
+            )
+        })
+        return detail
+    
+    def validate_converted_files(self, results: List[Dict], jobs: int = 1) -> Dict:
         """Validate all converted files"""
         validation_results = {
             "total_files": 0,
@@ -212,6 +773,7 @@ class BatchConverter:
             "details": []
         }
         
+        tasks = []
         for result in results:
             if not result["overall_success"]:
                 continue
@@ -220,46 +782,227 @@ class BatchConverter:
             if not os.path.exists(output_file):
                 continue
             
+            tasks.append((output_file, result.get("output_encoding")))
+        
+        if jobs is not None and jobs < 1:
+            jobs = os.cpu_count() or 1
+        
+        if jobs == 1 or len(tasks) <= 1:
+            details = [self.validate_file(output_file, encoding) for output_file, encoding in tasks]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(self.encoding_tool, self.field_tool, self.mapping_file, False, False, self.timer.enabled)
+            ) as executor:
+                # Many small files: hand them out in chunks to keep IPC overhead low
+                chunksize = max(1, len(tasks) // (jobs * 4))
+                details = []
+                for detail, timings in executor.map(_validate_file_worker, tasks, chunksize=chunksize):
+                    details.append(detail)
+                    self.timer.merge(timings)
+        
+        for detail in details:
             validation_results["total_files"] += 1
-            
-            # Validate using the field converter tool
+            if detail["valid"]:
+                validation_results["valid_files"] += 1
+            else:
+                validation_results["invalid_files"] += 1
+            validation_results["details"].append(detail)
+        
+        return validation_results
+
+class HandleBudget:
+    """Weighted asyncio semaphore limiting how many file handles are open at once"""
+    
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.available = self.limit
+        import asyncio
+        self.condition = asyncio.Condition()
+    
+    @contextlib.asynccontextmanager
+    async def hold(self, count: int):
+        """Hold count handles (capped at the limit) for the duration of the block"""
+        count = min(count, self.limit)
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.available >= count)
+            self.available -= count
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.available += count
+                self.condition.notify_all()
+
+class AsyncBatchOrchestrator:
+    """Run a batch conversion from an asyncio event loop with live JSON-lines progress"""
+    
+    # Input and output of one conversion
+    HANDLES_PER_FILE = 2
+    
+    def __init__(self, converter: BatchConverter, jobs: int = 1, max_in_flight: Optional[int] = None,
+                 max_open_files: int = 64, progress_file: str = '-'):
+        """Initialize orchestrator; progress_file '-' streams events to stdout"""
+        self.converter = converter
+        self.jobs = jobs if jobs and jobs >= 1 else (os.cpu_count() or 1)
+        self.max_in_flight = max_in_flight or self.jobs
+        self.max_open_files = max_open_files
+        self.progress_file = progress_file
+        self.cancelled = False
+        self.events = None
+        self.workers_done = False
+        self.cancel_event = None
+        # Bound now, so the CLI can move the text log off stdout afterwards
+        self.stream = sys.stdout if progress_file == '-' else None
+    
+    def emit(self, event: Dict) -> None:
+        """Write one progress event as a JSON line"""
+        event.setdefault("time", round(time.time(), 3))
+        self.stream.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.stream.flush()
+    
+    def cancel(self) -> None:
+        """Stop starting new files and ask running conversions to stop"""
+        if not self.cancelled:
+            self.cancelled = True
+            self.cancel_event.set()
+            self.emit({"event": "cancel_requested"})
+    
+    def next_event(self) -> Optional[Dict]:
+        """Wait for the next worker event, or return None once the pool has shut down and the queue is empty"""
+        while True:
             try:
-                validate_cmd = [
-                    "python", self.field_tool, "validate", output_file
-                ]
-                
-                validate_result = subprocess.run(
-                    validate_cmd,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8'
+                return self.events.get(timeout=0.1)
+            except Empty:
+                # No sentinel through the queue: a killed worker may hold its write lock for good
+                if self.workers_done:
+                    return None
+    
+    async def pump_events(self) -> None:
+        """Forward events from the worker processes until the pool has shut down"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self.next_event)
+            if event is None:
+                return
+            self.emit(event)
+    
+    def run(self, input_dir: str, output_dir: str, asset_type: str = "assets",
+            pattern: str = "*.csv", timeout: float = None, force: bool = False) -> List[Dict]:
+        """Process a directory like BatchConverter.process_directory and return the results"""
+        # asyncio (and the ssl module it pulls in) is only imported for --progress runs
+        import asyncio
+        if self.progress_file == '-':
+            return asyncio.run(self.run_async(input_dir, output_dir, asset_type, pattern, timeout, force))
+        
+        with open(self.progress_file, 'a', encoding='utf-8') as self.stream:
+            return asyncio.run(self.run_async(input_dir, output_dir, asset_type, pattern, timeout, force))
+    
+    async def run_async(self, input_dir: str, output_dir: str, asset_type: str,
+                        pattern: str, timeout: float, force: bool) -> List[Dict]:
+        """Schedule every file of the batch and collect the results in input order"""
+        import asyncio
+        converter = self.converter
+        os.makedirs(output_dir, exist_ok=True)
+        csv_files = converter.find_csv_files(input_dir, pattern)
+        manifest = {} if force else converter.load_manifest(output_dir)
+        if not csv_files:
+            print(f"No CSV files found in {input_dir} matching pattern {pattern}")
+        
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.cancel)
+        
+        self.events = multiprocessing.Queue()
+        self.cancel_event = multiprocessing.Event()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        handles = HandleBudget(self.max_open_files)
+        results = [None] * len(csv_files)
+        
+        self.emit({"event": "batch_start", "files": len(csv_files), "jobs": self.jobs,
+                   "max_in_flight": self.max_in_flight, "max_open_files": self.max_open_files})
+        started = time.perf_counter()
+        
+        executor = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_async_worker,
+            initargs=(self.events, self.cancel_event, converter.encoding_tool, converter.field_tool,
+                      converter.mapping_file, converter.use_cache, converter.hardlink, converter.timer.enabled,
+                      converter.references, converter.compress)
+        )
+        pump = asyncio.create_task(self.pump_events())
+        
+        async def convert_one(index: int, csv_file: str) -> None:
+            output_name = converter.output_name(csv_file)
+            output_file = os.path.join(output_dir, output_name)
+            
+            async with handles.hold(1):
+                up_to_date = await asyncio.to_thread(
+                    converter.is_up_to_date, manifest.get(output_name), csv_file, output_file, asset_type
                 )
+            if up_to_date:
+                results[index] = converter.skipped_result(csv_file, output_file, asset_type)
+                self.emit({"event": "skipped", "file": csv_file})
+                return
+            
+            async with in_flight, handles.hold(self.HANDLES_PER_FILE):
+                if self.cancelled:
+                    result = converter.failed_result(csv_file, output_dir, asset_type, "Cancelled")
+                    result["cancelled"] = True
+                    results[index] = result
+                    self.emit(done_event(result, 0))
+                    return
                 
-                if validate_result.returncode == 0:
-                    validation_results["valid_files"] += 1
-                    status = "Valid"
-                else:
-                    validation_results["invalid_files"] += 1
-                    status = "Invalid"
-                
-                validation_results["details"].append({
-                    "file": os.path.basename(output_file),
-                    "status": status,
-                    "message": validate_result.stdout or validate_result.stderr
-                })
-                
-            except Exception as e:
-                validation_results["invalid_files"] += 1
-                validation_results["details"].append({
-                    "file": os.path.basename(output_file),
-                    "status": "Error",
-                    "message": str(e)
-                })
+                start = {"event": "start", "file": csv_file}
+                # Progress counts decompressed bytes; bytes_total is left out when a .zst file does not record its size
+                bytes_total = converter.encoding_tools.content_size(csv_file)
+                if bytes_total is not None:
+                    start["bytes_total"] = bytes_total
+                self.emit(start)
+                try:
+                    result, log, cache_updates, timings = await loop.run_in_executor(
+                        executor, _process_file_async_worker, csv_file, output_dir, asset_type, timeout
+                    )
+                except Exception as e:
+                    # e.g. BrokenProcessPool when a worker was killed
+                    result = converter.failed_result(csv_file, output_dir, asset_type,
+                                                     f"Worker failed: {type(e).__name__}: {e}")
+                    results[index] = result
+                    self.emit(done_event(result, 0))
+                    return
+            
+            print(log, end='')
+            results[index] = result
+            converter.timer.merge(timings)
+            if converter.cache is not None:
+                converter.cache.merge(cache_updates)
         
-        return validation_results
+        try:
+            await asyncio.gather(*(convert_one(index, csv_file) for index, csv_file in enumerate(csv_files)))
+        finally:
+            executor.shutdown(wait=True)
+            self.workers_done = True
+            await pump
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signum)
+        
+        converter.finish_run(output_dir, manifest, results)
+        self.emit({
+            "event": "batch_done",
+            "files": len(results),
+            "succeeded": sum(1 for r in results if r["overall_success"]),
+            "skipped": sum(1 for r in results if r.get("skipped")),
+            "cancelled": sum(1 for r in results if r.get("cancelled")),
+            "seconds": round(time.perf_counter() - started, 6),
+        })
+        return results
 
 def main():
     """Main function for command line interface"""
+    encoding_tools = load_tool("encoding-converter.py")
+    
     parser = argparse.ArgumentParser(
         description='Batch convert multiple CSV files for Snipe-IT Chinese import',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -268,7 +1011,15 @@ Examples:
   python batch-convert.py process input_dir output_dir
   python batch-convert.py process input_dir output_dir --type users
   python batch-convert.py process input_dir output_dir --pattern "*assets*.csv"
+  python batch-convert.py process input_dir output_dir --jobs 4 --timeout 600
+  python batch-convert.py process input_dir output_dir --jobs 4 --progress progress.jsonl
+  python batch-convert.py process input_dir output_dir --report-format jsonl
+  python batch-convert.py process input_dir output_dir --draft-mapping draft-mapping.json
+  python batch-convert.py process input_dir output_dir --references output_dir/references
+  python batch-convert.py process input_dir output_dir --jobs 4 --timings --profile batch.prof
+  python batch-convert.py process vendor_drops output_dir --compress gz
   python batch-convert.py validate output_dir
+  python batch-convert.py push output_dir --url https://snipeit.example.com --concurrency 8
         """
     )
     
@@ -282,10 +1033,46 @@ Examples:
                                default='assets', help='Asset type (default: assets)')
     process_parser.add_argument('--pattern', default='*.csv', help='File pattern to match (default: *.csv)')
     process_parser.add_argument('--report', help='Output file for processing report')
+    process_parser.add_argument('--report-format', choices=['text', 'json', 'jsonl'], default='text',
+                               help='Format of the saved report; jsonl writes one line per file plus a summary line (default: text)')
+    process_parser.add_argument('--mapping', help='Custom mapping file path')
+    process_parser.add_argument('--jobs', type=int, default=1,
+                               help='Number of worker processes, 0 for one per CPU (default: 1)')
+    process_parser.add_argument('--timeout', type=float,
+                               help='Maximum seconds to spend on a single file (POSIX only; ignored with a warning elsewhere)')
+    process_parser.add_argument('--no-cache', action='store_true',
+                               help='Do not read or update the encoding detection and compiled mapping caches')
+    process_parser.add_argument('--force', action='store_true',
+                               help='Reconvert every file, even if unchanged since the last run')
+    process_parser.add_argument('--hardlink', action='store_true',
+                               help='Hardlink instead of copying files that need no conversion')
+    process_parser.add_argument('--progress', metavar='FILE',
+                               help="Run the async orchestrator and stream JSON-lines progress events to FILE ('-' for stdout, text log goes to stderr)")
+    process_parser.add_argument('--max-open-files', type=int, default=64,
+                               help='With --progress, maximum input and output files held open at once (default: 64)')
+    process_parser.add_argument('--draft-mapping', metavar='FILE',
+                               help='Write headers and values of the batch that had no mapping to FILE as a draft mapping JSON')
+    process_parser.add_argument('--draft-top', type=int, default=100,
+                               help='Most frequent unmapped entries per table to put in the draft (default: 100)')
+    process_parser.add_argument('--references', metavar='DIR',
+                               help='Write the distinct categories, manufacturers, locations, suppliers, companies and models of the batch to DIR as import CSVs')
+    process_parser.add_argument('--compress', choices=['gz', 'zst'],
+                               help='Write converted files compressed (zst needs the zstandard package)')
+    encoding_tools.add_instrumentation_arguments(process_parser)
     
     # Validate command
     validate_parser = subparsers.add_parser('validate', help='Validate converted files')
     validate_parser.add_argument('directory', help='Directory containing converted CSV files')
+    validate_parser.add_argument('--jobs', type=int, default=1,
+                                help='Number of worker processes, 0 for one per CPU (default: 1)')
+    encoding_tools.add_instrumentation_arguments(validate_parser)
+    
+    # Push command; snipeit-push.py is only loaded when it is the command being run
+    push_parser = subparsers.add_parser('push', help='Create the rows of converted files through the Snipe-IT REST API')
+    if sys.argv[1:2] == ['push']:
+        push_parser.add_argument('directory', help='Directory containing converted CSV files')
+        load_tool("snipeit-push.py").add_push_arguments(push_parser)
+        encoding_tools.add_instrumentation_arguments(push_parser)
     
     args = parser.parse_args()
     
@@ -293,80 +1080,133 @@ Examples:
         parser.print_help()
         return
     
-    converter = BatchConverter()
+    mapping_file = args.mapping if hasattr(args, 'mapping') and args.mapping else 'chinese-field-mapping.json'
+    use_cache = not getattr(args, 'no_cache', False)
+    converter = BatchConverter(mapping_file=mapping_file, use_cache=use_cache,
+                               hardlink=getattr(args, 'hardlink', False),
+                               timings=getattr(args, 'timings', False),
+                               references=bool(getattr(args, 'references', None)),
+                               compress=getattr(args, 'compress', None))
+    if args.command != 'push':
+        # Report a missing or invalid mapping file before any file is touched
+        converter.field_converter.mappings
     
-    if args.command == 'process':
-        if not os.path.exists(args.input_dir):
-            print(f"Error: Input directory '{args.input_dir}' not found.")
-            return
-        
-        print(f"Starting batch conversion...")
-        print(f"Input directory: {args.input_dir}")
-        print(f"Output directory: {args.output_dir}")
-        print(f"Asset type: {args.type}")
-        print(f"File pattern: {args.pattern}")
-        print()
-        
-        # Process files
-        results = converter.process_directory(
-            args.input_dir, 
-            args.output_dir, 
-            args.type, 
-            args.pattern
-        )
-        
-        # Generate report
-        report_file = args.report or os.path.join(args.output_dir, "conversion_report.txt")
-        report = converter.generate_report(results, report_file)
-        print(report)
-        
-        # Validate converted files
-        print("Validating converted files...")
-        validation_results = converter.validate_converted_files(results)
-        
-        print(f"\nValidation Results:")
-        print(f"Total files validated: {validation_results['total_files']}")
-        print(f"Valid files: {validation_results['valid_files']}")
-        print(f"Invalid files: {validation_results['invalid_files']}")
+    with encoding_tools.instrumented(args, converter.timer):
+        if args.command == 'process':
+            if not os.path.exists(args.input_dir):
+                print(f"Error: Input directory '{args.input_dir}' not found.")
+                return
+            
+            orchestrator = None
+            if args.progress:
+                orchestrator = AsyncBatchOrchestrator(converter, args.jobs, max_open_files=args.max_open_files,
+                                                      progress_file=args.progress)
+                if args.progress == '-':
+                    # stdout carries the JSON-lines events, so the text log moves to stderr
+                    sys.stdout = sys.stderr
+            
+            print(f"Starting batch conversion...")
+            print(f"Input directory: {args.input_dir}")
+            print(f"Output directory: {args.output_dir}")
+            print(f"Asset type: {args.type}")
+            print(f"File pattern: {args.pattern}")
+            print()
+            
+            # Process files
+            if orchestrator is not None:
+                results = orchestrator.run(args.input_dir, args.output_dir, args.type, args.pattern,
+                                           args.timeout, args.force)
+            else:
+                results = converter.process_directory(
+                    args.input_dir, 
+                    args.output_dir, 
+                    args.type, 
+                    args.pattern,
+                    args.jobs,
+                    args.timeout,
+                    args.force
+                )
+            
+            # Generate report
+            report_extension = {'text': 'txt'}.get(args.report_format, args.report_format)
+            report_file = args.report or os.path.join(args.output_dir, f"conversion_report.{report_extension}")
+            report = converter.generate_report(results, report_file, args.report_format)
+            print(report)
+            
+            if args.draft_mapping:
+                converter.field_tools.save_draft_mapping(converter.batch_misses(results),
+                                                         args.draft_mapping, args.draft_top)
+            if args.references:
+                converter.field_tools.save_references(converter.batch_references(results), args.references)
+            
+            # Validate converted files
+            print("Validating converted files...")
+            validation_results = converter.validate_converted_files(results, args.jobs)
+            
+            print(f"\nValidation Results:")
+            print(f"Total files validated: {validation_results['total_files']}")
+            print(f"Valid files: {validation_results['valid_files']}")
+            print(f"Invalid files: {validation_results['invalid_files']}")
+            
+            if validation_results['invalid_files'] > 0:
+                print("\nInvalid files:")
+                for detail in validation_results['details']:
+                    if detail['status'] != 'Valid':
+                        print(f"  ✗ {detail['file']}: {detail['status']} - {detail['message']}")
         
-        if validation_results['invalid_files'] > 0:
-            print("\nInvalid files:")
+        elif args.command == 'validate':
+            if not os.path.exists(args.directory):
+                print(f"Error: Directory '{args.directory}' not found.")
+                return
+            
+            # Find converted CSV files
+            csv_files = converter.find_csv_files(args.directory, "*_converted.csv")
+            
+            if not csv_files:
+                print(f"No converted CSV files found in {args.directory}")
+                return
+            
+            print(f"Validating {len(csv_files)} converted files...")
+            
+            # Create fake results for validation
+            fake_results = []
+            for csv_file in csv_files:
+                fake_results.append({
+                    "overall_success": True,
+                    "output_file": csv_file
+                })
+            
+            validation_results = converter.validate_converted_files(fake_results, args.jobs)
+            
+            print(f"\nValidation Results:")
+            print(f"Total files: {validation_results['total_files']}")
+            print(f"Valid files: {validation_results['valid_files']}")
+            print(f"Invalid files: {validation_results['invalid_files']}")
+            
             for detail in validation_results['details']:
-                if detail['status'] != 'Valid':
-                    print(f"  ✗ {detail['file']}: {detail['status']}")
-    
-    elif args.command == 'validate':
-        if not os.path.exists(args.directory):
-            print(f"Error: Directory '{args.directory}' not found.")
-            return
-        
-        # Find converted CSV files
-        csv_files = converter.find_csv_files(args.directory, "*_converted.csv")
-        
-        if not csv_files:
-            print(f"No converted CSV files found in {args.directory}")
-            return
-        
-        print(f"Validating {len(csv_files)} converted files...")
+                status_icon = "✓" if detail['status'] == 'Valid' else "✗"
+                message = f" - {detail['message']}" if detail['message'] else ""
+                print(f"  {status_icon} {detail['file']}: {detail['status']}{message}")
         
-        # Create fake results for validation
-        fake_results = []
-        for csv_file in csv_files:
-            fake_results.append({
-                "overall_success": True,
-                "output_file": csv_file
-            })
-        
-        validation_results = converter.validate_converted_files(fake_results)
-        
-        print(f"\nValidation Results:")
-        print(f"Total files: {validation_results['total_files']}")
-        print(f"Valid files: {validation_results['valid_files']}")
-        print(f"Invalid files: {validation_results['invalid_files']}")
-        
-        for detail in validation_results['details']:
-            status_icon = "✓" if detail['status'] == 'Valid' else "✗"
-            print(f"  {status_icon} {detail['file']}: {detail['status']}")
+        elif args.command == 'push':
+            if not os.path.exists(args.directory):
+                print(f"Error: Directory '{args.directory}' not found.")
+                return
+            
+            csv_files = converter.find_csv_files(args.directory, "*_converted.csv")
+            
+            if not csv_files:
+                print(f"No converted CSV files found in {args.directory}")
+                return
+            
+            print(f"Pushing {len(csv_files)} converted files to {args.url}...")
+            with converter.timer.stage('push'):
+                push_results = load_tool("snipeit-push.py").push_files(csv_files, args)
+            
+            for push_result in push_results:
+                print(push_result.render())
+            if any(push_result.failed or push_result.reference_errors for push_result in push_results):
+                sys.exit(1)
 
 if __name__ == '__main__':
     main()
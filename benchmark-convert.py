@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite for the Snipe-IT CSV Conversion Tools
+Measure throughput of the encoding, field and batch converters on synthetic data
+
+Author: Manus AI
+Date: 2025-07-23
+Version: 1.0
+"""
+
+import os
+import io
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import contextlib
+import importlib.util
+import multiprocessing
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from queue import Empty
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as unavailable
+    resource = None
+
+__version__ = "1.0"
+
+DEFAULT_ENCODINGS = ['gbk', 'gb18030', 'big5', 'utf-8-sig']
+STAGES = ['detect', 'fix', 'convert', 'batch']
+
+# Short invocations timed by the startup command: (label, script, arguments), {tmp} is a scratch directory
+STARTUP_COMMANDS = [
+    ('csv-field-converter --help', 'csv-field-converter.py', ['--help']),
+    ('csv-field-converter template', 'csv-field-converter.py', ['template', 'assets', '{tmp}/template.csv']),
+    ('encoding-converter --help', 'encoding-converter.py', ['--help']),
+    ('encoding-converter remove-bom', 'encoding-converter.py', ['remove-bom', '{tmp}/template.csv']),
+    ('batch-convert --help', 'batch-convert.py', ['--help']),
+]
+
+# Run in a fresh interpreter: which heavy dependencies a converter pulls in before any file is read
+LAZY_IMPORT_CHECK = """
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location('csv_field_converter', 'csv-field-converter.py')
+module = importlib.util.module_from_spec(spec)
+sys.modules['csv_field_converter'] = module
+spec.loader.exec_module(module)
+converter = module.CSVFieldConverter()
+print(json.dumps({
+    "chardet": 'chardet' in sys.modules,
+    "multiprocessing": 'concurrent.futures.process' in sys.modules,
+    "mapping": converter._mappings is not None,
+}))
+"""
+
+# load_tool lives in encoding-converter.py, which every tool uses
+if 'encoding_converter' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        'encoding_converter', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encoding-converter.py'))
+    sys.modules['encoding_converter'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['encoding_converter'])
+load_tool = sys.modules['encoding_converter'].load_tool
+
+def encodable(text: str, encoding: str) -> bool:
+    """Check whether text can be written in the given encoding"""
+    try:
+        text.encode(encoding)
+        return True
+    except UnicodeEncodeError:
+        return False
+
+class DatasetGenerator:
+    """Generate synthetic Chinese asset CSVs seeded from the mapping file and sample CSVs"""
+    
+    def __init__(self, mapping_file: str = "chinese-field-mapping.json",
+                 samples_dir: str = "sample_csvs", seed: int = 42):
+        """Initialize generator with mapping tables and sample headers"""
+        with open(mapping_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.field_mappings = data.get('field_mappings', {})
+        self.status_values = list(data.get('status_mappings', {}))
+        self.category_values = list(data.get('category_mappings', {}))
+        self.manufacturer_values = list(data.get('manufacturer_mappings', {}))
+        self.samples_dir = samples_dir
+        self.seed = seed
+    
+    def sample_header(self, asset_type: str) -> List[str]:
+        """Read the English header of the matching sample CSV, if there is one"""
+        path = os.path.join(self.samples_dir, f"{asset_type}-sample.csv")
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return [field for field in next(csv.reader(f), []) if field.strip()]
+    
+    def build_header(self, asset_type: str, columns: int, encoding: str) -> List[str]:
+        """Build a header of Chinese field names, padded with sample and custom fields"""
+        header = []
+        seen_english = set()
+        for chinese, english in self.field_mappings.get(asset_type, {}).items():
+            if english in seen_english:
+                continue
+            # Big5 cannot represent many simplified names; keep the English name then
+            header.append(chinese if encodable(chinese, encoding) else english)
+            seen_english.add(english)
+        
+        for field in self.sample_header(asset_type):
+            if field not in seen_english and field not in header:
+                header.append(field)
+        
+        while len(header) < columns:
+            header.append(f"自定义字段{len(header) + 1}" if encodable("自定义字段", encoding)
+                          else f"Custom Field {len(header) + 1}")
+        return header[:columns]
+    
+    def value_pool(self, values: List[str], encoding: str, fallback: List[str]) -> List[str]:
+        """Return the values that are representable in the encoding"""
+        pool = [value for value in values if encodable(value, encoding)]
+        return pool or fallback
+    
+    def generate(self, output_file: str, encoding: str, rows: int, columns: int,
+                 asset_type: str = "assets") -> Dict:
+        """Write a synthetic CSV and return its description"""
+        rng = random.Random(self.seed)
+        header = self.build_header(asset_type, columns, encoding)
+        mappings = self.field_mappings.get(asset_type, {})
+        
+        text_pool = self.value_pool(['联想笔记本', '研发部', '办公室', '北京', '上海', '備註', '測試資料',
+                                     'Dell Latitude', 'spare unit'], encoding, ['spare unit'])
+        statuses = self.value_pool(self.status_values, encoding, ['Ready to Deploy'])
+        categories = self.value_pool(self.category_values, encoding, ['Laptop'])
+        manufacturers = self.value_pool(self.manufacturer_values, encoding, ['Dell'])
+        
+        generators = []
+        for field in header:
+            english = mappings.get(field, field)
+            if english == 'Status':
+                generators.append(lambda i: rng.choice(statuses))
+            elif english == 'Category':
+                generators.append(lambda i: rng.choice(categories))
+            elif english == 'Manufacturer':
+                generators.append(lambda i: rng.choice(manufacturers))
+            elif english == 'Asset Tag':
+                generators.append(lambda i: f"AT-{i:08d}")
+            elif english == 'Purchase Date':
+                generators.append(lambda i: f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            elif english == 'Purchase Cost':
+                generators.append(lambda i: f"{rng.uniform(100, 20000):.2f}")
+            else:
+                generators.append(lambda i: rng.choice(text_pool))
+        
+        with open(output_file, 'w', encoding=encoding, newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for i in range(rows):
+                writer.writerow([generate(i) for generate in generators])
+        
+        return {
+            "file": output_file,
+            "encoding": encoding,
+            "rows": rows,
+            "columns": len(header),
+            "bytes": os.path.getsize(output_file),
+        }
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process in MB, or None where it cannot be measured"""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def stage_result(stage: str, dataset: Dict, files: int, success: bool, message: str = "",
+                 wall: float = 0.0, cpu: float = 0.0, timings: Optional[Dict] = None,
+                 peak_rss: Optional[float] = None) -> Dict:
+    """Build the measurements reported for one stage"""
+    scale = files if stage == 'batch' else 1
+    return {
+        "stage": stage,
+        "encoding": dataset["encoding"],
+        "rows": dataset["rows"] * scale,
+        "columns": dataset["columns"],
+        "bytes": dataset["bytes"] * scale,
+        "files": scale,
+        "success": bool(success),
+        "message": "" if success else message,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "rows_per_second": dataset["rows"] * scale / wall if wall else 0.0,
+        "mb_per_second": dataset["bytes"] * scale / (1024 * 1024) / wall if wall else 0.0,
+        "peak_rss_mb": peak_rss,
+        "stage_timings": timings or {},
+    }
+
+def _measure(stage: str, dataset: Dict, work_dir: str, mapping_file: str, files: int, queue) -> None:
+    """Run one benchmark stage in a child process and report its measurements, failed if the stage raises"""
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    success = True
+    message = ""
+    timer = None
+    
+    try:
+        encoding_tools = load_tool('encoding-converter.py')
+        field_tools = load_tool('csv-field-converter.py')
+        timer = encoding_tools.StageTimer(enabled=True)
+        
+        # The tools print progress; keep it out of the benchmark output
+        with contextlib.redirect_stdout(io.StringIO()):
+            if stage == 'detect':
+                encoding_tools.EncodingConverter(timer=timer).detect_encoding(dataset["file"])
+            elif stage == 'fix':
+                output = os.path.join(work_dir, 'fixed.csv')
+                success, message = encoding_tools.EncodingConverter(timer=timer).fix_csv_encoding(
+                    dataset["file"], output)
+            elif stage == 'convert':
+                converter = field_tools.CSVFieldConverter(mapping_file, timer=timer)
+                encoding = converter.detect_encoding(dataset["file"])
+                output = os.path.join(work_dir, 'converted.csv')
+                success, message = converter.convert_csv(dataset["file"], output, encoding=encoding)
+            elif stage == 'batch':
+                batch_tools = load_tool('batch-convert.py')
+                input_dir = os.path.join(work_dir, 'batch_in')
+                os.makedirs(input_dir, exist_ok=True)
+                for index in range(files):
+                    shutil.copyfile(dataset["file"], os.path.join(input_dir, f"part{index:03d}.csv"))
+                with timer.stage('setup'):
+                    converter = batch_tools.BatchConverter(mapping_file=mapping_file, use_cache=False,
+                                                           timings=True)
+                converter.timer.merge(timer.pop_stats())
+                timer = converter.timer
+                with timer.stage('process_directory'):
+                    results = converter.process_directory(input_dir, os.path.join(work_dir, 'batch_out'),
+                                                          force=True)
+                success = all(result["overall_success"] for result in results)
+                message = "; ".join(result["field_message"] or result["encoding_message"]
+                                    for result in results if not result["overall_success"])
+    except Exception as e:
+        success = False
+        message = f"{type(e).__name__}: {e}"
+    
+    timings = {}
+    if timer is not None:
+        timings = {name: stats["wall_seconds"] for name, stats in timer.to_dict().items()}
+    queue.put(stage_result(stage, dataset, files, success, message, time.perf_counter() - wall_start,
+                           time.process_time() - cpu_start, timings, peak_rss_mb()))
+
+class BenchmarkRunner:
+    """Run the conversion benchmarks, each stage in a fresh process"""
+    
+    def __init__(self, mapping_file: str = "chinese-field-mapping.json",
+                 samples_dir: str = "sample_csvs", seed: int = 42):
+        """Initialize benchmark runner"""
+        self.mapping_file = mapping_file
+        self.generator = DatasetGenerator(mapping_file, samples_dir, seed)
+    
+    def run_stage(self, stage: str, dataset: Dict, work_dir: str, files: int) -> Dict:
+        """Run a stage in a child process so peak RSS is measured per stage"""
+        context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+        queue = context.Queue()
+        process = context.Process(target=_measure,
+                                  args=(stage, dataset, work_dir, self.mapping_file, files, queue))
+        process.start()
+        while True:
+            try:
+                result = queue.get(timeout=1.0)
+                break
+            except Empty:
+                if process.is_alive():
+                    continue
+            # The child has exited; a result it put just before may still be in the pipe
+            try:
+                result = queue.get(timeout=1.0)
+            except Empty:
+                result = stage_result(stage, dataset, files, False,
+                                      f"Benchmark process exited with code {process.exitcode}")
+            break
+        process.join()
+        return result
+    
+    def run_startup(self, runs: int = 10, budget_ms: float = 200.0) -> Dict:
+        """Time short CLI invocations against a budget over bare interpreter startup and check for eager imports"""
+        tool_dir = os.path.dirname(os.path.abspath(__file__))
+        work_dir = tempfile.mkdtemp(prefix='snipeit-startup-')
+        env = dict(os.environ, SNIPEIT_CSV_CACHE=os.path.join(work_dir, 'detection-cache.json'))
+        
+        def median_ms(argv: List[str]) -> float:
+            times = []
+            for _ in range(runs + 1):
+                started = time.perf_counter()
+                subprocess.run(argv, cwd=tool_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                times.append((time.perf_counter() - started) * 1000)
+            # The first run only warms caches
+            return statistics.median(times[1:])
+        
+        try:
+            interpreter_ms = median_ms([sys.executable, '-c', 'pass'])
+            print(f"Interpreter startup: {interpreter_ms:.1f} ms")
+            results = []
+            for label, script, arguments in STARTUP_COMMANDS:
+                argv = [sys.executable, script] + [argument.format(tmp=work_dir) for argument in arguments]
+                wall_ms = median_ms(argv)
+                overhead_ms = wall_ms - interpreter_ms
+                within = overhead_ms <= budget_ms
+                results.append({"command": label, "median_ms": round(wall_ms, 1),
+                                "overhead_ms": round(overhead_ms, 1), "within_budget": within})
+                print(f"  {label:<32} {wall_ms:8.1f} ms {overhead_ms:+8.1f} ms"
+                      f"{'' if within else '  OVER BUDGET'}")
+            
+            check = subprocess.run([sys.executable, '-c', LAZY_IMPORT_CHECK], cwd=tool_dir, env=env,
+                                   capture_output=True, text=True)
+            if check.returncode == 0:
+                eager = json.loads(check.stdout)
+                check_error = None
+            else:
+                eager = {}
+                # The last line of a traceback names the exception
+                check_error = (check.stderr.strip().splitlines() or [f"exit code {check.returncode}"])[-1]
+                print(f"  ✗ Lazy import check failed: {check_error}")
+            for name, loaded in eager.items():
+                if loaded:
+                    print(f"  ✗ CSVFieldConverter() loaded {name} eagerly")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        return {
+            "meta": {
+                "benchmark_version": __version__,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "runs": runs,
+                "budget_ms": budget_ms,
+                "interpreter_ms": round(interpreter_ms, 1),
+            },
+            "results": results,
+            "eager_loads": [name for name, loaded in eager.items() if loaded],
+            "lazy_import_error": check_error,
+            "success": (all(result["within_budget"] for result in results) and not any(eager.values())
+                        and check_error is None),
+        }
+    
+    def run(self, rows: int, columns: int, encodings: List[str], stages: List[str],
+            files: int = 4, asset_type: str = "assets", data_dir: Optional[str] = None) -> Dict:
+        """Generate datasets and run the selected stages for every encoding"""
+        work_root = data_dir or tempfile.mkdtemp(prefix='snipeit-bench-')
+        os.makedirs(work_root, exist_ok=True)
+        results = []
+        
+        try:
+            for encoding in encodings:
+                work_dir = os.path.join(work_root, encoding)
+                os.makedirs(work_dir, exist_ok=True)
+                dataset = self.generator.generate(os.path.join(work_dir, 'input.csv'),
+                                                  encoding, rows, columns, asset_type)
+                print(f"Generated {encoding} dataset: {dataset['rows']} rows, "
+                      f"{dataset['columns']} columns, {dataset['bytes'] / (1024 * 1024):.1f} MB")
+                
+                for stage in stages:
+                    result = self.run_stage(stage, dataset, work_dir, files)
+                    results.append(result)
+                    peak_rss = result['peak_rss_mb']
+                    print(f"  {stage:<8} {result['wall_seconds']:8.3f}s "
+                          f"{result['rows_per_second']:12.0f} rows/s "
+                          f"{result['mb_per_second']:8.2f} MB/s "
+                          f"{'n/a' if peak_rss is None else f'{peak_rss:.1f}':>8} MB peak RSS"
+                          f"{'' if result['success'] else '  FAILED: ' + result['message']}")
+        finally:
+            if not data_dir:
+                shutil.rmtree(work_root, ignore_errors=True)
+        
+        return {
+            "meta": {
+                "benchmark_version": __version__,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "rows": rows,
+                "columns": columns,
+                "files": files,
+                "asset_type": asset_type,
+            },
+            "results": results,
+        }
+
+def main():
+    """Main function for command line interface"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Snipe-IT CSV conversion tools on synthetic data',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python benchmark-convert.py run
+  python benchmark-convert.py run --rows 200000 --columns 40 --json bench.json
+  python benchmark-convert.py run --encodings gbk,utf-8-sig --stages convert,batch
+  python benchmark-convert.py generate gbk 100000 synthetic.csv
+  python benchmark-convert.py startup --budget-ms 150 --json startup.json
+        """
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    # Run command
+    run_parser = subparsers.add_parser('run', help='Run benchmarks')
+    run_parser.add_argument('--rows', type=int, default=50000, help='Rows per dataset (default: 50000)')
+    run_parser.add_argument('--columns', type=int, default=25, help='Columns per dataset (default: 25)')
+    run_parser.add_argument('--encodings', default=','.join(DEFAULT_ENCODINGS),
+                            help=f"Comma-separated encodings (default: {','.join(DEFAULT_ENCODINGS)})")
+    run_parser.add_argument('--stages', default=','.join(STAGES),
+                            help=f"Comma-separated stages (default: {','.join(STAGES)})")
+    run_parser.add_argument('--files', type=int, default=4, help='Files per batch stage (default: 4)')
+    run_parser.add_argument('--type', choices=['assets', 'users', 'accessories', 'consumables', 'licenses', 'components'],
+                            default='assets', help='Asset type (default: assets)')
+    run_parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    run_parser.add_argument('--data-dir', help='Keep generated data in this directory')
+    run_parser.add_argument('--json', help='Write results as JSON to this file')
+    run_parser.add_argument('--mapping', help='Custom mapping file path')
+    
+    # Generate command
+    generate_parser = subparsers.add_parser('generate', help='Generate a synthetic CSV file')
+    generate_parser.add_argument('encoding', help='Output encoding, e.g. gbk, gb18030, big5, utf-8-sig')
+    generate_parser.add_argument('rows', type=int, help='Number of data rows')
+    generate_parser.add_argument('output', help='Output CSV file path')
+    generate_parser.add_argument('--columns', type=int, default=25, help='Number of columns (default: 25)')
+    generate_parser.add_argument('--type', choices=['assets', 'users', 'accessories', 'consumables', 'licenses', 'components'],
+                                 default='assets', help='Asset type (default: assets)')
+    generate_parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    
+    # Startup command
+    startup_parser = subparsers.add_parser('startup', help='Check CLI startup time against a budget')
+    startup_parser.add_argument('--runs', type=int, default=10, help='Timed runs per command (default: 10)')
+    startup_parser.add_argument('--budget-ms', type=float, default=200.0,
+                                help='Allowed milliseconds over bare interpreter startup (default: 200)')
+    startup_parser.add_argument('--json', help='Write results as JSON to this file')
+    
+    args = parser.parse_args()
+    
+    if not args.command:
+        parser.print_help()
+        return
+    
+    mapping_file = args.mapping if hasattr(args, 'mapping') and args.mapping else 'chinese-field-mapping.json'
+    
+    if args.command == 'run':
+        stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            print(f"Error: Unknown stage(s): {', '.join(unknown)}")
+            sys.exit(1)
+        
+        runner = BenchmarkRunner(mapping_file, seed=args.seed)
+        report = runner.run(
+            args.rows,
+            args.columns,
+            [encoding.strip() for encoding in args.encodings.split(',') if encoding.strip()],
+            stages,
+            args.files,
+            args.type,
+            args.data_dir
+        )
+        
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results saved to: {args.json}")
+        
+        if not all(result["success"] for result in report["results"]):
+            sys.exit(1)
+    
+    elif args.command == 'startup':
+        report = BenchmarkRunner(mapping_file).run_startup(args.runs, args.budget_ms)
+        
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results saved to: {args.json}")
+        
+        if not report["success"]:
+            sys.exit(1)
+    
+    elif args.command == 'generate':
+        generator = DatasetGenerator(mapping_file, seed=args.seed)
+        dataset = generator.generate(args.output, args.encoding, args.rows, args.columns, args.type)
+        print(f"Generated {dataset['file']}: {dataset['rows']} rows, {dataset['columns']} columns, "
+              f"{dataset['bytes']} bytes ({dataset['encoding']})")
+
+if __name__ == '__main__':
+    main()
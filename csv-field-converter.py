@@ -9,32 +9,966 @@ Date: 2025-07-23
 Version: 1.0
 """
 
+__version__ = "1.0"
+
+import codecs
 import csv
+import hashlib
+import heapq
+import importlib.util
+import io
 import json
+import marshal
 import os
+import re
+import shutil
 import sys
+import tempfile
+import time
 import argparse
-import chardet
-from typing import Dict, List, Optional, Tuple
+import contextlib
+import struct
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# load_tool lives in encoding-converter.py, which every tool uses
+if 'encoding_converter' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        'encoding_converter', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encoding-converter.py'))
+    sys.modules['encoding_converter'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['encoding_converter'])
+load_tool = sys.modules['encoding_converter'].load_tool
+
+EMPTY_MAPPING = MappingProxyType({})
+
+CSV_DELIMITERS = ',;\t|'
+
+# How often convert_csv reports progress, in rows
+PROGRESS_ROWS = 10000
+
+# Header names (lowercased) whose values are translated with a value mapping table
+STATUS_FIELDS = frozenset(['status', '状态', '设备状态'])
+CATEGORY_FIELDS = frozenset(['category', '类别', '分类', '设备类型'])
+MANUFACTURER_FIELDS = frozenset(['manufacturer', '制造商', '厂商', '生产商', '品牌'])
+
+# Sidecar CSV headers of the reference entities, as in sample_csvs/<entity>-sample.csv
+REFERENCE_HEADERS = {
+    'categories': ['name', 'category type', 'notes', 'require acceptance', 'checkin email',
+                   'use default eula', 'eula text'],
+    'manufacturers': ['name', 'notes', 'support phone', 'support email', 'warranty lookup url', 'url'],
+    'locations': ['name', 'address', 'address2', 'city', 'state', 'country', 'zip', 'notes',
+                  'phone', 'fax', 'currency'],
+    'suppliers': ['name', 'address', 'address2', 'city', 'state', 'country', 'zip', 'notes',
+                  'contact', 'phone', 'fax'],
+    'companies': ['name'],
+    'models': ['Name', 'Category', 'Manufacturer', 'Model Notes', 'Model Number', 'Fieldset',
+               'Requestable', 'EOL', 'Min Qty'],
+}
+
+# Category type ItemImporter files the categories of each asset type under
+CATEGORY_TYPES = {
+    'assets': 'asset',
+    'accessories': 'accessory',
+    'consumables': 'consumable',
+    'licenses': 'license',
+    'components': 'component',
+}
+
+# Fields that must have a value in every row for the Snipe-IT importers, per asset type
+REQUIRED_FIELDS = {
+    'assets': ['Category'],
+    'users': ['Username'],
+    'accessories': ['Name', 'Category'],
+    'consumables': ['Name', 'Category'],
+    'licenses': ['Name'],
+    'components': ['Name', 'Category'],
+}
+
+# Date formats that the importers' strtotime() handles reliably
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%m/%d/%Y', '%d-%m-%Y',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M:%S']
+
+# Currency symbols and separators that Helper::ParseCurrency strips before parsing a cost
+COST_NOISE = re.compile(r'[\s,¥￥$€£]|RMB|CNY|USD|元')
+
+@lru_cache(maxsize=4096)
+def is_valid_date(value: str) -> bool:
+    """Check whether a date value will be understood by the importers"""
+    for date_format in DATE_FORMATS:
+        try:
+            datetime.strptime(value, date_format)
+            return True
+        except ValueError:
+            continue
+    return False
+
+def is_valid_cost(value: str) -> bool:
+    """Check whether a cost value parses as a number once currency noise is removed"""
+    try:
+        float(COST_NOISE.sub('', value))
+        return True
+    except ValueError:
+        return False
+
+class ColumnStats:
+    """Aggregated validation counters for one CSV column"""
+    
+    __slots__ = ('name', 'kind', 'filled', 'empty', 'invalid', 'max_length', 'invalid_samples', 'unmapped')
+    
+    def __init__(self, name: str, kind: str):
+        """Initialize counters for a column of the given kind (date, cost, value map or text)"""
+        self.name = name
+        self.kind = kind
+        self.filled = 0
+        self.empty = 0
+        self.invalid = 0
+        self.max_length = 0
+        self.invalid_samples = []
+        self.unmapped = Counter()
+    
+    def add_invalid(self, value: str, line_number: int, max_samples: int = 3) -> None:
+        """Count an invalid value, keeping the first few as examples"""
+        self.invalid += 1
+        if len(self.invalid_samples) < max_samples:
+            self.invalid_samples.append((line_number, value))
+    
+    def to_dict(self) -> Dict:
+        """Return the counters as a plain dict"""
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "filled": self.filled,
+            "empty": self.empty,
+            "invalid": self.invalid,
+            "max_length": self.max_length,
+            "invalid_samples": self.invalid_samples,
+            "unmapped": self.unmapped.most_common(10),
+        }
+
+class MissCollector:
+    """Per-table counts of values that had no mapping entry, merged from files into run totals"""
+    
+    __slots__ = ('tables', 'overflow', 'max_distinct')
+    
+    def __init__(self, max_distinct: int = 1000):
+        """Start with no misses"""
+        self.tables = {}
+        self.overflow = Counter()
+        self.max_distinct = max_distinct
+    
+    def __bool__(self) -> bool:
+        return bool(self.tables) or bool(self.overflow)
+    
+    def add(self, table: str, value: str, count: int = 1) -> None:
+        """Count a value of a table that had no mapping"""
+        counter = self.tables.get(table)
+        if counter is None:
+            counter = self.tables[table] = Counter()
+        if value in counter or len(counter) < self.max_distinct:
+            counter[value] += count
+        else:
+            self.overflow[table] += count
+    
+    def update(self, other) -> None:
+        """Merge another collector, or its to_dict() form, into this one"""
+        if isinstance(other, MissCollector):
+            other = other.to_dict()
+        for table, values in other.get("tables", {}).items():
+            for value, count in values.items():
+                self.add(table, value, count)
+        self.overflow.update(other.get("overflow", {}))
+    
+    def total(self) -> int:
+        """Number of misses over all tables"""
+        return sum(sum(counter.values()) for counter in self.tables.values()) + sum(self.overflow.values())
+    
+    def to_dict(self) -> Dict:
+        """Return the counts as plain dicts, most frequent first"""
+        return {
+            "tables": {table: dict(counter.most_common()) for table, counter in sorted(self.tables.items())},
+            "overflow": dict(self.overflow),
+        }
+    
+    def render(self, top: int = 10) -> str:
+        """Render the most frequent misses of each table"""
+        report = ""
+        for table, counter in sorted(self.tables.items()):
+            report += f"  {table}: {sum(counter.values())} unmapped, {len(counter)} distinct\n"
+            for value, count in counter.most_common(top):
+                report += f"    '{value}' x{count}\n"
+            if len(counter) > top:
+                report += f"    ... {len(counter) - top} more\n"
+            if self.overflow[table]:
+                report += f"    ... {self.overflow[table]} more beyond the first {self.max_distinct} distinct values\n"
+        return report
+    
+    def draft_mapping(self, top: Optional[int] = None) -> Dict:
+        """Return the most frequent misses in the chinese-field-mapping.json schema, with empty English names"""
+        draft = {}
+        for table, counter in sorted(self.tables.items()):
+            section, _, asset_type = table.partition('.')
+            entries = {value: "" for value, _ in counter.most_common(top)}
+            if asset_type:
+                draft.setdefault(section, {})[asset_type] = entries
+            else:
+                draft[section] = entries
+        return draft
+    
+    def save_draft_mapping(self, output_file: str, top: Optional[int] = None) -> None:
+        """Write draft_mapping() as JSON formatted like the mapping file"""
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.draft_mapping(top), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+def short_hash(text: str, blake2b=hashlib.blake2b, from_bytes=int.from_bytes) -> int:
+    """64-bit hash of a string, as stored in a DeltaIndex"""
+    return from_bytes(blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+
+def repeated_values(values: array, run_size: int = 1 << 20) -> Tuple[int, set]:
+    """Sort an array('Q') in place and return its number of repeats and the distinct repeated values"""
+    # Runs are sorted separately and merged, so only one run is ever expanded into a list
+    for start in range(0, len(values), run_size):
+        values[start:start + run_size] = array('Q', sorted(values[start:start + run_size]))
+    view = memoryview(values)
+    repeats = 0
+    repeated = set()
+    previous = None
+    for value in heapq.merge(*(view[start:start + run_size] for start in range(0, len(values), run_size))):
+        if value == previous:
+            repeats += 1
+            repeated.add(value)
+        previous = value
+    view.release()
+    return repeats, repeated
+
+class DeltaIndex:
+    """Sorted Asset Tag and row hashes of the previous converted output, for delta exports"""
+    
+    MAGIC = b'SITDLT01'
+    HEADER = struct.Struct('<8sQQ')
+    
+    def __init__(self, index_file: str):
+        """Load the previous index, if any"""
+        self.index_file = index_file
+        self.header_hash, self.keys, self.values = self._read_file()
+        self.new_header_hash = None
+        self.new_keys = array('Q')
+        self.new_values = array('Q')
+        self.stats = {"previous_rows": len(self.keys), "new": 0, "changed": 0, "unchanged": 0,
+                      "untagged": 0, "removed": 0, "full": not self.keys}
+    
+    def _read_file(self) -> Tuple[Optional[int], array, array]:
+        """Read the index file, treating a missing or damaged one as empty"""
+        try:
+            with open(self.index_file, 'rb') as f:
+                magic, header_hash, count = self.HEADER.unpack(f.read(self.HEADER.size))
+                records = array('Q')
+                records.frombytes(f.read(count * 16))
+        except (OSError, struct.error, ValueError):
+            return None, array('Q'), array('Q')
+        if magic != self.MAGIC or len(records) != count * 2:
+            return None, array('Q'), array('Q')
+        if sys.byteorder != 'little':
+            records.byteswap()
+        return header_hash, records[0::2], records[1::2]
+    
+    def previous_hash(self, tag_hash: int) -> Optional[int]:
+        """Return the row hash the previous run recorded for a tag"""
+        position = bisect_left(self.keys, tag_hash)
+        if position < len(self.keys) and self.keys[position] == tag_hash:
+            return self.values[position]
+        return None
+    
+    def filter(self, rows: Iterator[List[str]], header: List[str]) -> Iterator[List[str]]:
+        """Yield the new and changed rows of converted rows, indexing all of them"""
+        tag_column = next((position for position, name in enumerate(header)
+                           if name.strip().lower() == 'asset tag'), None)
+        if tag_column is None:
+            raise ValueError("delta mode needs an Asset Tag column")
+        
+        self.new_header_hash = short_hash('\x1f'.join(header))
+        if self.new_header_hash != self.header_hash:
+            # Row hashes of a different header cannot be compared, so everything is exported
+            self.keys = self.values = array('Q')
+            self.stats["full"] = True
+        
+        stats = self.stats
+        previous_hash = self.previous_hash
+        add_key = self.new_keys.append
+        add_value = self.new_values.append
+        for row in rows:
+            tag = row[tag_column] if tag_column < len(row) else ''
+            if not tag:
+                stats["untagged"] += 1
+                yield row
+                continue
+            
+            tag_hash = short_hash(tag)
+            row_hash = short_hash('\x1f'.join(row))
+            add_key(tag_hash)
+            add_value(row_hash)
+            
+            previous = previous_hash(tag_hash)
+            if previous == row_hash:
+                stats["unchanged"] += 1
+                continue
+            stats["changed" if previous is not None else "new"] += 1
+            yield row
+    
+    def finish(self) -> None:
+        """Sort the new index, keeping the last row of duplicate tags, and count removed tags"""
+        # A transient dict keeps the last row hash of each tag
+        latest = dict(zip(self.new_keys, self.new_values))
+        self.new_keys = array('Q', sorted(latest))
+        self.new_values = array('Q', map(latest.__getitem__, self.new_keys))
+        self.stats["removed"] = len(self.keys) - sum(map(latest.__contains__, self.keys))
+    
+    def save(self) -> None:
+        """Atomically replace the index file with the index of this run"""
+        records = array('Q', bytes(len(self.new_keys) * 16))
+        records[0::2] = self.new_keys
+        records[1::2] = self.new_values
+        if sys.byteorder != 'little':
+            records.byteswap()
+        
+        directory = os.path.dirname(os.path.abspath(self.index_file))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.new_header_hash or 0, len(self.new_keys)))
+                records.tofile(f)
+            os.chmod(temp_path, load_tool('encoding-converter.py').new_file_mode())
+            os.replace(temp_path, self.index_file)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+class ReferenceCollector:
+    """Distinct reference entities (categories, manufacturers, ...) named by converted rows"""
+    
+    __slots__ = ('entities',)
+    
+    def __init__(self):
+        """Start with no entities"""
+        self.entities = {entity: {} for entity in REFERENCE_HEADERS}
+    
+    def __bool__(self) -> bool:
+        return any(self.entities.values())
+    
+    @staticmethod
+    def key(entity: str, row: List[str]):
+        """Return the lookup key of a sidecar row: name and type for categories, name and number for models"""
+        if entity == 'categories':
+            return row[0], row[1]
+        if entity == 'models':
+            return row[0], row[4]
+        return row[0]
+    
+    def collect(self, rows: Iterator[List[str]], header: List[str],
+                asset_type: str = 'assets') -> Iterator[List[str]]:
+        """Pass converted rows through unchanged, recording the entities they name"""
+        index = {}
+        for position, name in enumerate(header):
+            index.setdefault(name.strip().lower(), position)
+        
+        def column(*names: str) -> Optional[int]:
+            return next((index[name] for name in names if name in index), None)
+        
+        named = [(self.entities[entity], position) for entity, position in (
+            ('manufacturers', column('manufacturer')),
+            ('locations', column('location')),
+            ('suppliers', column('supplier')),
+            ('companies', column('company')),
+        ) if position is not None]
+        categories = self.entities['categories']
+        category = column('category')
+        category_type = CATEGORY_TYPES.get(asset_type, '')
+        if not category_type:
+            category = None
+        
+        # Only assets reference models
+        models = self.entities['models']
+        model_columns = [column('model name', 'model'), category, column('manufacturer'),
+                         column('model notes'), column('model number')]
+        if asset_type != 'assets' or (model_columns[0] is None and model_columns[4] is None):
+            model_columns = None
+        
+        width = len(header)
+        for row in rows:
+            values = row if len(row) >= width else row + [''] * (width - len(row))
+            
+            for entities, position in named:
+                name = values[position]
+                if name and name not in entities:
+                    entities[name] = [name]
+            
+            if category is not None:
+                name = values[category]
+                if name and (name, category_type) not in categories:
+                    categories[name, category_type] = [name, category_type]
+            
+            if model_columns is not None:
+                model = [values[position] if position is not None else '' for position in model_columns]
+                # ItemImporter names a model after its number when the name is missing
+                if not model[0]:
+                    model[0] = model[4]
+                if model[0] and (model[0], model[4]) not in models:
+                    models[model[0], model[4]] = model
+            
+            yield row
+    
+    def update(self, other) -> None:
+        """Merge another collector, or its to_dict() form, keeping the first row seen for each key"""
+        if isinstance(other, ReferenceCollector):
+            other = other.to_dict()
+        for entity, rows in other.items():
+            entities = self.entities[entity]
+            for row in rows:
+                entities.setdefault(self.key(entity, row), row)
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of distinct entities of each kind"""
+        return {entity: len(rows) for entity, rows in self.entities.items()}
+    
+    def to_dict(self) -> Dict[str, List[List[str]]]:
+        """Return the sidecar rows of each entity, in first-seen order"""
+        return {entity: list(rows.values()) for entity, rows in self.entities.items() if rows}
+    
+    def write(self, output_dir: str) -> List[str]:
+        """Write <entity>.csv for every entity seen into output_dir, returning the files written"""
+        os.makedirs(output_dir, exist_ok=True)
+        written = []
+        for entity, rows in self.entities.items():
+            if not rows:
+                continue
+            header = REFERENCE_HEADERS[entity]
+            output_file = os.path.join(output_dir, f"{entity}.csv")
+            with open(output_file, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for row in rows.values():
+                    writer.writerow(row + [''] * (len(header) - len(row)))
+            written.append(output_file)
+        return written
+
+def make_value_translator(mapping: Dict[str, str],
+                          record_miss: Optional[Callable[[str], None]] = None) -> Callable[[str], str]:
+    """Build a cell translator that looks stripped values up in a mapping table, reporting misses to record_miss"""
+    get = mapping.get
+    if record_miss is None:
+        def translate(value: str) -> str:
+            value = value.strip()
+            return get(value, value)
+        
+        return translate
+    
+    known = frozenset(mapping.values())
+    
+    def translate(value: str) -> str:
+        value = value.strip()
+        english = get(value)
+        if english is not None:
+            return english
+        if value and value not in known:
+            record_miss(value)
+        return value
+    
+    return translate
+
+def normalize_field_key(field_name: str) -> str:
+    """Normalize a field name for tolerant lookups (full-width forms, case and whitespace)"""
+    return ''.join(unicodedata.normalize('NFKC', field_name).casefold().split())
+
+class MappingIndex:
+    """Immutable lookup tables compiled once from the field mappings"""
+    
+    __slots__ = ('english_fields', 'by_type', 'reverse', 'normalized_by_type', 'normalized')
+    
+    def __init__(self, field_mappings: Dict[str, Dict[str, str]]):
+        """Compile the per-type field mappings"""
+        english_fields = set()
+        by_type = {}
+        reverse = {}
+        normalized_by_type = {}
+        normalized = {}
+        
+        for asset_type, mappings in field_mappings.items():
+            english_fields.update(mappings.values())
+            by_type[asset_type] = MappingProxyType(dict(mappings))
+            
+            type_normalized = {}
+            for source_name, english_name in mappings.items():
+                # The first asset type that maps a name wins, as in the original scan order
+                reverse.setdefault(source_name, english_name)
+                for variant in (source_name, english_name):
+                    type_normalized.setdefault(normalize_field_key(variant), english_name)
+            normalized_by_type[asset_type] = MappingProxyType(type_normalized)
+            
+            for key, english_name in type_normalized.items():
+                normalized.setdefault(key, english_name)
+        
+        object.__setattr__(self, 'english_fields', frozenset(english_fields))
+        object.__setattr__(self, 'by_type', MappingProxyType(by_type))
+        object.__setattr__(self, 'reverse', MappingProxyType(reverse))
+        object.__setattr__(self, 'normalized_by_type', MappingProxyType(normalized_by_type))
+        object.__setattr__(self, 'normalized', MappingProxyType(normalized))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("MappingIndex is immutable")
+    
+    def __getstate__(self) -> Dict:
+        """Return the tables as plain dicts and sets (mapping proxies cannot be serialized)"""
+        return {
+            'english_fields': self.english_fields,
+            'by_type': {asset_type: dict(mappings) for asset_type, mappings in self.by_type.items()},
+            'reverse': dict(self.reverse),
+            'normalized_by_type': {asset_type: dict(mappings)
+                                   for asset_type, mappings in self.normalized_by_type.items()},
+            'normalized': dict(self.normalized),
+        }
+    
+    def __setstate__(self, state: Dict) -> None:
+        """Restore the tables saved by __getstate__ without compiling them again"""
+        object.__setattr__(self, 'english_fields', frozenset(state['english_fields']))
+        object.__setattr__(self, 'by_type', MappingProxyType(
+            {asset_type: MappingProxyType(mappings) for asset_type, mappings in state['by_type'].items()}))
+        object.__setattr__(self, 'reverse', MappingProxyType(state['reverse']))
+        object.__setattr__(self, 'normalized_by_type', MappingProxyType(
+            {asset_type: MappingProxyType(mappings)
+             for asset_type, mappings in state['normalized_by_type'].items()}))
+        object.__setattr__(self, 'normalized', MappingProxyType(state['normalized']))
+    
+    def lookup(self, field_name: str, asset_type: str = 'assets') -> Optional[str]:
+        """Return the English name for a field, or None if it is not mapped"""
+        if field_name in self.english_fields:
+            return field_name
+        
+        english_name = self.by_type.get(asset_type, EMPTY_MAPPING).get(field_name)
+        if english_name is None:
+            english_name = self.reverse.get(field_name)
+        if english_name is None:
+            key = normalize_field_key(field_name)
+            english_name = self.normalized_by_type.get(asset_type, EMPTY_MAPPING).get(key)
+            if english_name is None:
+                english_name = self.normalized.get(key)
+        return english_name
+
+class CompiledMapping:
+    """A mapping file ready for use: its value tables and the MappingIndex of its field mappings"""
+    
+    __slots__ = ('field_mappings', 'status_mappings', 'category_mappings', 'manufacturer_mappings', 'index')
+    
+    def __init__(self, data: Dict):
+        """Compile the parsed JSON of a mapping file"""
+        self.field_mappings = data.get('field_mappings', {})
+        self.status_mappings = data.get('status_mappings', {})
+        self.category_mappings = data.get('category_mappings', {})
+        self.manufacturer_mappings = data.get('manufacturer_mappings', {})
+        self.index = MappingIndex(self.field_mappings)
+    
+    def __getstate__(self) -> Dict:
+        """Return the tables as plain dicts and sets"""
+        return {
+            'field_mappings': self.field_mappings,
+            'status_mappings': self.status_mappings,
+            'category_mappings': self.category_mappings,
+            'manufacturer_mappings': self.manufacturer_mappings,
+            'index': self.index.__getstate__(),
+        }
+    
+    def __setstate__(self, state: Dict) -> None:
+        """Restore the tables saved by __getstate__"""
+        self.field_mappings = state['field_mappings']
+        self.status_mappings = state['status_mappings']
+        self.category_mappings = state['category_mappings']
+        self.manufacturer_mappings = state['manufacturer_mappings']
+        self.index = MappingIndex.__new__(MappingIndex)
+        self.index.__setstate__(state['index'])
+
+# Bump when the layout of CompiledMapping.__getstate__ changes
+MAPPING_CACHE_VERSION = 1
+
+def compiled_mapping_file(mapping_file: str) -> str:
+    """Return where the compiled form of a mapping file is cached, next to the detection cache"""
+    encoding_tools = load_tool('encoding-converter.py')
+    cache_dir = os.path.dirname(os.environ.get('SNIPEIT_CSV_CACHE') or encoding_tools.DEFAULT_CACHE_FILE)
+    digest = hashlib.blake2b(os.path.abspath(mapping_file).encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, f"mapping-{digest}.marshal")
+
+@lru_cache(maxsize=8)
+def _load_compiled_mapping(mapping_file: str, mtime_ns: int, size: int, use_cache: bool = True) -> CompiledMapping:
+    """Load one version (path, mtime and size) of a mapping file, once per process"""
+    if not use_cache:
+        with open(mapping_file, 'r', encoding='utf-8') as f:
+            return CompiledMapping(json.load(f))
+    
+    key = (MAPPING_CACHE_VERSION, marshal.version, mapping_file, mtime_ns, size)
+    cache_file = compiled_mapping_file(mapping_file)
+    try:
+        with open(cache_file, 'rb') as f:
+            # One read: marshal.load on a file object reads it in small pieces
+            cached_key, state = marshal.loads(f.read())
+        if cached_key == key:
+            compiled = CompiledMapping.__new__(CompiledMapping)
+            compiled.__setstate__(state)
+            return compiled
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        pass
+    
+    with open(mapping_file, 'r', encoding='utf-8') as f:
+        compiled = CompiledMapping(json.load(f))
+    
+    # A cache that cannot be written only costs the next run a recompile
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_file), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump((key, compiled.__getstate__()), f)
+        os.replace(temp_path, cache_file)
+    except OSError:
+        pass
+    return compiled
+
+def load_compiled_mapping(mapping_file: str, use_cache: bool = True) -> CompiledMapping:
+    """Load a mapping file, from its compiled marshal cache while the file is unchanged"""
+    stat = os.stat(mapping_file)
+    return _load_compiled_mapping(os.path.abspath(mapping_file), stat.st_mtime_ns, stat.st_size, use_cache)
+
+# Codecs (by their canonical codecs.lookup name) in which the quote and newline
+# bytes only ever stand for themselves, so files can be split at raw byte offsets
+CHUNKABLE_ENCODINGS = frozenset(['utf-8', 'utf-8-sig', 'ascii', 'gbk', 'gb2312', 'gb18030',
+                                 'big5', 'big5hkscs', 'cp950', 'cp936', 'iso8859-1', 'cp1252'])
+
+def record_boundaries(file_path: str, start: int, chunk_size: int, limit: Optional[int] = None,
+                      block_size: int = 1 << 20) -> List[int]:
+    """Return byte offsets from start that split a CSV file into chunks at newlines outside quoted fields"""
+    boundaries = [start]
+    next_target = start + chunk_size
+    in_quotes = False
+    position = start
+    
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        while limit is None or len(boundaries) <= limit:
+            block = f.read(block_size)
+            if not block:
+                break
+            
+            i = 0
+            while limit is None or len(boundaries) <= limit:
+                j = next_target - position
+                if j >= len(block):
+                    break
+                if j > i:
+                    in_quotes ^= block.count(b'"', i, j) & 1
+                    i = j
+                newline = block.find(b'\n', i)
+                if newline == -1:
+                    break
+                in_quotes ^= block.count(b'"', i, newline) & 1
+                i = newline + 1
+                if not in_quotes:
+                    boundaries.append(position + i)
+                    next_target = position + i + chunk_size
+            
+            in_quotes ^= block.count(b'"', i) & 1
+            position += len(block)
+        
+        if limit is None or len(boundaries) <= limit:
+            size = f.seek(0, os.SEEK_END)
+            if boundaries[-1] != size:
+                boundaries.append(size)
+    
+    return boundaries
+
+# Per-process converter used by chunk workers, created once by _init_chunk_worker
+_chunk_converter = None
+
+def _init_chunk_worker(mapping_file: str, mapping_cache: bool = True) -> None:
+    """Initialise a chunk worker with its own converter and mapping tables"""
+    global _chunk_converter
+    _chunk_converter = CSVFieldConverter(mapping_file, mapping_cache=mapping_cache)
+
+def _convert_chunk(task: Tuple) -> Tuple[int, int, Dict, Optional[Dict]]:
+    """Translate one byte range into a part file, returning (rows, Chinese characters, misses, references)"""
+    input_file, start, end, encoding, delimiter, converted_header, asset_type, collect, part_file = task
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode(encoding)
+    
+    rows = 0
+    misses = MissCollector()
+    references = ReferenceCollector() if collect else None
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+    with open(part_file, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        converted_rows = _chunk_converter.convert_rows(reader, converted_header, misses)
+        if references is not None:
+            converted_rows = references.collect(converted_rows, converted_header, asset_type)
+        for converted_row in converted_rows:
+            writer.writerow(converted_row)
+            rows += 1
+    
+    return (rows, _chunk_converter.encoding_tools.classify_text(text)['chinese'], misses.to_dict(),
+            references.to_dict() if references is not None else None)
+
+# UTF-8 forms of the characters str.strip() removes, other than CR and LF
+_STRIPPED_ASCII = rb'[\t\x0b\x0c\x1c-\x1f ]'
+_STRIPPED_WIDE = rb'\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80'
+# A quoted field as csv.writer writes it, and the characters that make it need quotes
+_QUOTED_FIELD = re.compile(rb'"[^"]*(?:""[^"]*)*"')
+_NEEDS_QUOTES = re.compile(rb'[,"\r\n]')
+
+def passthrough_screen(translated_values: List[str]) -> Tuple[List[re.Pattern], List[re.Pattern]]:
+    """Compile the byte patterns (for any and for non-ASCII text) that find changes outside quoted fields"""
+    patterns = [
+        rb'[,\r\n](?:' + _STRIPPED_ASCII + b'|' + _STRIPPED_WIDE + rb')',
+        _STRIPPED_ASCII + rb'[,\r\n]',
+        rb'\r(?!\n)',
+        rb'\n(?<!\r\n)',
+    ]
+    # The last bytes of _STRIPPED_WIDE, loosely, so the pattern starts with its lead bytes
+    wide_patterns = [rb'[\xc2\xe1-\xe3](?:[\x85\xa0]|\x9a\x80|\x80[\x80-\x8a\xa8\xa9\xaf]|\x81\x9f|\x80\x80)[,\r\n]']
+    for values, target in (([value for value in translated_values if value.isascii()], patterns),
+                           ([value for value in translated_values if not value.isascii()], wide_patterns)):
+        if values:
+            target.append(b'|'.join(re.escape(value.encode('utf-8', 'surrogatepass'))
+                                    for value in sorted(values, key=len, reverse=True)))
+    return [re.compile(pattern) for pattern in patterns], [re.compile(pattern) for pattern in wide_patterns]
+
+def is_canonical_csv(buffer, screen: Tuple[List[re.Pattern], List[re.Pattern]], translated_values: frozenset,
+                     chunk_size: int = 1 << 20) -> bool:
+    """Check that a UTF-8 CSV buffer is byte for byte what convert_csv would write for it"""
+    if not buffer or buffer[-2:] != b'\r\n':
+        return False
+    
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    ascii_only = True
+    try:
+        for start in range(0, len(buffer), chunk_size):
+            chunk = buffer[start:start + chunk_size]
+            decoder.decode(chunk, final=start + chunk_size >= len(buffer))
+            ascii_only = ascii_only and chunk.isascii()
+    except UnicodeDecodeError:
+        return False
+    screen = screen[0] if ascii_only else screen[0] + screen[1]
+    
+    size = len(buffer)
+    unquoted_start = 0
+    position = buffer.find(b'"')
+    while position != -1:
+        if any(pattern.search(buffer, unquoted_start, position) for pattern in screen):
+            return False
+        # A quote must open a field and close it at a field boundary
+        match = _QUOTED_FIELD.match(buffer, position)
+        if match is None:
+            return False
+        end = match.end()
+        if position and buffer[position - 1] not in b',\n':
+            return False
+        if end < size and buffer[end] not in b',\r':
+            return False
+        if not _NEEDS_QUOTES.search(buffer, position + 1, end - 1):
+            # csv.writer only quotes an empty field when it is alone on its row
+            alone = (not position or buffer[position - 1] == 0x0a) and end < size and buffer[end] == 0x0d
+            if end - position != 2 or not alone:
+                return False
+        value = bytes(buffer[position + 1:end - 1]).replace(b'""', b'"').decode('utf-8')
+        if value != value.strip() or value in translated_values:
+            return False
+        unquoted_start = end
+        position = buffer.find(b'"', end)
+    return not any(pattern.search(buffer, unquoted_start) for pattern in screen)
+
+def copy_file(input_file: str, output_file: str, hardlink: bool = False) -> str:
+    """Copy a file inside the kernel where possible, returning the method that was used"""
+    if hardlink:
+        link_file = f"{output_file}.link-{os.getpid()}"
+        try:
+            os.link(input_file, link_file)
+            os.replace(link_file, output_file)
+            return 'hardlink'
+        except OSError:
+            if os.path.lexists(link_file):
+                os.unlink(link_file)
+    
+    with open(input_file, 'rb') as src, open(output_file, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = 0
+                while copied < size:
+                    count = os.copy_file_range(src.fileno(), dst.fileno(), size - copied)
+                    if count == 0:
+                        break
+                    copied += count
+                return 'copy_file_range'
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        
+        if hasattr(os, 'sendfile'):
+            try:
+                copied = 0
+                while copied < size:
+                    count = os.sendfile(dst.fileno(), src.fileno(), copied, size - copied)
+                    if count == 0:
+                        break
+                    copied += count
+                return 'sendfile'
+            except OSError:
+                dst.seek(0)
+                dst.truncate()
+        
+        shutil.copyfileobj(src, dst, 1 << 20)
+        return 'copy'
+
+@dataclass(slots=True)
+class ConversionResult:
+    """Outcome of converting one CSV file"""
+    input_file: str
+    output_file: str
+    asset_type: str = 'assets'
+    success: bool = False
+    message: str = ''
+    encoding: Optional[str] = None
+    encoding_confidence: Optional[float] = None
+    rows: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    chinese_characters: int = 0
+    field_mappings: List[Tuple[str, str]] = field(default_factory=list)
+    unmapped_fields: List[str] = field(default_factory=list)
+    misses: Dict = field(default_factory=dict)
+    delta: Optional[Dict] = None
+    seconds: float = 0.0
+    noop: bool = False
+    copy_method: Optional[str] = None
+    chunks: int = 0
+    jobs: int = 1
+    input_hash: Optional[str] = None
+    
+    def render(self) -> str:
+        """Render the text report, or the error message of a failed conversion"""
+        if not self.success:
+            return self.message
+        
+        if self.noop:
+            report = f"No conversion needed: file is already UTF-8 with Snipe-IT English headers\n"
+            report += f"Input file: {self.input_file}\n"
+            report += f"Output file: {self.output_file}\n"
+            report += f"Copy method: {self.copy_method}\n"
+            report += f"Size: {self.bytes_written} bytes\n"
+            return report
+        
+        report = f"Conversion completed successfully!\n"
+        report += f"Input file: {self.input_file}\n"
+        report += f"Output file: {self.output_file}\n"
+        report += f"Asset type: {self.asset_type}\n"
+        report += f"Source encoding: {self.encoding}\n"
+        report += f"Total rows: {self.rows}\n"
+        report += f"Chinese characters: {self.chinese_characters}\n"
+        report += f"Field mappings applied:\n"
+        
+        if self.field_mappings:
+            for original_field, converted_field in self.field_mappings:
+                report += f"  - '{original_field}' -> '{converted_field}'\n"
+        else:
+            report += "  - No field mappings needed (all fields already in English)\n"
+        
+        if self.misses.get("tables"):
+            misses = MissCollector()
+            misses.update(self.misses)
+            report += f"Headers and values without a mapping:\n"
+            report += misses.render()
+        
+        if self.delta is not None:
+            delta = self.delta
+            if delta["full"]:
+                report += f"Delta: no usable previous index, all rows written\n"
+            report += (f"Delta: {delta['new']} new, {delta['changed']} changed, {delta['untagged']} without Asset Tag "
+                       f"written; {delta['unchanged']} unchanged skipped; {delta['removed']} removed since last run\n")
+        
+        if self.chunks:
+            report += f"Parallel chunks: {self.chunks} on {self.jobs} workers\n"
+        return report
+
+@dataclass(slots=True)
+class HeaderCheck:
+    """Result of checking a CSV header for Snipe-IT import, rendered by render()"""
+    file: str
+    encoding: str
+    fields: List[str]
+    missing_fields: List[str]
+    issues: List[str]
+    valid: bool = field(init=False)
+    
+    def __post_init__(self):
+        self.valid = not self.missing_fields and not self.issues
+    
+    def render(self) -> str:
+        """Render the text validation report"""
+        report = f"CSV Validation Report for: {self.file}\n"
+        report += f"Encoding: {self.encoding}\n"
+        report += f"Total fields: {len(self.fields)}\n"
+        report += f"Fields: {', '.join(self.fields)}\n\n"
+        
+        if self.missing_fields:
+            report += f"Missing required fields: {', '.join(self.missing_fields)}\n"
+        
+        if self.issues:
+            report += f"Issues found:\n"
+            for issue in self.issues:
+                report += f"  - {issue}\n"
+        else:
+            report += "No issues found.\n"
+        
+        return report
+
+def format_report(data, report_format: str = 'text') -> str:
+    """Format a result model (or plain dict) as JSON, or as text via its render()"""
+    if report_format == 'text':
+        return data.render()
+    if not isinstance(data, dict):
+        data = asdict(data)
+    return json.dumps(data, ensure_ascii=False, indent=2 if report_format == 'json' else None)
 
 class CSVFieldConverter:
     """CSV field converter for Snipe-IT Chinese field names"""
     
-    def __init__(self, mapping_file: str = "chinese-field-mapping.json"):
+    def __init__(self, mapping_file: str = "chinese-field-mapping.json", cache=None, timer=None,
+                 mapping_cache: bool = True):
         """Initialize converter with field mapping configuration"""
         self.mapping_file = mapping_file
-        self.field_mappings = {}
-        self.load_mappings()
+        self.cache = cache
+        self.mapping_cache = mapping_cache
+        # Mapping misses of every file converted by this instance
+        self.misses = MissCollector()
+        # The mapping file is loaded on first use; commands like template skip detection entirely
+        self._mappings = None
+        self._passthrough_screen = None
+        
+        self.encoding_tools = load_tool('encoding-converter.py')
+        self.timer = timer or self.encoding_tools.StageTimer()
+        self.encoding_detector = self.encoding_tools.EncodingDetector(
+            ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5'], confidence_threshold=0.7, cache=cache,
+            timer=self.timer
+        )
     
     def load_mappings(self) -> None:
         """Load field mappings from JSON configuration file"""
         try:
-            with open(self.mapping_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.field_mappings = data.get('field_mappings', {})
-                self.status_mappings = data.get('status_mappings', {})
-                self.category_mappings = data.get('category_mappings', {})
-                self.manufacturer_mappings = data.get('manufacturer_mappings', {})
+            self._mappings = load_compiled_mapping(self.mapping_file, self.mapping_cache)
         except FileNotFoundError:
             print(f"Error: Mapping file '{self.mapping_file}' not found.")
             sys.exit(1)
@@ -42,201 +976,721 @@ class CSVFieldConverter:
             print(f"Error: Invalid JSON in mapping file: {e}")
             sys.exit(1)
     
+    @property
+    def mappings(self) -> CompiledMapping:
+        """The compiled mapping file, loaded on first use"""
+        if self._mappings is None:
+            self.load_mappings()
+        return self._mappings
+    
+    @property
+    def field_mappings(self) -> Dict[str, Dict[str, str]]:
+        return self.mappings.field_mappings
+    
+    @property
+    def status_mappings(self) -> Dict[str, str]:
+        return self.mappings.status_mappings
+    
+    @property
+    def category_mappings(self) -> Dict[str, str]:
+        return self.mappings.category_mappings
+    
+    @property
+    def manufacturer_mappings(self) -> Dict[str, str]:
+        return self.mappings.manufacturer_mappings
+    
+    @property
+    def mapping_index(self) -> MappingIndex:
+        return self.mappings.index
+    
     def detect_encoding(self, file_path: str) -> str:
-        """Detect file encoding using chardet"""
-        with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            encoding = result['encoding']
-            confidence = result['confidence']
-            
-            print(f"Detected encoding: {encoding} (confidence: {confidence:.2f})")
-            
-            # If confidence is low, try common encodings
-            if confidence < 0.7:
-                for enc in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']:
-                    try:
-                        with open(file_path, 'r', encoding=enc) as test_file:
-                            test_file.read()
-                        print(f"Successfully read file with {enc} encoding")
-                        return enc
-                    except UnicodeDecodeError:
-                        continue
-            
-            return encoding or 'utf-8'
+        """Detect file encoding from sampled chunks using chardet"""
+        return self.detect_encoding_with_confidence(file_path)[0]
     
-    def convert_field_name(self, field_name: str, asset_type: str = 'assets') -> str:
+    def detect_encoding_with_confidence(self, file_path: str) -> Tuple[str, float]:
+        """Detect file encoding, also returning the confidence of the decision"""
+        with self.timer.stage('detect'):
+            result = self.encoding_detector.detect(file_path)
+        
+        print(f"Detected encoding: {result['chardet_encoding']} (confidence: {result['chardet_confidence']:.2f})")
+        
+        # Low confidence results were settled by trying common encodings
+        if result['method'] in ('sample', 'full'):
+            print(f"Successfully read file with {result['encoding']} encoding")
+        
+        return result['encoding'] or 'utf-8', result['confidence']
+    
+    def convert_field_name(self, field_name: str, asset_type: str = 'assets',
+                           misses: Optional[MissCollector] = None) -> str:
         """Convert Chinese field name to English field name"""
         # Remove leading/trailing whitespace
         field_name = field_name.strip()
         
-        # Check if field is already in English
-        if field_name in self.get_all_english_fields():
-            return field_name
-        
-        # Look up in mappings
-        mappings = self.field_mappings.get(asset_type, {})
-        if field_name in mappings:
-            return mappings[field_name]
-        
-        # Check in other asset types if not found
-        for other_type, other_mappings in self.field_mappings.items():
-            if field_name in other_mappings:
-                return other_mappings[field_name]
+        english_name = self.mapping_index.lookup(field_name, asset_type)
+        if english_name is not None:
+            return english_name
         
         # Return original if no mapping found
-        print(f"Warning: No mapping found for field '{field_name}'")
+        if misses is not None:
+            misses.add(f"field_mappings.{asset_type}", field_name)
         return field_name
     
+    def value_table_for(self, field_name: str) -> Optional[str]:
+        """Return the name of the value mapping table that applies to a column, if any"""
+        name = field_name.lower()
+        if name in STATUS_FIELDS:
+            return 'status_mappings'
+        if name in CATEGORY_FIELDS:
+            return 'category_mappings'
+        if name in MANUFACTURER_FIELDS:
+            return 'manufacturer_mappings'
+        return None
+    
+    def value_mapping_for(self, field_name: str) -> Optional[Dict[str, str]]:
+        """Return the value mapping table that applies to a column, if any"""
+        table = self.value_table_for(field_name)
+        return getattr(self, table) if table is not None else None
+    
+    def build_value_translators(self, header: List[str],
+                                misses: Optional[MissCollector] = None) -> List[Callable[[str], str]]:
+        """Resolve one translator per column so rows need no per-cell field-name checks"""
+        translators = []
+        for field_name in header:
+            table = self.value_table_for(field_name)
+            if table is None:
+                # Untouched columns are only stripped, as convert_field_value does
+                translators.append(str.strip)
+                continue
+            record_miss = partial(misses.add, table) if misses is not None else None
+            translators.append(make_value_translator(getattr(self, table), record_miss))
+        return translators
+    
     def convert_field_value(self, field_name: str, value: str) -> str:
         """Convert Chinese field values to English equivalents"""
         if not value or not isinstance(value, str):
             return value
         
         value = value.strip()
+        mapping = self.value_mapping_for(field_name)
+        if mapping is None:
+            return value
+        return mapping.get(value, value)
+    
+    def get_all_english_fields(self) -> List[str]:
+        """Get all English field names from mappings"""
+        return list(self.mapping_index.english_fields)
+    
+    def sniff_delimiter(self, file_path: str, infile) -> str:
+        """Detect the CSV delimiter from the start of an open file, using the cache if possible"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.fingerprint(file_path)
+            dialect = self.cache.get(key, 'dialect')
+            if dialect is not None:
+                return dialect['delimiter']
         
-        # Convert status values
-        if field_name.lower() in ['status', '状态', '设备状态']:
-            return self.status_mappings.get(value, value)
+        if infile.seekable():
+            sample = infile.read(8192)
+            infile.seek(0)
+        else:
+            # Streams that cannot rewind (zstd) are sampled through a second reader
+            with self.encoding_tools.open_text(file_path, encoding=infile.encoding) as head:
+                sample = head.read(8192)
+        sniffer = csv.Sniffer()
+        # Restrict candidates so letters in long headers are never taken for delimiters
+        dialect = sniffer.sniff(sample, delimiters=CSV_DELIMITERS)
         
-        # Convert category values
-        if field_name.lower() in ['category', '类别', '分类', '设备类型']:
-            return self.category_mappings.get(value, value)
+        if key is not None:
+            self.cache.put(key, 'dialect', {
+                "delimiter": dialect.delimiter,
+                "quotechar": dialect.quotechar,
+                "doublequote": dialect.doublequote,
+                "skipinitialspace": dialect.skipinitialspace,
+                "lineterminator": dialect.lineterminator,
+                "quoting": dialect.quoting,
+            })
+        return dialect.delimiter
+    
+    def is_passthrough(self, file_path: str, asset_type: str = 'assets') -> bool:
+        """Check whether convert_csv would write a file back byte for byte"""
+        samples, covers_whole_file = self.encoding_detector.read_samples(file_path)
+        head = samples[0][1]
+        if not head or head.startswith(self.encoding_tools.UTF8_BOM):
+            return False
+        if self.encoding_detector.decode_samples('utf-8', samples, covers_whole_file) is None:
+            return False
         
-        # Convert manufacturer values
-        if field_name.lower() in ['manufacturer', '制造商', '厂商', '生产商', '品牌']:
-            return self.manufacturer_mappings.get(value, value)
+        head_text = codecs.getincrementaldecoder('utf-8')().decode(head, final=covers_whole_file)
+        try:
+            if csv.Sniffer().sniff(head_text[:8192], delimiters=CSV_DELIMITERS).delimiter != ',':
+                return False
+            rows = list(csv.reader(io.StringIO(head_text, newline='')))
+        except csv.Error:
+            return False
+        if not covers_whole_file:
+            # The last sampled record may be cut short
+            rows = rows[:-1]
+        if not rows:
+            return False
         
-        return value
+        header = rows[0]
+        english_fields = self.mapping_index.english_fields
+        if not all(field in english_fields for field in header):
+            return False
+        if self.convert_header(header, asset_type)[0] != header:
+            return False
+        
+        translators = self.build_value_translators(header)
+        sampled_rows = [rows[1:]]
+        for index, (offset, chunk) in enumerate(samples[1:], 1):
+            at_eof = index == len(samples) - 1
+            # Decodable, as decode_samples showed; the first record starts after the first line break
+            text = chunk.decode('utf-8', 'ignore')
+            text = text[text.find('\n') + 1:] if '\n' in text else ''
+            try:
+                records = list(csv.reader(io.StringIO(text, newline='')))
+            except csv.Error:
+                # Started inside a quoted field; the full screen below still covers it
+                continue
+            sampled_rows.append(records if at_eof else records[:-1])
+        for rows in sampled_rows:
+            for row in rows:
+                for translate, value in zip(translators, row):
+                    if translate(value) != value:
+                        return False
+        
+        if covers_whole_file:
+            return is_canonical_csv(head, *self.passthrough_screen())
+        if self.encoding_tools.is_stream_path(file_path):
+            return False
+        with self.encoding_tools.mapped_file(file_path) as buffer:
+            return is_canonical_csv(buffer, *self.passthrough_screen())
     
-    def get_all_english_fields(self) -> List[str]:
-        """Get all English field names from mappings"""
-        english_fields = set()
-        for asset_type, mappings in self.field_mappings.items():
-            english_fields.update(mappings.values())
-        return list(english_fields)
+    def passthrough_screen(self) -> Tuple[Tuple[List[re.Pattern], List[re.Pattern]], frozenset]:
+        """The passthrough_screen of the value tables and the keys it looks for, built on first use"""
+        if self._passthrough_screen is None:
+            translated = frozenset(key for table in (self.status_mappings, self.category_mappings,
+                                                     self.manufacturer_mappings)
+                                   for key, value in table.items() if key != value)
+            self._passthrough_screen = (passthrough_screen(list(translated)), translated)
+        return self._passthrough_screen
+    
+    def passthrough_check(self, file_path: str, asset_type: str = 'assets') -> bool:
+        """is_passthrough, timed as the passthrough.check stage"""
+        with self.timer.stage('passthrough.check'):
+            return self.is_passthrough(file_path, asset_type)
+    
+    def pass_through(self, input_file: str, output_file: str, asset_type: str = 'assets',
+                     hardlink: bool = False,
+                     references: Optional[ReferenceCollector] = None,
+                     input_digest=None) -> ConversionResult:
+        """Copy a file that needs no conversion and report it as a no-op"""
+        started = time.perf_counter()
+        result = ConversionResult(input_file, output_file, asset_type, encoding='utf-8', noop=True)
+        is_stream_path = self.encoding_tools.is_stream_path
+        try:
+            if is_stream_path(input_file) or is_stream_path(output_file):
+                with self.timer.stage('passthrough.copy', bytes=self.encoding_tools.source_size(input_file)), \
+                        self.encoding_tools.open_binary(input_file) as src, \
+                        self.encoding_tools.open_binary(output_file, 'wb') as dst:
+                    if input_digest is not None:
+                        src = self.encoding_tools.HashingReader(src, input_digest)
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                result.copy_method = 'stream'
+                if input_digest is not None:
+                    result.input_hash = input_digest.hexdigest()
+            elif os.path.exists(output_file) and os.path.samefile(input_file, output_file):
+                result.copy_method = 'none (output is the input file)'
+            else:
+                with self.timer.stage('passthrough.copy', bytes=os.path.getsize(input_file)):
+                    result.copy_method = copy_file(input_file, output_file, hardlink)
+            
+            result.bytes_read = self.encoding_tools.source_size(input_file)
+            result.bytes_written = os.path.getsize(output_file)
+            if references is not None:
+                self.collect_references(output_file, references, asset_type)
+            result.success = True
+            
+        except Exception as e:
+            result.message = f"Error copying CSV: {str(e)}"
+        
+        result.seconds = time.perf_counter() - started
+        return result
+    
+    def collect_references(self, file_path: str, references: ReferenceCollector,
+                           asset_type: str = 'assets') -> None:
+        """Collect the reference entities named by a UTF-8 file with English headers"""
+        with self.encoding_tools.open_text(file_path, encoding='utf-8-sig') as f, \
+                self.timer.stage('references', bytes=self.encoding_tools.source_size(file_path)):
+            reader = csv.reader(f, delimiter=self.sniff_delimiter(file_path, f))
+            header = next(reader, None)
+            if header is None:
+                return
+            for _ in references.collect(self.convert_rows(reader, header), header, asset_type):
+                pass
     
-    def convert_csv(self, input_file: str, output_file: str, asset_type: str = 'assets') -> Tuple[bool, str]:
+    def convert_rows(self, rows: Iterator[List[str]], converted_header: List[str],
+                     misses: Optional[MissCollector] = None) -> Iterator[List[str]]:
+        """Lazily convert data rows so that only one row is held in memory at a time"""
+        translators = self.build_value_translators(converted_header, misses)
+        header_length = len(translators)
+        for row in rows:
+            converted_row = [translate(value) for translate, value in zip(translators, row)]
+            if len(row) > header_length:
+                converted_row.extend(row[header_length:])
+            yield converted_row
+    
+    def convert_header(self, header: List[str], asset_type: str = 'assets',
+                       misses: Optional[MissCollector] = None) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """Convert a header row, returning the converted header and the (original, English) mappings applied"""
+        converted_header = []
+        field_mappings = []
+        
+        for original_field in header:
+            converted_field = self.convert_field_name(original_field, asset_type, misses)
+            converted_header.append(converted_field)
+            
+            if original_field != converted_field:
+                field_mappings.append((original_field, converted_field))
+        
+        return converted_header, field_mappings
+    
+    def unmapped_fields(self, header: List[str], asset_type: str = 'assets') -> List[str]:
+        """Return the header fields that have no English mapping"""
+        return [name for name in header if self.mapping_index.lookup(name.strip(), asset_type) is None]
+    
+    def convert_csv(self, input_file: str, output_file: str, asset_type: str = 'assets',
+                    encoding: Optional[str] = None, fast_path: bool = True,
+                    hardlink: bool = False,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    references: Optional[ReferenceCollector] = None,
+                    delta: Optional[DeltaIndex] = None) -> Tuple[bool, str]:
+        """Convert CSV file from Chinese fields to English fields, returning (success, text report)"""
+        result = self.convert_csv_result(input_file, output_file, asset_type, encoding,
+                                         fast_path, hardlink, progress, references, delta)
+        return result.success, result.render()
+    
+    def convert_csv_result(self, input_file: str, output_file: str, asset_type: str = 'assets',
+                           encoding: Optional[str] = None, fast_path: bool = True,
+                           hardlink: bool = False,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           references: Optional[ReferenceCollector] = None,
+                           delta: Optional[DeltaIndex] = None, input_digest=None) -> ConversionResult:
         """Convert CSV file from Chinese fields to English fields"""
+        started = time.perf_counter()
+        result = ConversionResult(input_file, output_file, asset_type, encoding=encoding)
+        timer = self.timer
         try:
+            if fast_path and delta is None and self.passthrough_check(input_file, asset_type):
+                result = self.pass_through(input_file, output_file, asset_type, hardlink, references, input_digest)
+                if result.success and progress is not None:
+                    size = self.encoding_tools.content_size(input_file)
+                    if size is not None:
+                        progress(0, size)
+                return result
+            
             # Detect file encoding
-            encoding = self.detect_encoding(input_file)
+            if not encoding:
+                encoding, result.encoding_confidence = self.detect_encoding_with_confidence(input_file)
+                result.encoding = encoding
             
-            # Read input CSV
-            with open(input_file, 'r', encoding=encoding) as infile:
+            stats = {}
+            with self.encoding_tools.open_text(input_file, encoding=self.encoding_tools.decoding_encoding(encoding),
+                                               digest=input_digest) as infile:
                 # Try to detect delimiter
-                sample = infile.read(1024)
-                infile.seek(0)
-                sniffer = csv.Sniffer()
-                delimiter = sniffer.sniff(sample).delimiter
+                with timer.stage('sniff'):
+                    delimiter = self.sniff_delimiter(input_file, infile)
+                
+                lines = self.encoding_tools.iter_text_lines(infile, stats)
+                reader = csv.reader(lines, delimiter=delimiter)
+                if timer.enabled:
+                    # Decoding and parsing happen as the reader is pulled
+                    reader = timer.timed_iter(reader, 'read')
+                header = next(reader, None)
                 
-                reader = csv.reader(infile, delimiter=delimiter)
-                rows = list(reader)
+                if header is None:
+                    result.message = "Input file is empty"
+                    return result
+                
+                # Convert header row
+                misses = MissCollector()
+                converted_header, result.field_mappings = self.convert_header(header, asset_type, misses)
+                result.unmapped_fields = self.unmapped_fields(header, asset_type)
+                
+                # Stream converted rows to the output CSV with UTF-8 encoding
+                total_rows = 1
+                with self.encoding_tools.open_text(output_file, 'w') as outfile:
+                    writer = csv.writer(outfile)
+                    writer.writerow(converted_header)
+                    converted_rows = self.convert_rows(reader, converted_header, misses)
+                    if delta is not None:
+                        converted_rows = delta.filter(converted_rows, converted_header)
+                    if references is not None:
+                        converted_rows = references.collect(converted_rows, converted_header, asset_type)
+                    write_row = writer.writerow
+                    if timer.enabled:
+                        read_baseline = timer.snapshot('read')
+                        converted_rows = timer.timed_iter(converted_rows, 'translate')
+                        write_row = timer.timed_call(writer.writerow, 'write')
+                    for converted_row in converted_rows:
+                        write_row(converted_row)
+                        total_rows += 1
+                        if progress is not None and total_rows % PROGRESS_ROWS == 0:
+                            progress(total_rows, infile.buffer.tell())
+                    
+                    if timer.enabled:
+                        write_row.flush()
+                        # Time spent pulling rows from the reader is charged to read
+                        timer.subtract('translate', 'read', read_baseline)
+                
+                if progress is not None:
+                    progress(total_rows, infile.buffer.tell())
             
-            if not rows:
-                return False, "Input file is empty"
+            result.rows = total_rows
+            result.chinese_characters = stats['chinese_characters']
+            result.misses = misses.to_dict()
+            self.misses.update(misses)
+            if delta is not None:
+                with timer.stage('delta.index'):
+                    delta.finish()
+                    delta.save()
+                result.delta = dict(delta.stats)
+            result.bytes_read = self.encoding_tools.source_size(input_file)
+            result.bytes_written = os.path.getsize(output_file)
+            if input_digest is not None:
+                result.input_hash = input_digest.hexdigest()
+            result.success = True
+            timer.add('read', 0.0, 0.0, bytes=result.bytes_read, calls=0)
+            timer.add('write', 0.0, 0.0, bytes=result.bytes_written, calls=0)
             
-            # Convert header row
-            header = rows[0]
-            converted_header = []
-            field_mapping_log = []
+        except Exception as e:
+            result.message = f"Error converting CSV: {str(e)}"
+        
+        result.seconds = time.perf_counter() - started
+        return result
+    
+    def convert_csv_parallel(self, input_file: str, output_file: str, asset_type: str = 'assets',
+                             encoding: Optional[str] = None, jobs: int = 0,
+                             chunk_size: int = 32 * 1024 * 1024, fast_path: bool = True,
+                             hardlink: bool = False,
+                             references: Optional[ReferenceCollector] = None,
+                             delta: Optional[DeltaIndex] = None) -> Tuple[bool, str]:
+        """Convert one large CSV file on a process pool, returning (success, text report)"""
+        result = self.convert_csv_parallel_result(input_file, output_file, asset_type, encoding,
+                                                  jobs, chunk_size, fast_path, hardlink, references, delta)
+        return result.success, result.render()
+    
+    def convert_csv_parallel_result(self, input_file: str, output_file: str, asset_type: str = 'assets',
+                                    encoding: Optional[str] = None, jobs: int = 0,
+                                    chunk_size: int = 32 * 1024 * 1024, fast_path: bool = True,
+                                    hardlink: bool = False,
+                                    references: Optional[ReferenceCollector] = None,
+                                    delta: Optional[DeltaIndex] = None) -> ConversionResult:
+        """Convert one large CSV file by translating byte-range chunks in a process pool"""
+        started = time.perf_counter()
+        result = ConversionResult(input_file, output_file, asset_type, encoding=encoding)
+        try:
+            if delta is not None:
+                print("Delta mode checks rows against a single index, converting in a single process")
+                return self.convert_csv_result(input_file, output_file, asset_type, encoding,
+                                               references=references, delta=delta)
             
-            for field in header:
-                original_field = field
-                converted_field = self.convert_field_name(field, asset_type)
-                converted_header.append(converted_field)
+            if self.encoding_tools.is_stream_path(input_file):
+                print("Compressed input is read as a single stream, converting in a single process")
+                return self.convert_csv_result(input_file, output_file, asset_type, encoding, fast_path, hardlink,
+                                               references=references)
+            
+            if fast_path and self.passthrough_check(input_file, asset_type):
+                return self.pass_through(input_file, output_file, asset_type, hardlink, references)
+            
+            if not encoding:
+                encoding, result.encoding_confidence = self.detect_encoding_with_confidence(input_file)
+                result.encoding = encoding
+            
+            if codecs.lookup(encoding).name not in CHUNKABLE_ENCODINGS:
+                print(f"Encoding {encoding} cannot be split safely, converting in a single process")
+                single = self.convert_csv_result(input_file, output_file, asset_type, encoding, fast_path=False,
+                                                 references=references)
+                single.encoding_confidence = result.encoding_confidence
+                single.seconds = time.perf_counter() - started
+                return single
+            
+            if jobs is None or jobs < 1:
+                jobs = os.cpu_count() or 1
+            # Tiny chunks only add per-task overhead
+            chunk_size = max(chunk_size, 64 * 1024)
+            
+            text_encoding = self.encoding_tools.decoding_encoding(encoding)
+            header_end = record_boundaries(input_file, 0, 1, limit=1)[-1]
+            with open(input_file, 'rb') as f:
+                header_text = f.read(header_end).decode(text_encoding)
+            
+            delimiter = csv.Sniffer().sniff(header_text, delimiters=CSV_DELIMITERS).delimiter
+            header = next(csv.reader(io.StringIO(header_text, newline=''), delimiter=delimiter), None)
+            if header is None:
+                result.message = "Input file is empty"
+                return result
+            
+            misses = MissCollector()
+            converted_header, result.field_mappings = self.convert_header(header, asset_type, misses)
+            result.unmapped_fields = self.unmapped_fields(header, asset_type)
+            with self.timer.stage('split'):
+                boundaries = record_boundaries(input_file, header_end, chunk_size)
+            
+            output_dir = os.path.dirname(os.path.abspath(output_file))
+            with tempfile.TemporaryDirectory(dir=output_dir, prefix='.convert-parts-') as parts_dir:
+                tasks = [
+                    (input_file, start, end, text_encoding, delimiter, converted_header,
+                     asset_type, references is not None, os.path.join(parts_dir, f"part{index:06d}.csv"))
+                    for index, (start, end) in enumerate(zip(boundaries, boundaries[1:]))
+                ]
                 
-                if original_field != converted_field:
-                    field_mapping_log.append(f"'{original_field}' -> '{converted_field}'")
-            
-            # Convert data rows
-            converted_rows = [converted_header]
-            for row in rows[1:]:
-                converted_row = []
-                for i, value in enumerate(row):
-                    if i < len(converted_header):
-                        field_name = converted_header[i]
-                        converted_value = self.convert_field_value(field_name, value)
-                        converted_row.append(converted_value)
-                    else:
-                        converted_row.append(value)
-                converted_rows.append(converted_row)
-            
-            # Write output CSV with UTF-8 encoding
-            with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
-                writer = csv.writer(outfile)
-                writer.writerows(converted_rows)
-            
-            # Generate conversion report
-            report = f"Conversion completed successfully!\n"
-            report += f"Input file: {input_file}\n"
-            report += f"Output file: {output_file}\n"
-            report += f"Asset type: {asset_type}\n"
-            report += f"Total rows: {len(converted_rows)}\n"
-            report += f"Field mappings applied:\n"
+                # Imported here: multiprocessing is slow to load and only this path needs it
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=jobs, initializer=_init_chunk_worker,
+                                         initargs=(self.mapping_file, self.mapping_cache)) as executor, \
+                        self.timer.stage('chunks', bytes=os.path.getsize(input_file)) as stage:
+                    chunk_results = list(executor.map(_convert_chunk, tasks))
+                    stage.rows = sum(rows for rows, _, _, _ in chunk_results)
+                
+                # Concatenate header and parts in input order
+                with self.encoding_tools.open_text(output_file, 'w') as outfile, \
+                        self.timer.stage('concat') as stage:
+                    csv.writer(outfile).writerow(converted_header)
+                    outfile.flush()
+                    for task in tasks:
+                        with open(task[-1], 'rb') as part:
+                            shutil.copyfileobj(part, outfile.buffer)
+                    stage.bytes = outfile.buffer.tell()
             
-            if field_mapping_log:
-                for mapping in field_mapping_log:
-                    report += f"  - {mapping}\n"
-            else:
-                report += "  - No field mappings needed (all fields already in English)\n"
+            # Chunks are merged in input order, so references keep their first-seen order
+            for _, _, chunk_misses, chunk_references in chunk_results:
+                misses.update(chunk_misses)
+                if references is not None:
+                    references.update(chunk_references)
             
-            return True, report
+            result.rows = 1 + sum(rows for rows, _, _, _ in chunk_results)
+            result.chinese_characters = (self.encoding_tools.classify_text(header_text)['chinese']
+                                         + sum(count for _, count, _, _ in chunk_results))
+            result.misses = misses.to_dict()
+            self.misses.update(misses)
+            result.bytes_read = os.path.getsize(input_file)
+            result.bytes_written = os.path.getsize(output_file)
+            result.chunks = len(tasks)
+            result.jobs = jobs
+            result.success = True
             
         except Exception as e:
-            return False, f"Error converting CSV: {str(e)}"
+            result.message = f"Error converting CSV: {str(e)}"
+        
+        result.seconds = time.perf_counter() - started
+        return result
     
-    def validate_csv(self, file_path: str) -> Tuple[bool, str]:
-        """Validate CSV file for Snipe-IT import"""
-        try:
+    def check_csv_header(self, file_path: str, encoding: Optional[str] = None) -> HeaderCheck:
+        """Check the header of a CSV file for Snipe-IT import and return structured results"""
+        if not encoding:
+            encoding = self.detect_encoding(file_path)
+        
+        with self.encoding_tools.open_text(file_path, encoding=self.encoding_tools.decoding_encoding(encoding)) as f, \
+                self.timer.stage('validate.header'):
+            reader = csv.reader(f)
+            header = next(reader)
+        
+        # Check for required fields (varies by asset type)
+        required_fields = ['Category']  # Category is always required
+        missing_fields = [field for field in required_fields if field not in header]
+        
+        # Check for common issues
+        issues = []
+        
+        # Check for empty header fields
+        for i, field in enumerate(header):
+            if not field.strip():
+                issues.append(f"Empty field name at column {i+1}")
+        
+        # Check for duplicate header fields
+        seen_fields = set()
+        for field in header:
+            if field in seen_fields:
+                issues.append(f"Duplicate field name: '{field}'")
+            seen_fields.add(field)
+        
+        return HeaderCheck(file_path, encoding, header, missing_fields, issues)
+    
+    def check_csv_data(self, file_path: str, asset_type: str = 'assets',
+                       encoding: Optional[str] = None, max_distinct_unmapped: int = 1000) -> Dict:
+        """Check every row of a CSV file in one streaming pass"""
+        if not encoding:
             encoding = self.detect_encoding(file_path)
+        
+        with self.encoding_tools.open_text(file_path, encoding=self.encoding_tools.decoding_encoding(encoding)) as f, \
+                self.timer.stage('validate.data', bytes=self.encoding_tools.source_size(file_path)) as stage:
+            delimiter = self.sniff_delimiter(file_path, f)
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError("file has no header row")
             
-            with open(file_path, 'r', encoding=encoding) as f:
-                reader = csv.reader(f)
-                header = next(reader)
-                
-                # Check for required fields (varies by asset type)
-                required_fields = ['Category']  # Category is always required
-                missing_fields = []
-                
-                for field in required_fields:
-                    if field not in header:
-                        missing_fields.append(field)
-                
-                # Check for common issues
-                issues = []
-                
-                # Check for empty header fields
-                for i, field in enumerate(header):
-                    if not field.strip():
-                        issues.append(f"Empty field name at column {i+1}")
-                
-                # Check for duplicate header fields
-                seen_fields = set()
-                for field in header:
-                    if field in seen_fields:
-                        issues.append(f"Duplicate field name: '{field}'")
-                    seen_fields.add(field)
+            # Classify columns once, accepting both Chinese and English headers
+            english_header = [self.mapping_index.lookup(field.strip(), asset_type) or field.strip()
+                              for field in header]
+            columns = []
+            for field in english_header:
+                name = field.lower()
+                mapping = self.value_mapping_for(field)
+                if name.endswith('date'):
+                    kind = 'date'
+                elif name.endswith('cost') or name.endswith('price'):
+                    kind = 'cost'
+                elif mapping is not None:
+                    kind = 'mapped'
+                else:
+                    kind = 'text'
+                known_values = frozenset(mapping) | frozenset(mapping.values()) if mapping is not None else None
+                columns.append((ColumnStats(field, kind), known_values))
+            
+            required = REQUIRED_FIELDS.get(asset_type, [])
+            missing_fields = [field for field in required if field not in english_header]
+            required_indexes = [english_header.index(field) for field in required if field in english_header]
+            required_missing = Counter()
+            
+            tag_index = english_header.index('Asset Tag') if 'Asset Tag' in english_header else None
+            tag_hashes = array('Q')
+            add_tag = tag_hashes.append
+            
+            rows = 0
+            ragged_rows = 0
+            for row in reader:
+                rows += 1
+                line_number = reader.line_num
+                if len(row) != len(header):
+                    ragged_rows += 1
                 
-                # Generate validation report
-                report = f"CSV Validation Report for: {file_path}\n"
-                report += f"Encoding: {encoding}\n"
-                report += f"Total fields: {len(header)}\n"
-                report += f"Fields: {', '.join(header)}\n\n"
+                for (stats, known_values), value in zip(columns, row):
+                    value = value.strip()
+                    if not value:
+                        stats.empty += 1
+                        continue
+                    stats.filled += 1
+                    if len(value) > stats.max_length:
+                        stats.max_length = len(value)
+                    
+                    if stats.kind == 'date':
+                        if not is_valid_date(value):
+                            stats.add_invalid(value, line_number)
+                    elif stats.kind == 'cost':
+                        if not is_valid_cost(value):
+                            stats.add_invalid(value, line_number)
+                    elif stats.kind == 'mapped':
+                        if value not in known_values:
+                            if value in stats.unmapped or len(stats.unmapped) < max_distinct_unmapped:
+                                stats.unmapped[value] += 1
                 
-                if missing_fields:
-                    report += f"Missing required fields: {', '.join(missing_fields)}\n"
+                for index in required_indexes:
+                    if index >= len(row) or not row[index].strip():
+                        required_missing[english_header[index]] += 1
                 
-                if issues:
-                    report += f"Issues found:\n"
-                    for issue in issues:
-                        report += f"  - {issue}\n"
+                if tag_index is not None and tag_index < len(row):
+                    tag = row[tag_index].strip()
+                    if tag:
+                        add_tag(short_hash(tag))
+            
+            stage.rows = rows
+        
+        duplicate_tags, repeated = repeated_values(tag_hashes)
+        del tag_hashes
+        duplicate_samples = []
+        if repeated:
+            duplicate_samples = self.duplicate_tag_samples(file_path, encoding, delimiter, tag_index, repeated)
+        
+        column_stats = [stats.to_dict() for stats, _ in columns]
+        invalid_values = sum(stats["invalid"] for stats in column_stats)
+        return {
+            "file": file_path,
+            "encoding": encoding,
+            "asset_type": asset_type,
+            "rows": rows,
+            "ragged_rows": ragged_rows,
+            "missing_fields": missing_fields,
+            "required_missing": dict(required_missing),
+            "duplicate_asset_tags": duplicate_tags,
+            "duplicate_samples": duplicate_samples,
+            "invalid_values": invalid_values,
+            "columns": column_stats,
+            "valid": not missing_fields and not required_missing and not duplicate_tags and not invalid_values,
+        }
+    
+    def duplicate_tag_samples(self, file_path: str, encoding: str, delimiter: str, tag_index: int,
+                              repeated: set, limit: int = 5) -> List[Tuple[int, str]]:
+        """Return the line numbers and tags of the first repeated asset tags of a file"""
+        samples = []
+        seen = set()
+        with self.encoding_tools.open_text(file_path, encoding=self.encoding_tools.decoding_encoding(encoding)) as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            next(reader, None)
+            for row in reader:
+                tag = row[tag_index].strip() if tag_index < len(row) else ''
+                if not tag:
+                    continue
+                tag_hash = short_hash(tag)
+                if tag_hash not in repeated:
+                    continue
+                if tag_hash in seen:
+                    samples.append((reader.line_num, tag))
+                    if len(samples) == limit:
+                        break
                 else:
-                    report += "No issues found.\n"
-                
-                is_valid = len(missing_fields) == 0 and len(issues) == 0
-                return is_valid, report
-                
+                    seen.add(tag_hash)
+        return samples
+    
+    def validate_csv_data(self, file_path: str, asset_type: str = 'assets',
+                          encoding: Optional[str] = None) -> Tuple[bool, str]:
+        """Validate every row of a CSV file and report aggregated per-column statistics"""
+        try:
+            check = self.check_csv_data(file_path, asset_type, encoding)
+            
+            report = f"CSV Data Validation Report for: {file_path}\n"
+            report += f"Encoding: {check['encoding']}\n"
+            report += f"Asset type: {asset_type}\n"
+            report += f"Data rows: {check['rows']}\n"
+            if check["ragged_rows"]:
+                report += f"Rows with a different number of fields than the header: {check['ragged_rows']}\n"
+            report += "\n"
+            
+            if check["missing_fields"]:
+                report += f"Missing required fields: {', '.join(check['missing_fields'])}\n"
+            for field, count in check["required_missing"].items():
+                report += f"Rows without required '{field}': {count}\n"
+            if check["duplicate_asset_tags"]:
+                examples = ', '.join(f"'{tag}' (line {line})" for line, tag in check["duplicate_samples"])
+                report += f"Duplicate asset tags: {check['duplicate_asset_tags']} (e.g. {examples})\n"
+            
+            report += f"\nColumn statistics:\n"
+            for stats in check["columns"]:
+                report += (f"  - {stats['name']} [{stats['kind']}]: {stats['filled']} filled, "
+                           f"{stats['empty']} empty")
+                if stats["invalid"]:
+                    report += f", {stats['invalid']} invalid"
+                if stats["unmapped"]:
+                    report += f", {sum(count for _, count in stats['unmapped'])} unmapped"
+                report += "\n"
+                for line, value in stats["invalid_samples"]:
+                    report += f"      invalid '{value}' at line {line}\n"
+                for value, count in stats["unmapped"][:5]:
+                    report += f"      unmapped '{value}' x{count}\n"
+            
+            report += "\nNo issues found.\n" if check["valid"] else "\nIssues found, see above.\n"
+            return check["valid"], report
+            
+        except Exception as e:
+            return False, f"Error validating CSV: {str(e)}"
+    
+    def validate_csv(self, file_path: str, encoding: Optional[str] = None) -> Tuple[bool, str]:
+        """Validate CSV file for Snipe-IT import"""
+        try:
+            check = self.check_csv_header(file_path, encoding)
+            return check.valid, check.render()
+            
         except Exception as e:
             return False, f"Error validating CSV: {str(e)}"
     
@@ -287,8 +1741,28 @@ class CSVFieldConverter:
             print(f"Error generating template: {str(e)}")
             return False
 
+def save_draft_mapping(misses: MissCollector, output_file: str, top: Optional[int] = None) -> None:
+    """Write the draft mapping of a run's misses and say where it went"""
+    misses.save_draft_mapping(output_file, top)
+    if misses:
+        print(f"Draft mapping with {misses.total()} unmapped occurrences saved to: {output_file}")
+    else:
+        print(f"No unmapped headers or values; empty draft mapping saved to: {output_file}")
+
+def save_references(references: ReferenceCollector, output_dir: str) -> None:
+    """Write the reference sidecar CSVs of a run and list them"""
+    written = references.write(output_dir)
+    counts = references.counts()
+    print(f"Reference CSVs saved to: {output_dir}")
+    for output_file in written:
+        entity = os.path.splitext(os.path.basename(output_file))[0]
+        print(f"  - {os.path.basename(output_file)}: {counts[entity]} distinct {entity}")
+    if not written:
+        print("  - No categories, manufacturers, locations, suppliers, companies or models found")
+
 def main():
     """Main function for command line interface"""
+    encoding_tools = load_tool('encoding-converter.py')
     parser = argparse.ArgumentParser(
         description='Convert Snipe-IT CSV files from Chinese to English field names',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -296,8 +1770,19 @@ def main():
 Examples:
   python csv-field-converter.py convert input.csv output.csv
   python csv-field-converter.py convert input.csv output.csv --type users
+  python csv-field-converter.py convert big.csv output.csv --jobs 8
+  python csv-field-converter.py convert clean.csv output.csv --hardlink
+  python csv-field-converter.py convert input.csv output.csv --draft-mapping draft-mapping.json
+  python csv-field-converter.py convert input.csv output.csv --references references
+  python csv-field-converter.py convert nightly.csv changes.csv --delta nightly.idx
   python csv-field-converter.py validate input.csv
+  python csv-field-converter.py validate input.csv --full --type assets
+  python csv-field-converter.py convert input.csv output.csv --no-cache
+  python csv-field-converter.py convert input.csv output.csv --report-format json
+  python csv-field-converter.py convert input.csv output.csv --timings --profile convert.prof
   python csv-field-converter.py template assets template.csv
+  python csv-field-converter.py convert input.csv.gz output.csv.gz
+  python csv-field-converter.py convert "vendor.zip!assets.csv" output.csv.zst
         """
     )
     
@@ -310,10 +1795,35 @@ Examples:
     convert_parser.add_argument('--type', choices=['assets', 'users', 'accessories', 'consumables', 'licenses', 'components'],
                                default='assets', help='Asset type (default: assets)')
     convert_parser.add_argument('--mapping', help='Custom mapping file path')
+    convert_parser.add_argument('--jobs', type=int, default=1,
+                               help='Split the file into chunks converted by N processes, 0 for one per CPU (default: 1)')
+    convert_parser.add_argument('--chunk-size', type=int, default=32,
+                               help='Chunk size in MB for --jobs (default: 32)')
+    convert_parser.add_argument('--hardlink', action='store_true',
+                               help='Hardlink instead of copying files that need no conversion')
+    convert_parser.add_argument('--draft-mapping', metavar='FILE',
+                               help='Write headers and values that had no mapping to FILE as a draft mapping JSON')
+    convert_parser.add_argument('--draft-top', type=int, default=100,
+                               help='Most frequent unmapped entries per table to put in the draft (default: 100)')
+    convert_parser.add_argument('--delta', metavar='INDEX',
+                               help='Write only rows whose Asset Tag is new or whose content changed since the run that wrote INDEX, then update INDEX')
+    convert_parser.add_argument('--references', metavar='DIR',
+                               help='Write the distinct categories, manufacturers, locations, suppliers, companies and models to DIR as import CSVs')
     
     # Validate command
     validate_parser = subparsers.add_parser('validate', help='Validate CSV file')
     validate_parser.add_argument('input', help='Input CSV file path')
+    validate_parser.add_argument('--full', action='store_true',
+                                help='Check every row (dates, costs, required fields, mapped values, duplicate asset tags)')
+    validate_parser.add_argument('--type', choices=['assets', 'users', 'accessories', 'consumables', 'licenses', 'components'],
+                                default='assets', help='Asset type for --full (default: assets)')
+    
+    for detecting_parser in (convert_parser, validate_parser):
+        detecting_parser.add_argument('--no-cache', action='store_true',
+                                      help='Do not read or update the encoding detection and compiled mapping caches')
+        detecting_parser.add_argument('--report-format', choices=['text', 'json'], default='text',
+                                      help='Report format; with json, progress messages go to stderr (default: text)')
+        encoding_tools.add_instrumentation_arguments(detecting_parser)
     
     # Template command
     template_parser = subparsers.add_parser('template', help='Generate CSV template')
@@ -329,33 +1839,97 @@ Examples:
     
     # Initialize converter
     mapping_file = args.mapping if hasattr(args, 'mapping') and args.mapping else 'chinese-field-mapping.json'
-    converter = CSVFieldConverter(mapping_file)
+    cache = None
+    if not getattr(args, 'no_cache', True):
+        cache = encoding_tools.DetectionCache()
+    timer = encoding_tools.StageTimer(enabled=getattr(args, 'timings', False))
+    converter = CSVFieldConverter(mapping_file, cache, timer, mapping_cache=not getattr(args, 'no_cache', False))
     
-    if args.command == 'convert':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+    with encoding_tools.instrumented(args, timer):
+        if args.command == 'convert':
+            if not encoding_tools.source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            references = ReferenceCollector() if args.references else None
+            delta = DeltaIndex(args.delta) if args.delta else None
+            
+            if args.report_format != 'text':
+                # stdout carries only the report
+                with contextlib.redirect_stdout(sys.stderr):
+                    if args.jobs != 1:
+                        result = converter.convert_csv_parallel_result(
+                            args.input, args.output, args.type, jobs=args.jobs,
+                            chunk_size=args.chunk_size * 1024 * 1024, hardlink=args.hardlink,
+                            references=references, delta=delta
+                        )
+                    else:
+                        result = converter.convert_csv_result(args.input, args.output, args.type,
+                                                              hardlink=args.hardlink, references=references,
+                                                              delta=delta)
+                    report = {"conversion": asdict(result), "validation": None}
+                    if result.success:
+                        try:
+                            report["validation"] = asdict(converter.check_csv_header(args.output))
+                        except Exception as e:
+                            report["validation"] = {"error": f"Error validating CSV: {str(e)}"}
+                    if args.draft_mapping:
+                        save_draft_mapping(converter.misses, args.draft_mapping, args.draft_top)
+                    if references is not None and result.success:
+                        save_references(references, args.references)
+                print(format_report(report, args.report_format))
+            
+            else:
+                if args.jobs != 1:
+                    success, message = converter.convert_csv_parallel(
+                        args.input, args.output, args.type, jobs=args.jobs, chunk_size=args.chunk_size * 1024 * 1024,
+                        hardlink=args.hardlink, references=references, delta=delta
+                    )
+                else:
+                    success, message = converter.convert_csv(args.input, args.output, args.type, hardlink=args.hardlink,
+                                                             references=references, delta=delta)
+                print(message)
+                
+                if args.draft_mapping:
+                    save_draft_mapping(converter.misses, args.draft_mapping, args.draft_top)
+                if references is not None and success:
+                    save_references(references, args.references)
+                
+                if success:
+                    print(f"\nValidating converted file...")
+                    is_valid, validation_report = converter.validate_csv(args.output)
+                    print(validation_report)
         
-        success, message = converter.convert_csv(args.input, args.output, args.type)
-        print(message)
+        elif args.command == 'validate':
+            if not encoding_tools.source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            if args.report_format != 'text':
+                # stdout carries only the report
+                with contextlib.redirect_stdout(sys.stderr):
+                    try:
+                        if args.full:
+                            report = converter.check_csv_data(args.input, args.type)
+                        else:
+                            report = converter.check_csv_header(args.input)
+                    except Exception as e:
+                        report = {"file": args.input, "valid": False, "error": f"Error validating CSV: {str(e)}"}
+                print(format_report(report, args.report_format))
+            elif args.full:
+                is_valid, report = converter.validate_csv_data(args.input, args.type)
+                print(report)
+            else:
+                is_valid, report = converter.validate_csv(args.input)
+                print(report)
         
-        if success:
-            print(f"\nValidating converted file...")
-            is_valid, validation_report = converter.validate_csv(args.output)
-            print(validation_report)
-    
-    elif args.command == 'validate':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+        elif args.command == 'template':
+            success = converter.generate_template(args.type, args.output)
+            if not success:
+                sys.exit(1)
         
-        is_valid, report = converter.validate_csv(args.input)
-        print(report)
-    
-    elif args.command == 'template':
-        success = converter.generate_template(args.type, args.output)
-        if not success:
-            sys.exit(1)
+    if cache is not None:
+        cache.save()
 
 if __name__ == '__main__':
     main()
@@ -9,18 +9,878 @@ Date: 2025-07-23
 Version: 1.0
 """
 
+__version__ = "1.0"
+
 import os
+import re
 import sys
 import argparse
-import chardet
+import codecs
 import csv
-from typing import Tuple, Optional
+import hashlib
+import importlib.util
+import io
+import json
+import mmap
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Callable, Dict, Iterator, List, Tuple, Optional, TextIO
+
+CHINESE_PATTERN = re.compile('[\u4e00-\u9fff]')
+
+# Character classes counted by classify_text, as code point ranges; tab, CR and LF are not control noise
+SCRIPT_CLASSES = {
+    "chinese": [(0x4e00, 0x9fff)],
+    "latin": [(0x41, 0x5a), (0x61, 0x7a), (0xc0, 0x24f)],
+    "control": [(0x00, 0x08), (0x0b, 0x0c), (0x0e, 0x1f), (0x7f, 0x9f)],
+    "replacement": [(0xfffd, 0xfffd)],
+}
+_script_table = None
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+def load_tool(filename: str):
+    """Load a tool script (e.g. csv-field-converter.py) as a module, relative to this directory unless absolute"""
+    module_name = os.path.splitext(os.path.basename(filename))[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    
+    path = filename
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def decoding_encoding(encoding: str) -> str:
+    """Return the codec to read a file with, so that a UTF-8 BOM is always stripped"""
+    if encoding.lower().replace('_', '-') in ('utf-8', 'utf8', 'ascii'):
+        return 'utf-8-sig'
+    return encoding
+
+
+def script_table() -> Tuple[Tuple[Optional[int], ...], Dict[str, str]]:
+    """Return the str.translate table of classify_text and the marker character of each class"""
+    global _script_table
+    if _script_table is None:
+        # Each class is mapped to one of its own members, every other code point below the table's end is deleted
+        markers = {name: chr(ranges[0][0]) for name, ranges in SCRIPT_CLASSES.items()}
+        table = [None] * (max(end for ranges in SCRIPT_CLASSES.values() for _, end in ranges) + 1)
+        for name, ranges in SCRIPT_CLASSES.items():
+            for start, end in ranges:
+                table[start:end + 1] = [ord(markers[name])] * (end + 1 - start)
+        _script_table = tuple(table), markers
+    return _script_table
+
+
+def classify_text(text: str, counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Count the characters of each script class in a block of text, adding to counts when given"""
+    table, markers = script_table()
+    classes = text.translate(table)
+    if counts is None:
+        counts = dict.fromkeys(SCRIPT_CLASSES, 0)
+    for name, marker in markers.items():
+        counts[name] = counts.get(name, 0) + classes.count(marker)
+    return counts
+
+
+def iter_text_lines(infile: TextIO, stats: Dict, copy_to: Optional[TextIO] = None,
+                    batch_size: int = 1 << 16) -> Iterator[str]:
+    """Yield lines of a decoded text stream, counting characters into stats and copying them to copy_to"""
+    stats.setdefault("characters", 0)
+    counts = {}
+    pending = []
+    pending_size = 0
+    first = True
+    for line in infile:
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        stats["characters"] += len(line)
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= batch_size:
+            classify_text(''.join(pending), counts)
+            pending = []
+            pending_size = 0
+        if copy_to is not None:
+            copy_to.write(line)
+        yield line
+    
+    classify_text(''.join(pending), counts)
+    for name, count in counts.items():
+        stats[f"{name}_characters"] = stats.get(f"{name}_characters", 0) + count
+
+
+@contextmanager
+def mapped_file(file_path: str):
+    """Memory-map a file, yielding an empty bytes object for empty files"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def _buffer_chunks(buffer, start: int, chunk_size: int) -> Iterator[Tuple[int, bytes, bool]]:
+    """Yield (offset, chunk, is_last) from a buffer, or from a binary stream at its current position"""
+    if not isinstance(buffer, (bytes, bytearray, memoryview, mmap.mmap)):
+        # Streams have no length, so read one chunk ahead to know which is the last
+        offset = start
+        chunk = buffer.read(chunk_size)
+        while True:
+            following = buffer.read(chunk_size) if chunk else b''
+            yield offset, chunk, not following
+            if not following:
+                return
+            offset += len(chunk)
+            chunk = following
+    
+    with memoryview(buffer) as view:
+        size = len(view)
+        for offset in range(start, max(size, start + 1), chunk_size):
+            with view[offset:offset + chunk_size] as chunk:
+                yield offset, chunk, offset + chunk_size >= size
+
+
+def scan_utf8(buffer, start: int = 0, chunk_size: int = 1 << 20, copy_to=None) -> Dict:
+    """Validate and count a UTF-8 buffer or binary stream chunk by chunk, optionally copying the bytes out"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    characters = 0
+    counts = dict.fromkeys(SCRIPT_CLASSES, 0)
+    crlf_pairs = 0
+    previous_ended_with_cr = False
+    
+    with closing(_buffer_chunks(buffer, start, chunk_size)) as chunks:
+        for offset, chunk, is_last in chunks:
+            try:
+                text = decoder.decode(chunk, final=is_last)
+            except UnicodeDecodeError as e:
+                raise UnicodeDecodeError(e.encoding, e.object, offset + e.start, offset + e.end, e.reason)
+            
+            if copy_to is not None:
+                copy_to.write(chunk)
+            characters += len(text)
+            classify_text(text, counts)
+            crlf_pairs += text.count('\r\n')
+            if previous_ended_with_cr and text.startswith('\n'):
+                crlf_pairs += 1
+            if text:
+                previous_ended_with_cr = text.endswith('\r')
+    
+    result = {"characters": characters - crlf_pairs}
+    for name, count in counts.items():
+        result[f"{name}_characters"] = count
+    return result
+
+
+# Compressed files are read and written as streams, never extracted to disk.
+# A member of a zip archive is addressed as "archive.zip!member.csv".
+ARCHIVE_MEMBER_SEPARATOR = '.zip!'
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def split_archive_member(path: str) -> Tuple[str, Optional[str]]:
+    """Split "archive.zip!member.csv" into the archive path and member name (None for other paths)"""
+    archive, separator, member = path.partition(ARCHIVE_MEMBER_SEPARATOR)
+    if not separator:
+        return path, None
+    return archive + '.zip', member
+
+
+def compression_of(path: str) -> Optional[str]:
+    """Return how a path is stored: 'zip' (archive member), 'gzip', 'zstd' or None for a plain file"""
+    if split_archive_member(path)[1] is not None:
+        return 'zip'
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1].lower())
+
+
+def is_stream_path(path: str) -> bool:
+    """Check whether a path can only be read or written as a stream (no seeking, mmap or hardlinks)"""
+    return compression_of(path) is not None
+
+
+def strip_compression_suffix(name: str) -> str:
+    """Drop a .gz or .zst suffix from a file name"""
+    base, extension = os.path.splitext(name)
+    return base if extension.lower() in COMPRESSION_SUFFIXES else name
+
+
+def archive_members(archive: str, pattern: str = '*.csv') -> List[str]:
+    """List the members of a zip archive whose file names match pattern, as archive.zip!member paths"""
+    import fnmatch
+    import zipfile
+    with zipfile.ZipFile(archive) as zf:
+        return [f"{archive}!{info.filename}" for info in zf.infolist()
+                if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), pattern)]
+
+
+def _zstandard():
+    """Import the optional zstandard package"""
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Reading or writing .zst files needs the zstandard package (pip install zstandard)")
+    return zstandard
+
+
+def open_binary(path: str, mode: str = 'rb') -> BinaryIO:
+    """Open a plain file, a .gz or .zst file or a zip archive member as a binary stream"""
+    kind = compression_of(path)
+    if kind is None:
+        return open(path, mode)
+    
+    if kind == 'zip':
+        if 'r' not in mode:
+            raise ValueError(f"Cannot write into a zip archive: {path}")
+        import zipfile
+        archive, member = split_archive_member(path)
+        # An open member keeps the archive file open after the ZipFile is closed
+        with zipfile.ZipFile(archive) as zf:
+            return zf.open(member)
+    
+    if kind == 'gzip':
+        import gzip
+        return gzip.open(path, mode)
+    
+    zstandard = _zstandard()
+    raw = open(path, mode)
+    if 'r' in mode:
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True), 1 << 20)
+    return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+
+
+class HashingReader(io.RawIOBase):
+    """Binary reader feeding the bytes it reads, in file order and once each, to a hashlib digest"""
+    
+    def __init__(self, raw: BinaryIO, digest):
+        self.raw = raw
+        self.digest = digest
+        self.position = 0
+        self.hashed = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return self.raw.seekable()
+    
+    def readinto(self, buffer) -> int:
+        count = self.raw.readinto(buffer)
+        if count:
+            end = self.position + count
+            if self.position <= self.hashed < end:
+                self.digest.update(memoryview(buffer)[self.hashed - self.position:count])
+                self.hashed = end
+            self.position = end
+        return count
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self.position = self.raw.seek(offset, whence)
+        return self.position
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def close(self) -> None:
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+def open_text(path: str, mode: str = 'r', encoding: str = 'utf-8', newline: Optional[str] = '',
+              digest=None) -> TextIO:
+    """Open a plain file, a .gz or .zst file or a zip archive member in text mode, optionally hashing it"""
+    if digest is not None:
+        raw = open_binary(path) if is_stream_path(path) else open(path, 'rb', buffering=0)
+        return io.TextIOWrapper(io.BufferedReader(HashingReader(raw, digest)), encoding=encoding, newline=newline)
+    if not is_stream_path(path):
+        return open(path, mode, encoding=encoding, newline=newline)
+    return io.TextIOWrapper(open_binary(path, mode.replace('t', '') + 'b'), encoding=encoding, newline=newline)
+
+
+def new_file_mode() -> int:
+    """Return the permissions open() gives new files under the current umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def source_size(path: str) -> int:
+    """Return the bytes a path occupies on disk (the compressed size for .gz/.zst files and zip members)"""
+    archive, member = split_archive_member(path)
+    if member is None:
+        return os.path.getsize(path)
+    import zipfile
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member).compress_size
+
+
+def content_size(path: str) -> Optional[int]:
+    """Return the decompressed size of a path, or None when the file does not record it"""
+    kind = compression_of(path)
+    if kind is None:
+        return os.path.getsize(path)
+    if kind == 'zip':
+        archive, member = split_archive_member(path)
+        import zipfile
+        with zipfile.ZipFile(archive) as zf:
+            return zf.getinfo(member).file_size
+    
+    with open(path, 'rb') as f:
+        if kind == 'gzip':
+            if f.seek(0, os.SEEK_END) < 18:
+                return None
+            f.seek(-4, os.SEEK_END)
+            return int.from_bytes(f.read(4), 'little')
+        header = f.read(18)
+    try:
+        size = _zstandard().frame_content_size(header)
+    except Exception:
+        return None
+    return size if size >= 0 else None
+
+
+def source_exists(path: str) -> bool:
+    """Check whether a file, or a member of a zip archive, exists"""
+    archive, member = split_archive_member(path)
+    if member is None:
+        return os.path.exists(path)
+    import zipfile
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            zf.getinfo(member)
+        return True
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+
+class _Stage:
+    """Context manager timing one pass through a stage; set bytes and rows before it exits"""
+    
+    __slots__ = ('timer', 'name', 'bytes', 'rows', 'wall', 'cpu')
+    
+    def __init__(self, timer: 'StageTimer', name: str, bytes: int = 0, rows: int = 0):
+        self.timer = timer
+        self.name = name
+        self.bytes = bytes
+        self.rows = rows
+    
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu,
+                       self.bytes, self.rows)
+        return False
+
+
+class _NullStage:
+    """Stage handed out by a disabled StageTimer; ignores everything"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def __setattr__(self, name, value):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class StageTimer:
+    """Accumulate wall time, CPU time, bytes and rows per named stage"""
+    
+    __slots__ = ('enabled', 'stages')
+    
+    def __init__(self, enabled: bool = False):
+        """Initialize timer; a disabled timer records nothing"""
+        self.enabled = enabled
+        # name -> [calls, wall seconds, cpu seconds, bytes, rows]
+        self.stages = OrderedDict()
+    
+    def stage(self, name: str, bytes: int = 0, rows: int = 0):
+        """Return a context manager timing one pass through the named stage"""
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name, bytes, rows)
+    
+    def add(self, name: str, wall: float, cpu: float, bytes: int = 0, rows: int = 0, calls: int = 1) -> None:
+        """Add measurements to a stage"""
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0, 0.0, 0.0, 0, 0]
+        totals[0] += calls
+        totals[1] += wall
+        totals[2] += cpu
+        totals[3] += bytes
+        totals[4] += rows
+    
+    def snapshot(self, name: str) -> Tuple[float, float]:
+        """Return the wall and CPU seconds recorded for a stage so far"""
+        totals = self.stages.get(name)
+        return (totals[1], totals[2]) if totals is not None else (0.0, 0.0)
+    
+    def subtract(self, name: str, inner: str, baseline: Tuple[float, float] = (0.0, 0.0)) -> None:
+        """Remove the time inner recorded since the baseline snapshot from the outer stage"""
+        if name in self.stages and inner in self.stages:
+            self.stages[name][1] -= self.stages[inner][1] - baseline[0]
+            self.stages[name][2] -= self.stages[inner][2] - baseline[1]
+    
+    def timed_iter(self, iterable, name: str) -> Iterator:
+        """Yield from iterable, charging the time spent producing each item to a stage"""
+        iterator = iter(iterable)
+        wall = cpu = 0.0
+        count = 0
+        perf_counter, process_time = time.perf_counter, time.process_time
+        try:
+            while True:
+                started_wall, started_cpu = perf_counter(), process_time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    wall += perf_counter() - started_wall
+                    cpu += process_time() - started_cpu
+                count += 1
+                yield item
+        finally:
+            self.add(name, wall, cpu, rows=count)
+    
+    def timed_call(self, function: Callable, name: str) -> Callable:
+        """Wrap a function so that the time spent in each call is charged to a stage on flush()"""
+        totals = [0.0, 0.0, 0]
+        perf_counter, process_time = time.perf_counter, time.process_time
+        
+        def timed(*args, **kwargs):
+            started_wall, started_cpu = perf_counter(), process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals[0] += perf_counter() - started_wall
+                totals[1] += process_time() - started_cpu
+                totals[2] += 1
+        
+        def flush():
+            self.add(name, totals[0], totals[1], rows=totals[2])
+            totals[:] = [0.0, 0.0, 0]
+        
+        timed.flush = flush
+        return timed
+    
+    def pop_stats(self) -> Dict:
+        """Return the recorded stages and start over, e.g. to ship them from a pool worker"""
+        stats = {name: list(totals) for name, totals in self.stages.items()}
+        self.stages.clear()
+        return stats
+    
+    def merge(self, stats: Dict) -> None:
+        """Add stages recorded by another timer (see pop_stats)"""
+        for name, (calls, wall, cpu, bytes, rows) in stats.items():
+            self.add(name, wall, cpu, bytes, rows, calls)
+    
+    def to_dict(self) -> Dict:
+        """Return the recorded stages as JSON-ready dicts"""
+        return {
+            name: {"calls": calls, "wall_seconds": round(wall, 6), "cpu_seconds": round(cpu, 6),
+                   "bytes": bytes, "rows": rows}
+            for name, (calls, wall, cpu, bytes, rows) in self.stages.items()
+        }
+    
+    def report(self) -> str:
+        """Render the recorded stages as a table"""
+        report = f"Stage timings:\n"
+        report += f"  {'stage':<24} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'rows':>10} {'MB':>9} {'MB/s':>8}\n"
+        for name, (calls, wall, cpu, bytes, rows) in self.stages.items():
+            megabytes = bytes / (1024 * 1024)
+            rate = f"{megabytes / wall:8.1f}" if bytes and wall > 0 else f"{'':>8}"
+            report += (f"  {name:<24} {calls:>6} {wall:>9.3f} {cpu:>9.3f} {rows:>10} "
+                       f"{megabytes:>9.2f} {rate}\n")
+        return report
+
+
+def add_instrumentation_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the --timings, --profile and --trace-memory options to a (sub)command parser"""
+    parser.add_argument('--timings', action='store_true',
+                        help='Print wall/CPU time, bytes and rows per processing stage (to stderr)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Run under cProfile and dump the stats to FILE (read with python -m pstats)')
+    parser.add_argument('--trace-memory', metavar='FILE',
+                        help='Trace allocations with tracemalloc and dump a snapshot to FILE')
+
+
+@contextmanager
+def instrumented(args, timer: Optional['StageTimer'] = None):
+    """Run a command under the instrumentation requested by add_instrumentation_arguments"""
+    profile_file = getattr(args, 'profile', None)
+    memory_file = getattr(args, 'trace_memory', None)
+    profiler = None
+    if profile_file:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if memory_file:
+        import tracemalloc
+        tracemalloc.start()
+    
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            print(f"Profile saved to: {profile_file}", file=sys.stderr)
+        if memory_file:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.take_snapshot().dump(memory_file)
+            tracemalloc.stop()
+            print(f"Memory snapshot saved to: {memory_file} (peak traced: {peak / (1024 * 1024):.1f} MB)",
+                  file=sys.stderr)
+        if timer is not None and timer.enabled:
+            print(timer.report(), end='', file=sys.stderr)
+
+
+DEFAULT_CACHE_FILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'snipeit-csv-tools', 'detection-cache.json'
+)
+
+
+class DetectionCache:
+    """Persistent LRU cache of per-file detection results, keyed by a sampled fingerprint"""
+    
+    def __init__(self, cache_file: Optional[str] = None, max_entries: int = 4096,
+                 block_size: int = 4096):
+        """Initialize cache, loading existing entries from disk"""
+        self.cache_file = cache_file or os.environ.get('SNIPEIT_CSV_CACHE') or DEFAULT_CACHE_FILE
+        self.max_entries = max_entries
+        self.block_size = block_size
+        self.entries = self._read_file()
+        self.updates = {}
+    
+    def _read_file(self) -> OrderedDict:
+        """Read cache entries from disk, ignoring a missing or corrupt file"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return OrderedDict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return OrderedDict()
+    
+    def fingerprint(self, file_path: str) -> str:
+        """Return the cache key for a file from its size, mtime and sampled content"""
+        file_path, member = split_archive_member(file_path)
+        stat = os.stat(file_path)
+        key = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if member is not None:
+            key += f"!{member}"
+        digest = hashlib.blake2b(key.encode(), digest_size=16)
+        with open(file_path, 'rb') as f:
+            for offset in (0, (stat.st_size - self.block_size) // 2, stat.st_size - self.block_size):
+                f.seek(max(offset, 0))
+                digest.update(f.read(self.block_size))
+        return digest.hexdigest()
+    
+    def get(self, key: str, name: str) -> Optional[Dict]:
+        """Return a named result for a fingerprint, marking the entry as recently used"""
+        entry = self.entries.get(key)
+        if entry is None or name not in entry:
+            return None
+        self.entries.move_to_end(key)
+        return entry[name]
+    
+    def put(self, key: str, name: str, value: Dict) -> None:
+        """Store a named result for a fingerprint"""
+        entry = self.entries.pop(key, {})
+        entry[name] = value
+        self.entries[key] = entry
+        self.updates.setdefault(key, {})[name] = value
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def pop_updates(self) -> Dict:
+        """Return and forget entries stored since the last call (for merging worker caches)"""
+        updates, self.updates = self.updates, {}
+        return updates
+    
+    def merge(self, updates: Dict) -> None:
+        """Merge entries collected by another cache instance"""
+        for key, entry in updates.items():
+            for name, value in entry.items():
+                self.put(key, name, value)
+    
+    def save(self) -> None:
+        """Write the cache to disk, merging with entries saved by concurrent runs"""
+        if not self.updates:
+            return
+        
+        merged = self._read_file()
+        for key, entry in self.entries.items():
+            merged.setdefault(key, {}).update(entry)
+            merged.move_to_end(key)
+        while len(merged) > self.max_entries:
+            merged.popitem(last=False)
+        
+        try:
+            directory = os.path.dirname(self.cache_file) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_file)
+            self.updates = {}
+        except OSError as e:
+            print(f"Warning: Could not save detection cache: {e}")
+
+
+class EncodingDetector:
+    """Bounded-cost encoding detection working on sampled chunks of a file"""
+    
+    def __init__(self, candidates: List[str], confidence_threshold: float = 0.8,
+                 sample_size: int = 64 * 1024, feed_size: int = 4096,
+                 cache: Optional[DetectionCache] = None, timer: Optional[StageTimer] = None):
+        """Initialize detector with candidate encodings in order of preference"""
+        self.candidates = candidates
+        self.confidence_threshold = confidence_threshold
+        self.sample_size = sample_size
+        self.feed_size = feed_size
+        self.cache = cache
+        self.timer = timer or StageTimer()
+        # Results depend on the configuration, so it is part of the cached result name
+        self.cache_name = f"encoding:{confidence_threshold}:{','.join(candidates)}:{','.join(SCRIPT_CLASSES)}"
+    
+    def read_samples(self, file_path: str) -> Tuple[List[Tuple[int, bytes]], bool]:
+        """Read head, middle and tail samples, returning (samples, covers_whole_file)"""
+        if is_stream_path(file_path):
+            with open_binary(file_path) as f:
+                head = f.read(self.sample_size * 3 + 1)
+            if len(head) <= self.sample_size * 3:
+                return [(0, head)], True
+            return [(0, head[:-1])], False
+        
+        size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            if size <= self.sample_size * 3:
+                return [(0, f.read())], True
+            
+            samples = [(0, f.read(self.sample_size))]
+            for offset in ((size - self.sample_size) // 2, size - self.sample_size):
+                f.seek(offset)
+                samples.append((offset, f.read(self.sample_size)))
+            return samples, False
+    
+    def chardet_guess(self, samples: List[Tuple[int, bytes]]) -> Tuple[Optional[str], float]:
+        """Run chardet's incremental detector over the samples, stopping early when done"""
+        # Imported here: loading chardet takes longer than most commands that never detect
+        import chardet
+        detector = chardet.UniversalDetector()
+        for _, chunk in samples:
+            for start in range(0, len(chunk), self.feed_size):
+                detector.feed(chunk[start:start + self.feed_size])
+                if detector.done:
+                    break
+            if detector.done:
+                break
+        detector.close()
+        return detector.result['encoding'], detector.result['confidence'] or 0.0
+    
+    def decode_samples(self, encoding: str, samples: List[Tuple[int, bytes]],
+                       covers_whole_file: bool) -> Optional[str]:
+        """Decode every sample with the encoding, returning the text or None on failure"""
+        texts = []
+        for index, (offset, chunk) in enumerate(samples):
+            # A single sample that does not cover the file is a head sample, not the tail
+            at_eof = covers_whole_file or (index == len(samples) - 1 and index > 0)
+            # Chunks taken from the middle of a file may start inside a multi-byte sequence
+            for skip in range(4 if offset else 1):
+                try:
+                    decoder = codecs.getincrementaldecoder(encoding)()
+                    texts.append(decoder.decode(chunk[skip:], final=at_eof))
+                    break
+                except UnicodeDecodeError:
+                    continue
+            else:
+                return None
+        return ''.join(texts)
+    
+    def validate_full(self, file_path: str, encodings: List[str], block_size: int = 1 << 20) -> List[str]:
+        """Validate all encodings in one streaming pass and return those that decode the whole file"""
+        decoders = {encoding: codecs.getincrementaldecoder(encoding)() for encoding in encodings}
+        with open_binary(file_path) as f:
+            while decoders:
+                block = f.read(block_size)
+                final = not block
+                for encoding in list(decoders):
+                    try:
+                        decoders[encoding].decode(block, final=final)
+                    except UnicodeDecodeError:
+                        del decoders[encoding]
+                if final:
+                    break
+        return [encoding for encoding in encodings if encoding in decoders]
+    
+    def detect(self, file_path: str) -> Dict:
+        """Detect the encoding of a file, returning the encoding, confidence, method and script counts"""
+        if self.cache is None:
+            return self._detect(file_path)
+        
+        with self.timer.stage('detect.cache'):
+            key = self.cache.fingerprint(file_path)
+            result = self.cache.get(key, self.cache_name)
+        if result is None:
+            result = self._detect(file_path)
+            self.cache.put(key, self.cache_name, result)
+        return dict(result, fingerprint=key)
+    
+    def rank_candidates(self, scripts: Dict[str, Dict[str, int]]) -> List[str]:
+        """Order decodable candidates by how plausible their decoded text is"""
+        def rank(encoding):
+            counts = scripts[encoding]
+            noise = counts['control'] + counts['replacement']
+            return (noise > 0, counts['chinese'] == 0, self.candidates.index(encoding))
+        return sorted(scripts, key=rank)
+    
+    def _detect(self, file_path: str) -> Dict:
+        """Run detection on the file without consulting the cache"""
+        timer = self.timer
+        with timer.stage('detect.read') as stage:
+            samples, covers_whole_file = self.read_samples(file_path)
+            stage.bytes = sum(len(chunk) for _, chunk in samples)
+        with timer.stage('detect.chardet'):
+            detected_encoding, detected_confidence = self.chardet_guess(samples)
+        result = {
+            "encoding": detected_encoding,
+            "confidence": detected_confidence,
+            "chardet_encoding": detected_encoding,
+            "chardet_confidence": detected_confidence,
+            "method": "chardet",
+            "has_chinese": False,
+            "scripts": None,
+        }
+        
+        if detected_encoding and detected_confidence >= self.confidence_threshold:
+            with timer.stage('detect.classify'):
+                text = self.decode_samples(detected_encoding, samples, covers_whole_file)
+                if text is not None:
+                    result["scripts"] = classify_text(text)
+                    result["has_chinese"] = result["scripts"]["chinese"] > 0
+            return result
+        
+        # Only candidates that decode every sample are worth a full pass
+        scripts = {}
+        with timer.stage('detect.classify'):
+            for encoding in self.candidates:
+                text = self.decode_samples(encoding, samples, covers_whole_file)
+                if text is not None:
+                    scripts[encoding] = classify_text(text)
+        
+        survivors = self.rank_candidates(scripts)
+        if not covers_whole_file and survivors:
+            # validate_full keeps the order of the encodings it is given
+            with timer.stage('detect.validate_full', bytes=source_size(file_path)):
+                survivors = self.validate_full(file_path, survivors)
+        
+        if survivors:
+            encoding = survivors[0]
+            counts = scripts[encoding]
+            has_chinese = counts['chinese'] > 0
+            confidence = 0.9 if has_chinese else 0.7
+            if counts['control'] or counts['replacement']:
+                confidence -= 0.2
+            result.update({
+                "encoding": encoding,
+                "confidence": confidence,
+                "method": "sample" if covers_whole_file else "full",
+                "has_chinese": has_chinese,
+                "scripts": counts,
+            })
+            return result
+        
+        # Fallback to detected encoding or utf-8
+        result.update({
+            "encoding": detected_encoding or 'utf-8',
+            "confidence": detected_confidence or 0.5,
+            "method": "fallback",
+        })
+        return result
+
+
+@dataclass(slots=True)
+class FixResult:
+    """Outcome of fix_csv_encoding"""
+    input_file: str
+    output_file: str
+    success: bool = False
+    message: str = ''
+    encoding: Optional[str] = None
+    encoding_confidence: Optional[float] = None
+    had_bom: bool = False
+    bytes_read: int = 0
+    bytes_written: int = 0
+    header: List[str] = field(default_factory=list)
+    rows: int = 0
+    characters: int = 0
+    chinese_characters: int = 0
+    latin_characters: int = 0
+    control_characters: int = 0
+    replacement_characters: int = 0
+    seconds: float = 0.0
+    
+    def render(self) -> str:
+        """Render the text report, or the error message of a failed fix"""
+        if not self.success:
+            return self.message
+        
+        message = f"Encoding conversion successful!\n"
+        message += f"Input file: {self.input_file}\n"
+        message += f"Output file: {self.output_file}\n"
+        message += f"Source encoding: {self.encoding}\n"
+        message += f"Target encoding: UTF-8\n"
+        message += f"Input size: {self.bytes_read} bytes\n"
+        message += f"Output size: {self.bytes_written} bytes\n"
+        
+        if self.had_bom:
+            bom_message = f"BOM removed from {self.output_file}"
+        else:
+            bom_message = f"No BOM found in {self.output_file}"
+        
+        final_report = f"CSV encoding fix completed successfully!\n\n"
+        final_report += message + "\n"
+        final_report += bom_message + "\n\n"
+        final_report += f"CSV Structure:\n"
+        final_report += f"Header fields: {len(self.header)}\n"
+        final_report += f"Data rows: {self.rows}\n"
+        final_report += f"Total characters: {self.characters}\n"
+        final_report += f"Chinese characters: {self.chinese_characters}\n"
+        final_report += f"Fields: {', '.join(self.header[:5])}{'...' if len(self.header) > 5 else ''}\n\n"
+        final_report += "File is ready for Snipe-IT import!\n"
+        return final_report
+
 
 class EncodingConverter:
     """CSV encoding converter for Chinese character support"""
     
-    def __init__(self):
-        """Initialize encoding converter"""
+    def __init__(self, cache: Optional[DetectionCache] = None, timer: Optional[StageTimer] = None):
+        """Initialize encoding converter; timer records per-stage timings when enabled"""
+        self.timer = timer or StageTimer()
         self.common_encodings = [
             'utf-8', 'utf-8-sig',  # UTF-8 with and without BOM
             'gbk', 'gb2312', 'gb18030',  # Chinese encodings
@@ -29,45 +889,32 @@ class EncodingConverter:
             'iso-8859-1', 'latin1',  # Western encodings
             'cp1252',  # Windows Western
         ]
+        self.detector = EncodingDetector(self.common_encodings, confidence_threshold=0.8, cache=cache,
+                                         timer=self.timer)
     
     def detect_encoding(self, file_path: str) -> Tuple[str, float]:
-        """Detect file encoding using chardet and manual testing"""
-        # First try chardet
-        with open(file_path, 'rb') as f:
-            raw_data = f.read()
-            result = chardet.detect(raw_data)
-            detected_encoding = result['encoding']
-            confidence = result['confidence']
+        """Detect file encoding using chardet and manual testing on sampled chunks"""
+        with self.timer.stage('detect'):
+            result = self.detector.detect(file_path)
         
-        print(f"Chardet detection: {detected_encoding} (confidence: {confidence:.2f})")
+        print(f"Chardet detection: {result['chardet_encoding']} (confidence: {result['chardet_confidence']:.2f})")
+        if result.get('scripts'):
+            counts = ', '.join(f"{name} {count}" for name, count in result['scripts'].items())
+            print(f"Sampled characters: {counts}")
         
-        # If confidence is high enough, use detected encoding
-        if confidence > 0.8 and detected_encoding:
-            return detected_encoding, confidence
+        if result['method'] == 'chardet':
+            return result['encoding'], result['confidence']
         
-        # Otherwise, try common encodings manually
         print("Low confidence detection, trying common encodings...")
         
-        for encoding in self.common_encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                    # Check if content contains Chinese characters
-                    has_chinese = any('\u4e00' <= char <= '\u9fff' for char in content)
-                    if has_chinese:
-                        print(f"Successfully read with {encoding} (contains Chinese characters)")
-                        return encoding, 0.9
-                    else:
-                        print(f"Successfully read with {encoding} (no Chinese characters detected)")
-                        return encoding, 0.7
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-            except Exception as e:
-                print(f"Error testing {encoding}: {e}")
-                continue
+        if result['method'] == 'fallback':
+            return result['encoding'], result['confidence']
         
-        # Fallback to detected encoding or utf-8
-        return detected_encoding or 'utf-8', confidence or 0.5
+        if result['has_chinese']:
+            print(f"Successfully read with {result['encoding']} (contains Chinese characters)")
+        else:
+            print(f"Successfully read with {result['encoding']} (no Chinese characters detected)")
+        return result['encoding'], result['confidence']
     
     def convert_to_utf8(self, input_file: str, output_file: str, source_encoding: Optional[str] = None) -> Tuple[bool, str]:
         """Convert CSV file to UTF-8 encoding"""
@@ -80,58 +927,69 @@ class EncodingConverter:
             
             print(f"Converting from {source_encoding} to UTF-8...")
             
-            # Read file with source encoding
-            with open(input_file, 'r', encoding=source_encoding) as infile:
-                content = infile.read()
-            
-            # Write file with UTF-8 encoding (without BOM)
-            with open(output_file, 'w', encoding='utf-8', newline='') as outfile:
-                outfile.write(content)
-            
-            # Verify the conversion
             try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    f.read()
-                
-                report = f"Encoding conversion successful!\n"
-                report += f"Input file: {input_file}\n"
-                report += f"Output file: {output_file}\n"
-                report += f"Source encoding: {source_encoding}\n"
-                report += f"Target encoding: UTF-8\n"
-                
-                # Check file sizes
-                input_size = os.path.getsize(input_file)
-                output_size = os.path.getsize(output_file)
-                report += f"Input size: {input_size} bytes\n"
-                report += f"Output size: {output_size} bytes\n"
-                
-                return True, report
-                
+                with self.timer.stage('convert.transcode', bytes=source_size(input_file)):
+                    if decoding_encoding(source_encoding) == 'utf-8-sig' and not is_stream_path(input_file):
+                        with mapped_file(input_file) as buffer, open_binary(output_file, 'wb') as outfile:
+                            start = len(UTF8_BOM) if buffer[:len(UTF8_BOM)] == UTF8_BOM else 0
+                            scan_utf8(buffer, start, copy_to=outfile)
+                    elif decoding_encoding(source_encoding) == 'utf-8-sig':
+                        with open_binary(input_file) as infile, open_binary(output_file, 'wb') as outfile:
+                            start = len(UTF8_BOM) if infile.peek(len(UTF8_BOM))[:len(UTF8_BOM)] == UTF8_BOM else 0
+                            infile.read(start)
+                            scan_utf8(infile, start, copy_to=outfile)
+                    else:
+                        # Write file with UTF-8 encoding (without BOM)
+                        with open_text(input_file, 'r', encoding=source_encoding) as infile, \
+                                open_text(output_file, 'w', encoding='utf-8') as outfile:
+                            shutil.copyfileobj(infile, outfile, 1 << 20)
             except UnicodeDecodeError:
                 return False, "Conversion failed: Output file is not valid UTF-8"
             
+            report = f"Encoding conversion successful!\n"
+            report += f"Input file: {input_file}\n"
+            report += f"Output file: {output_file}\n"
+            report += f"Source encoding: {source_encoding}\n"
+            report += f"Target encoding: UTF-8\n"
+            
+            # Check file sizes
+            input_size = source_size(input_file)
+            output_size = source_size(output_file)
+            report += f"Input size: {input_size} bytes\n"
+            report += f"Output size: {output_size} bytes\n"
+            
+            return True, report
+            
         except Exception as e:
             return False, f"Error during conversion: {str(e)}"
     
     def validate_utf8(self, file_path: str) -> Tuple[bool, str]:
         """Validate if file is properly encoded in UTF-8"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Check for BOM
-            with open(file_path, 'rb') as f:
-                first_bytes = f.read(3)
-                has_bom = first_bytes == b'\xef\xbb\xbf'
-            
-            # Count Chinese characters
-            chinese_chars = sum(1 for char in content if '\u4e00' <= char <= '\u9fff')
+            if is_stream_path(file_path):
+                with open_binary(file_path) as stream, \
+                        self.timer.stage('validate.scan', bytes=source_size(file_path)):
+                    has_bom = stream.peek(len(UTF8_BOM))[:len(UTF8_BOM)] == UTF8_BOM
+                    counts = scan_utf8(stream)
+            else:
+                with mapped_file(file_path) as buffer:
+                    # Check for BOM
+                    has_bom = buffer[:len(UTF8_BOM)] == UTF8_BOM
+                    with self.timer.stage('validate.scan', bytes=len(buffer)):
+                        counts = scan_utf8(buffer)
             
             report = f"UTF-8 Validation Report for: {file_path}\n"
             report += f"File is valid UTF-8: Yes\n"
             report += f"Has BOM: {'Yes' if has_bom else 'No'}\n"
-            report += f"Total characters: {len(content)}\n"
-            report += f"Chinese characters: {chinese_chars}\n"
+            report += f"Total characters: {counts['characters']}\n"
+            report += f"Chinese characters: {counts['chinese_characters']}\n"
+            report += f"Latin characters: {counts['latin_characters']}\n"
+            report += f"Control characters: {counts['control_characters']}\n"
+            report += f"Replacement characters: {counts['replacement_characters']}\n"
+            
+            if counts['replacement_characters']:
+                report += f"\nNote: File contains U+FFFD replacement characters, "
+                report += f"text may have been lost in an earlier lossy conversion.\n"
             
             if has_bom:
                 report += f"\nNote: File has BOM (Byte Order Mark). "
@@ -145,66 +1003,94 @@ class EncodingConverter:
             return False, f"Error validating file: {str(e)}"
     
     def remove_bom(self, file_path: str) -> Tuple[bool, str]:
-        """Remove BOM from UTF-8 file"""
+        """Remove BOM from UTF-8 file, replacing it with a copy of everything after the BOM"""
+        if is_stream_path(file_path):
+            return False, f"Cannot remove a BOM in place from a compressed file or archive member: {file_path}"
+        
         try:
-            # Read file as binary
             with open(file_path, 'rb') as f:
-                content = f.read()
+                # Check if file has BOM
+                if f.read(len(UTF8_BOM)) != UTF8_BOM:
+                    return True, f"No BOM found in {file_path}"
             
-            # Check if file has BOM
-            if content.startswith(b'\xef\xbb\xbf'):
-                # Remove BOM and write back
-                content_without_bom = content[3:]
-                with open(file_path, 'wb') as f:
-                    f.write(content_without_bom)
-                return True, f"BOM removed from {file_path}"
-            else:
-                return True, f"No BOM found in {file_path}"
+            # The original stays untouched until the copy replaces it
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    with mapped_file(file_path) as buffer, memoryview(buffer) as view:
+                        f.write(view[len(UTF8_BOM):])
+                os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+                # The map is closed first: Windows cannot replace a mapped file
+                os.replace(temp_path, file_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            return True, f"BOM removed from {file_path}"
                 
         except Exception as e:
             return False, f"Error removing BOM: {str(e)}"
     
     def fix_csv_encoding(self, input_file: str, output_file: str) -> Tuple[bool, str]:
+        """Complete CSV encoding fix process, returning (success, text report)"""
+        result = self.fix_csv_encoding_result(input_file, output_file)
+        return result.success, result.render()
+    
+    def fix_csv_encoding_result(self, input_file: str, output_file: str) -> FixResult:
         """Complete CSV encoding fix process"""
+        started = time.perf_counter()
+        result = FixResult(input_file, output_file)
+        source_encoding = None
         try:
-            # Step 1: Detect and convert encoding
-            success, message = self.convert_to_utf8(input_file, output_file)
-            if not success:
-                return False, message
+            # Step 1: Detect source encoding
+            source_encoding, confidence = self.detect_encoding(input_file)
+            result.encoding = source_encoding
+            result.encoding_confidence = confidence
+            if confidence < 0.5:
+                result.message = f"Could not reliably detect encoding for {input_file}"
+                return result
+            
+            with open_binary(input_file) as f:
+                result.had_bom = f.read(len(UTF8_BOM)) == UTF8_BOM
             
-            # Step 2: Remove BOM if present
-            success, bom_message = self.remove_bom(output_file)
-            if not success:
-                return False, bom_message
+            print(f"Converting from {source_encoding} to UTF-8...")
             
-            # Step 3: Validate final result
-            is_valid, validation_report = self.validate_utf8(output_file)
-            if not is_valid:
-                return False, validation_report
+            # Step 2: Decode, drop the BOM, write UTF-8 and parse the CSV as the lines go by.
+            # The output is produced by the UTF-8 encoder, so it is valid UTF-8 by construction.
+            stats = {}
+            with open_text(input_file, 'r', encoding=decoding_encoding(source_encoding)) as infile, \
+                    open_text(output_file, 'w', encoding='utf-8') as outfile, \
+                    self.timer.stage('fix.transcode', bytes=source_size(input_file)) as stage:
+                try:
+                    reader = csv.reader(iter_text_lines(infile, stats, copy_to=outfile))
+                    header = next(reader, None)
+                    result.rows = sum(1 for row in reader)
+                    stage.rows = result.rows
+                except csv.Error as e:
+                    result.message = f"CSV parsing test failed: {str(e)}"
+                    return result
             
-            # Step 4: Test CSV parsing
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    header = next(reader)
-                    row_count = sum(1 for row in reader)
-                
-                final_report = f"CSV encoding fix completed successfully!\n\n"
-                final_report += message + "\n"
-                final_report += bom_message + "\n\n"
-                final_report += f"CSV Structure:\n"
-                final_report += f"Header fields: {len(header)}\n"
-                final_report += f"Data rows: {row_count}\n"
-                final_report += f"Fields: {', '.join(header[:5])}{'...' if len(header) > 5 else ''}\n\n"
-                final_report += "File is ready for Snipe-IT import!\n"
-                
-                return True, final_report
-                
-            except Exception as e:
-                return False, f"CSV parsing test failed: {str(e)}"
+            if header is None:
+                result.message = "CSV parsing test failed: file has no header row"
+                return result
+            
+            result.header = header
+            result.bytes_read = source_size(input_file)
+            result.bytes_written = source_size(output_file)
+            result.characters = stats['characters']
+            result.chinese_characters = stats['chinese_characters']
+            result.latin_characters = stats['latin_characters']
+            result.control_characters = stats['control_characters']
+            result.replacement_characters = stats['replacement_characters']
+            result.success = True
             
+        except UnicodeDecodeError as e:
+            result.message = f"Conversion failed: input is not valid {source_encoding}: {str(e)}"
         except Exception as e:
-            return False, f"Error in encoding fix process: {str(e)}"
+            result.message = f"Error in encoding fix process: {str(e)}"
+        finally:
+            result.seconds = time.perf_counter() - started
+        
+        return result
 
 def main():
     """Main function for command line interface"""
@@ -217,8 +1103,13 @@ Examples:
   python encoding-converter.py convert input.csv output.csv --encoding gbk
   python encoding-converter.py validate input.csv
   python encoding-converter.py detect input.csv
+  python encoding-converter.py detect input.csv --no-cache
   python encoding-converter.py fix input.csv output.csv
+  python encoding-converter.py fix input.csv output.csv --report-format json
   python encoding-converter.py remove-bom file.csv
+  python encoding-converter.py fix input.csv output.csv --timings --profile fix.prof
+  python encoding-converter.py fix input.csv.gz output.csv.gz
+  python encoding-converter.py fix "vendor.zip!assets.csv" output.csv
         """
     )
     
@@ -242,59 +1133,80 @@ Examples:
     fix_parser = subparsers.add_parser('fix', help='Complete encoding fix process')
     fix_parser.add_argument('input', help='Input file path')
     fix_parser.add_argument('output', help='Output file path')
+    fix_parser.add_argument('--report-format', choices=['text', 'json'], default='text',
+                           help='Report format; with json, progress messages go to stderr (default: text)')
     
     # Remove BOM command
     bom_parser = subparsers.add_parser('remove-bom', help='Remove BOM from UTF-8 file')
     bom_parser.add_argument('input', help='Input file path')
     
+    for detecting_parser in (convert_parser, detect_parser, fix_parser):
+        detecting_parser.add_argument('--no-cache', action='store_true',
+                                      help='Do not read or update the encoding detection cache')
+    
+    for command_parser in (convert_parser, validate_parser, detect_parser, fix_parser, bom_parser):
+        add_instrumentation_arguments(command_parser)
+    
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         return
     
-    converter = EncodingConverter()
+    cache = None if getattr(args, 'no_cache', True) else DetectionCache()
+    timer = StageTimer(enabled=args.timings)
+    converter = EncodingConverter(cache, timer)
     
-    if args.command == 'convert':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+    with instrumented(args, timer):
+        if args.command == 'convert':
+            if not source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            success, message = converter.convert_to_utf8(args.input, args.output, args.encoding)
+            print(message)
         
-        success, message = converter.convert_to_utf8(args.input, args.output, args.encoding)
-        print(message)
-    
-    elif args.command == 'validate':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+        elif args.command == 'validate':
+            if not source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            is_valid, report = converter.validate_utf8(args.input)
+            print(report)
         
-        is_valid, report = converter.validate_utf8(args.input)
-        print(report)
-    
-    elif args.command == 'detect':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+        elif args.command == 'detect':
+            if not source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            encoding, confidence = converter.detect_encoding(args.input)
+            print(f"Detected encoding: {encoding}")
+            print(f"Confidence: {confidence:.2f}")
         
-        encoding, confidence = converter.detect_encoding(args.input)
-        print(f"Detected encoding: {encoding}")
-        print(f"Confidence: {confidence:.2f}")
-    
-    elif args.command == 'fix':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+        elif args.command == 'fix':
+            if not source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            if args.report_format == 'json':
+                # stdout carries only the report
+                with redirect_stdout(sys.stderr):
+                    result = converter.fix_csv_encoding_result(args.input, args.output)
+                print(json.dumps(asdict(result), ensure_ascii=False, indent=2))
+            else:
+                success, message = converter.fix_csv_encoding(args.input, args.output)
+                print(message)
         
-        success, message = converter.fix_csv_encoding(args.input, args.output)
-        print(message)
-    
-    elif args.command == 'remove-bom':
-        if not os.path.exists(args.input):
-            print(f"Error: Input file '{args.input}' not found.")
-            return
+        elif args.command == 'remove-bom':
+            if not source_exists(args.input):
+                print(f"Error: Input file '{args.input}' not found.")
+                return
+            
+            success, message = converter.remove_bom(args.input)
+            print(message)
         
-        success, message = converter.remove_bom(args.input)
-        print(message)
+    if cache is not None:
+        cache.save()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,999 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snipe-IT REST API Importer
+Push converted CSV files to Snipe-IT through its REST API
+
+Author: Manus AI
+Date: 2025-07-23
+Version: 1.0
+"""
+
+__version__ = "1.0"
+
+import os
+import csv
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import tempfile
+import threading
+import importlib.util
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from queue import Empty, LifoQueue
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+# load_tool lives in encoding-converter.py, which every tool uses
+if 'encoding_converter' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        'encoding_converter', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'encoding-converter.py'))
+    sys.modules['encoding_converter'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['encoding_converter'])
+load_tool = sys.modules['encoding_converter'].load_tool
+
+DEFAULT_ID_CACHE_FILE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'snipeit-csv-tools', 'api-ids.json'
+)
+
+# REST endpoint (under /api/v1) that creates the items of each asset type
+ENDPOINTS = {
+    'assets': 'hardware',
+    'users': 'users',
+    'accessories': 'accessories',
+    'consumables': 'consumables',
+    'licenses': 'licenses',
+    'components': 'components',
+}
+
+# Converted CSV columns sent as they are, and the request field they go to
+PLAIN_FIELDS = {
+    'assets': {'Item Name': 'name', 'Asset Tag': 'asset_tag', 'Serial': 'serial', 'Order Number': 'order_number',
+               'Purchase Date': 'purchase_date', 'Purchase Cost': 'purchase_cost', 'Notes': 'notes',
+               'Warranty months': 'warranty_months'},
+    'users': {'Username': 'username', 'Email': 'email', 'Job Title': 'jobtitle', 'Phone': 'phone',
+              'Address': 'address', 'City': 'city', 'State': 'state', 'Country': 'country', 'Zip': 'zip',
+              'Notes': 'notes', 'Active': 'activated'},
+    'accessories': {'Item Name': 'name', 'Name': 'name', 'Quantity': 'qty', 'Model Number': 'model_number',
+                    'Min Qty': 'min_amt', 'Order Number': 'order_number', 'Purchase Date': 'purchase_date',
+                    'Purchase Cost': 'purchase_cost', 'Notes': 'notes'},
+    'consumables': {'Item Name': 'name', 'Name': 'name', 'Quantity': 'qty', 'Model Number': 'model_number',
+                    'Min Qty': 'min_amt', 'Order Number': 'order_number', 'Purchase Date': 'purchase_date',
+                    'Purchase Cost': 'purchase_cost', 'Notes': 'notes'},
+    'licenses': {'License Name': 'name', 'Item Name': 'name', 'Name': 'name', 'Seats': 'seats',
+                 'Product Key': 'serial', 'License Key': 'serial', 'License Email': 'license_email',
+                 'Expiration Date': 'expiration_date', 'Maintained': 'maintained', 'Order Number': 'order_number',
+                 'Purchase Date': 'purchase_date', 'Purchase Cost': 'purchase_cost', 'Notes': 'notes'},
+    'components': {'Item Name': 'name', 'Name': 'name', 'Quantity': 'qty', 'Serial': 'serial',
+                   'Min Qty': 'min_amt', 'Order Number': 'order_number', 'Purchase Date': 'purchase_date',
+                   'Purchase Cost': 'purchase_cost', 'Notes': 'notes'},
+}
+
+# Converted CSV columns that name a related record: its endpoint and the request field for its ID
+REFERENCE_FIELDS = {
+    'Company': ('companies', 'company_id'),
+    'Location': ('locations', 'location_id'),
+    'Supplier': ('suppliers', 'supplier_id'),
+    'Manufacturer': ('manufacturers', 'manufacturer_id'),
+    'Category': ('categories', 'category_id'),
+    'Status': ('statuslabels', 'status_id'),
+    'Department': ('departments', 'department_id'),
+}
+
+# Related records are resolved in this order; models refer to categories and manufacturers
+REFERENCE_ORDER = ['companies', 'locations', 'suppliers', 'manufacturers', 'categories',
+                   'statuslabels', 'departments', 'models']
+
+# Request fields holding the ID of a related record, and the endpoint it comes from
+ID_REQUEST_FIELDS = dict({request_field: endpoint for endpoint, request_field in REFERENCE_FIELDS.values()},
+                         model_id='models', rtd_location_id='locations')
+
+DATE_REQUEST_FIELDS = frozenset(['purchase_date', 'expiration_date'])
+
+class APIError(Exception):
+    """A Snipe-IT API request failed after all retries"""
+    
+    def __init__(self, message: str, status: Optional[int] = None, messages=None):
+        """Keep the HTTP status and the API's validation messages, if any"""
+        super().__init__(message)
+        self.status = status
+        self.messages = messages
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one Snipe-IT host, at most size at once"""
+    
+    def __init__(self, base_url: str, size: int = 4, timeout: float = 30.0):
+        """Prepare a pool for base_url; connections are opened on first use"""
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {base_url}")
+        # Imported here, not at the top: batch-convert.py loads this script for its options only
+        import http.client
+        self.errors = (http.client.HTTPException, OSError)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.idle = LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+    
+    @contextmanager
+    def connection(self) -> Iterator['http.client.HTTPConnection']:
+        """Borrow a connection; it is dropped instead of returned if the request failed"""
+        with self.slots:
+            try:
+                conn = self.idle.get_nowait()
+            except Empty:
+                conn = self.connection_class(self.host, self.port, timeout=self.timeout)
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            self.idle.put(conn)
+    
+    def close(self) -> None:
+        """Close every idle connection"""
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except Empty:
+                return
+
+class SnipeITClient:
+    """Minimal Snipe-IT REST API client on a pooled keep-alive session, backing off on 429 and gateway errors"""
+    
+    RETRY_STATUSES = frozenset([429, 502, 503, 504])
+    
+    def __init__(self, base_url: str, token: str, concurrency: int = 4, max_retries: int = 5,
+                 backoff: float = 1.0, timeout: float = 30.0):
+        """Initialize client for a Snipe-IT base URL and API token"""
+        self.base_url = base_url.rstrip('/')
+        self.pool = ConnectionPool(base_url, concurrency, timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.headers = {
+            'Authorization': f'Bearer {token}',
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive',
+            'User-Agent': f'snipeit-push/{__version__}',
+        }
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+        self.stats = Counter()
+    
+    def wait_for_throttle(self) -> None:
+        """Sleep until a pause requested by a 429 response is over"""
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def request(self, method: str, path: str, params: Optional[Dict] = None, body: Optional[Dict] = None) -> Dict:
+        """Send one API request and return the decoded JSON response"""
+        url = f"{self.pool.path_prefix}/api/v1/{path}"
+        if params:
+            url += '?' + urlencode(params)
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else None
+        
+        for attempt in range(self.max_retries + 1):
+            self.wait_for_throttle()
+            retry_after = None
+            try:
+                with self.pool.connection() as conn:
+                    conn.request(method, url, body=payload, headers=self.headers)
+                    response = conn.getresponse()
+                    # The body must be read completely before the connection can be reused
+                    data = response.read()
+                    status = response.status
+                    retry_after = response.getheader('Retry-After')
+            except self.pool.errors as e:
+                status = None
+                error = f"{type(e).__name__}: {e}"
+            
+            with self.lock:
+                self.stats['requests'] += 1
+            
+            if status is not None and status not in self.RETRY_STATUSES:
+                if status >= 400:
+                    try:
+                        messages = json.loads(data).get('messages')
+                    except (ValueError, AttributeError):
+                        messages = None
+                    raise APIError(f"{method} {path}: HTTP {status}: {data[:200].decode('utf-8', 'replace')}",
+                                   status, messages)
+                try:
+                    return json.loads(data) if data else {}
+                except ValueError:
+                    raise APIError(f"{method} {path}: response is not JSON")
+            
+            if status is not None:
+                error = f"HTTP {status}"
+            if attempt == self.max_retries:
+                raise APIError(f"{method} {path}: {error} after {attempt + 1} attempts")
+            
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = self.backoff * 2 ** attempt
+            # A little jitter keeps the workers from retrying in lockstep
+            delay = min(delay, 60.0) * random.uniform(1.0, 1.25)
+            with self.lock:
+                self.stats['retries'] += 1
+                if status == 429:
+                    self.stats['throttled'] += 1
+                    self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            if status != 429:
+                time.sleep(delay)
+    
+    def iter_rows(self, endpoint: str, params: Optional[Dict] = None, page_size: int = 500) -> Iterator[Dict]:
+        """Yield every record of a list endpoint, a page at a time"""
+        offset = 0
+        while True:
+            page = self.request('GET', endpoint, dict(params or {}, limit=page_size, offset=offset))
+            rows = page.get('rows') or []
+            yield from rows
+            offset += len(rows)
+            if not rows or offset >= page.get('total', 0):
+                return
+    
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.pool.close()
+
+class IDResolver:
+    """Name to ID lookups for categories, manufacturers, status labels and other related records"""
+    
+    def __init__(self, client: SnipeITClient, cache_file: Optional[str] = None, create_missing: bool = True):
+        """Initialize resolver, loading the cached IDs of the client's server"""
+        self.client = client
+        self.cache_file = cache_file or os.environ.get('SNIPEIT_API_ID_CACHE') or DEFAULT_ID_CACHE_FILE
+        self.create_missing = create_missing
+        self.ids = self._read_file().get(client.base_url, {})
+        self.listed = set()
+        self.created = Counter()
+        self.lock = threading.Lock()
+    
+    def _read_file(self) -> Dict:
+        """Read the cache file, ignoring a missing or corrupt one"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    @staticmethod
+    def key(endpoint: str, record: Dict) -> str:
+        """Return the lookup key of a record: categories by name and type, models by name and number"""
+        name = str(record.get('name') or '')
+        if endpoint == 'categories':
+            return f"{name}\x1f{record.get('category_type') or ''}"
+        if endpoint == 'models':
+            return f"{name}\x1f{record.get('model_number') or ''}"
+        return name
+    
+    def get(self, endpoint: str, key: str) -> Optional[int]:
+        """Return the cached ID of a record"""
+        return self.ids.get(endpoint, {}).get(key)
+    
+    def listed_ids(self, endpoint: str) -> Dict[str, int]:
+        """Return the IDs of every existing record of an endpoint"""
+        ids = {}
+        for record in self.client.iter_rows(endpoint):
+            if endpoint == 'categories':
+                # Listings return the type capitalised
+                record = dict(record, category_type=str(record.get('category_type') or '').lower())
+            ids[self.key(endpoint, record)] = record['id']
+        return ids
+    
+    def list_endpoint(self, endpoint: str) -> None:
+        """Cache the IDs of every existing record of an endpoint"""
+        self.ids.setdefault(endpoint, {}).update(self.listed_ids(endpoint))
+        self.listed.add(endpoint)
+    
+    def create(self, endpoint: str, body: Dict) -> Optional[int]:
+        """Create a record and return its ID"""
+        response = self.client.request('POST', endpoint, body=body)
+        if response.get('status') != 'success':
+            raise APIError(f"Could not create {endpoint} '{body.get('name')}': {response.get('messages')}")
+        with self.lock:
+            self.created[endpoint] += 1
+        return (response.get('payload') or {}).get('id')
+    
+    def resolve(self, endpoint: str, records: Dict[str, Dict], executor: ThreadPoolExecutor) -> List[str]:
+        """Make sure every record (key to create body) has an ID, returning errors"""
+        missing = [key for key in records if self.get(endpoint, key) is None]
+        if missing and endpoint not in self.listed:
+            self.list_endpoint(endpoint)
+            missing = [key for key in missing if self.get(endpoint, key) is None]
+        if not missing or not self.create_missing:
+            return [f"No {endpoint} record named '{key.split(chr(31))[0]}'" for key in missing]
+        
+        errors = []
+        ids = self.ids.setdefault(endpoint, {})
+        futures = [(key, executor.submit(self.create, endpoint, records[key])) for key in missing]
+        for key, future in futures:
+            try:
+                ids[key] = future.result()
+            except APIError as e:
+                errors.append(str(e))
+        return errors
+    
+    def refresh(self, endpoint: str, records: Dict[str, Dict]) -> List[str]:
+        """Look up the IDs of records again after the API rejected cached ones, returning errors"""
+        ids = self.listed_ids(endpoint)
+        errors = []
+        for key, body in records.items():
+            if key in ids:
+                continue
+            if not self.create_missing:
+                errors.append(f"No {endpoint} record named '{key.split(chr(31))[0]}'")
+                continue
+            try:
+                ids[key] = self.create(endpoint, body)
+            except APIError as e:
+                errors.append(str(e))
+        # Swapped in whole, so concurrent push workers never see a record missing
+        self.ids[endpoint] = ids
+        self.listed.add(endpoint)
+        return errors
+    
+    def save(self) -> None:
+        """Write the cache file, keeping the entries of other servers"""
+        data = self._read_file()
+        data[self.client.base_url] = self.ids
+        directory = os.path.dirname(self.cache_file) or '.'
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, self.cache_file)
+
+@dataclass(slots=True)
+class PushResult:
+    """Outcome of pushing one converted CSV file, rendered by render()"""
+    file: str
+    endpoint: str
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    references_created: Dict[str, int] = field(default_factory=dict)
+    reference_errors: List[str] = field(default_factory=list)
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    seconds: float = 0.0
+    
+    def render(self) -> str:
+        """Render the text report"""
+        report = f"Push Report for: {self.file}\n"
+        report += f"Endpoint: /api/v1/{self.endpoint}\n"
+        report += f"Rows: {self.rows}, created: {self.created}, failed: {self.failed}\n"
+        for endpoint, count in self.references_created.items():
+            report += f"Created {count} {endpoint}\n"
+        for error in self.reference_errors:
+            report += f"  ✗ {error}\n"
+        for line_number, message in self.errors:
+            report += f"  ✗ line {line_number}: {message}\n"
+        if self.failed > len(self.errors):
+            report += f"  ... {self.failed - len(self.errors)} more failed rows\n"
+        report += f"Requests: {self.requests} ({self.retries} retried, {self.throttled} throttled)\n"
+        if self.seconds:
+            report += f"Time: {self.seconds:.1f}s ({self.rows / self.seconds:.1f} rows/s)\n"
+        return report
+
+class CSVPusher:
+    """Push the rows of converted CSV files to the Snipe-IT API"""
+    
+    def __init__(self, client: SnipeITClient, resolver: IDResolver, asset_type: str = 'assets',
+                 concurrency: int = 4, default_status: str = 'Ready to Deploy', max_errors: int = 20):
+        """Initialize pusher for one asset type"""
+        self.client = client
+        self.resolver = resolver
+        self.asset_type = asset_type
+        self.endpoint = ENDPOINTS[asset_type]
+        self.concurrency = concurrency
+        self.default_status = default_status
+        self.max_errors = max_errors
+        
+        field_tools = load_tool('csv-field-converter.py')
+        # Converted files may have been written compressed (.gz, .zst)
+        self.open_text = load_tool('encoding-converter.py').open_text
+        self.date_formats = field_tools.DATE_FORMATS
+        self.cost_noise = field_tools.COST_NOISE
+        self.category_type = field_tools.CATEGORY_TYPES.get(asset_type, '')
+    
+    def plan(self, header: List[str]) -> Dict:
+        """Resolve once per file which column feeds which request field"""
+        index = {}
+        for position, name in enumerate(header):
+            index.setdefault(name.strip().lower(), position)
+        
+        plain_fields = PLAIN_FIELDS[self.asset_type]
+        plain = []
+        for column, request_field in plain_fields.items():
+            position = index.get(column.lower())
+            if position is not None and request_field not in {name for _, name in plain}:
+                plain.append((position, request_field))
+        
+        references = [(index[column.lower()], endpoint, request_field)
+                      for column, (endpoint, request_field) in REFERENCE_FIELDS.items()
+                      if column.lower() in index]
+        if self.asset_type == 'users':
+            # Users are not categorised
+            references = [reference for reference in references if reference[1] != 'categories']
+        
+        return {
+            "plain": plain,
+            "references": references,
+            "full_name": index.get('full name'),
+            "model_name": index.get('model name', index.get('model')),
+            "model_number": index.get('model number'),
+            "category": index.get('category'),
+            "manufacturer": index.get('manufacturer'),
+            "status": index.get('status'),
+        }
+    
+    def reference_body(self, endpoint: str, name: str) -> Dict:
+        """Return the create body of a related record named in a row"""
+        if endpoint == 'categories':
+            return {"name": name, "category_type": self.category_type}
+        if endpoint == 'statuslabels':
+            # What createOrFetchStatusLabel creates
+            return {"name": name, "type": "deployable"}
+        return {"name": name}
+    
+    def model_key(self, plan: Dict, row: List[str]) -> Tuple[str, Dict]:
+        """Return the lookup key and create body of the model a row names"""
+        name = self.cell(row, plan["model_name"])
+        number = self.cell(row, plan["model_number"])
+        body = {"name": name or number or 'Unknown', "model_number": number,
+                "category": self.cell(row, plan["category"]) or 'Unnamed Category',
+                "manufacturer": self.cell(row, plan["manufacturer"])}
+        return self.resolver.key('models', body), body
+    
+    @staticmethod
+    def cell(row: List[str], position: Optional[int]) -> str:
+        """Return a stripped cell, or '' for a missing column"""
+        if position is None or position >= len(row):
+            return ''
+        return row[position].strip()
+    
+    def collect_references(self, file_path: str) -> Dict[str, Dict[str, Dict]]:
+        """First pass: the distinct related records a file names, per endpoint"""
+        wanted = {endpoint: {} for endpoint in REFERENCE_ORDER}
+        with self.open_text(file_path, encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            plan = self.plan(next(reader, []))
+            if self.asset_type == 'assets' and plan["status"] is None:
+                wanted['statuslabels'][self.default_status] = self.reference_body('statuslabels', self.default_status)
+            for row in reader:
+                for position, endpoint, _ in plan["references"]:
+                    name = self.cell(row, position)
+                    if name:
+                        body = self.reference_body(endpoint, name)
+                        wanted[endpoint].setdefault(self.resolver.key(endpoint, body), body)
+                if self.asset_type == 'assets':
+                    if plan["status"] is not None and not self.cell(row, plan["status"]):
+                        wanted['statuslabels'].setdefault(self.default_status,
+                                                          self.reference_body('statuslabels', self.default_status))
+                    key, body = self.model_key(plan, row)
+                    wanted['models'].setdefault(key, body)
+                    category = self.reference_body('categories', body["category"])
+                    wanted['categories'].setdefault(self.resolver.key('categories', category), category)
+        return wanted
+    
+    def model_body(self, body: Dict) -> Dict:
+        """Turn a collected model into its create body, once categories and manufacturers have IDs"""
+        category = self.resolver.get('categories', self.resolver.key(
+            'categories', self.reference_body('categories', body["category"])))
+        manufacturer = self.resolver.get('manufacturers', body["manufacturer"]) if body["manufacturer"] else None
+        model = {"name": body["name"], "model_number": body["model_number"], "category_id": category}
+        if manufacturer is not None:
+            model["manufacturer_id"] = manufacturer
+        return model
+    
+    def normalize(self, request_field: str, value: str) -> str:
+        """Bring dates and costs into the formats the API validates against"""
+        if request_field in DATE_REQUEST_FIELDS:
+            for date_format in self.date_formats:
+                try:
+                    return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+        elif request_field == 'purchase_cost':
+            return self.cost_noise.sub('', value)
+        return value
+    
+    def build_body(self, plan: Dict, row: List[str]) -> Dict:
+        """Build the create request of one row"""
+        body = {}
+        for position, request_field in plan["plain"]:
+            value = self.cell(row, position)
+            if value:
+                body[request_field] = self.normalize(request_field, value)
+        
+        for position, endpoint, request_field in plan["references"]:
+            name = self.cell(row, position)
+            if not name:
+                continue
+            record_id = self.resolver.get(endpoint, self.resolver.key(endpoint, self.reference_body(endpoint, name)))
+            if record_id is None:
+                raise APIError(f"No {endpoint} record named '{name}'")
+            body[request_field] = record_id
+        
+        if self.asset_type == 'assets':
+            model_id = self.resolver.get('models', self.model_key(plan, row)[0])
+            if model_id is None:
+                raise APIError("Model could not be resolved")
+            body["model_id"] = model_id
+            if "status_id" not in body:
+                body["status_id"] = self.resolver.get('statuslabels', self.default_status)
+            # The asset importer files the location as the default (ready to deploy) location
+            if "location_id" in body:
+                body["rtd_location_id"] = body.pop("location_id")
+        
+        elif self.asset_type == 'users':
+            full_name = self.cell(row, plan["full_name"])
+            first_name, _, last_name = full_name.partition(' ')
+            body["first_name"] = first_name or body.get("username", '')
+            if last_name:
+                body["last_name"] = last_name.strip()
+            # Like the web importer, users get a random password they have to reset
+            body["password"] = body["password_confirmation"] = secrets.token_urlsafe(30)
+        
+        return body
+    
+    @staticmethod
+    def stale_endpoints(body: Dict, status: Optional[int], messages) -> List[str]:
+        """Return the endpoints whose cached IDs a rejected create may have used"""
+        referenced = {ID_REQUEST_FIELDS[name] for name in body if name in ID_REQUEST_FIELDS}
+        if isinstance(messages, dict):
+            return [endpoint for endpoint in REFERENCE_ORDER
+                    if endpoint in referenced and any(ID_REQUEST_FIELDS.get(name) == endpoint for name in messages)]
+        if status in (404, 422):
+            return [endpoint for endpoint in REFERENCE_ORDER if endpoint in referenced]
+        return []
+    
+    def push_file(self, file_path: str) -> PushResult:
+        """Push every row of a converted CSV file"""
+        started = time.perf_counter()
+        stats_before = Counter(self.client.stats)
+        result = PushResult(file_path, self.endpoint)
+        lock = threading.Lock()
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            wanted = self.collect_references(file_path)
+            
+            def records(endpoint: str) -> Dict[str, Dict]:
+                if endpoint == 'models':
+                    return {key: self.model_body(body) for key, body in wanted[endpoint].items()}
+                return wanted[endpoint]
+            
+            for endpoint in REFERENCE_ORDER:
+                if wanted[endpoint]:
+                    result.reference_errors.extend(self.resolver.resolve(endpoint, records(endpoint), executor))
+            self.resolver.save()
+            
+            refreshed = set()
+            refresh_lock = threading.Lock()
+            
+            def refresh(endpoints: List[str]) -> None:
+                """Look up the IDs of endpoints again, at most once per file"""
+                with refresh_lock:
+                    for endpoint in endpoints:
+                        if endpoint not in refreshed:
+                            refreshed.add(endpoint)
+                            result.reference_errors.extend(self.resolver.refresh(endpoint, records(endpoint)))
+            
+            def record_failure(line_number: int, message: str) -> None:
+                with lock:
+                    result.failed += 1
+                    if len(result.errors) < self.max_errors:
+                        result.errors.append((line_number, message))
+            
+            def push_row(line_number: int, row: List[str], body: Dict, retry: bool = True) -> None:
+                try:
+                    response = self.client.request('POST', self.endpoint, body=body)
+                except APIError as e:
+                    status, messages, error = e.status, e.messages, str(e)
+                else:
+                    if response.get('status') == 'success':
+                        with lock:
+                            result.created += 1
+                        return
+                    status, messages = None, response.get('messages')
+                    error = json.dumps(messages, ensure_ascii=False)
+                
+                stale = self.stale_endpoints(body, status, messages) if retry else []
+                if not stale:
+                    record_failure(line_number, error)
+                    return
+                # A cached ID was rejected: the record was deleted or renamed since it was cached
+                refresh(stale)
+                try:
+                    body = self.build_body(plan, row)
+                except APIError as e:
+                    record_failure(line_number, str(e))
+                    return
+                push_row(line_number, row, body, retry=False)
+            
+            # Bounded in-flight window: the reader never runs far ahead of the API
+            window = threading.BoundedSemaphore(self.concurrency * 4)
+            with self.open_text(file_path, encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                plan = self.plan(next(reader, []))
+                for row in reader:
+                    if not any(value.strip() for value in row):
+                        continue
+                    result.rows += 1
+                    try:
+                        body = self.build_body(plan, row)
+                    except APIError as e:
+                        record_failure(reader.line_num, str(e))
+                        continue
+                    window.acquire()
+                    future = executor.submit(push_row, reader.line_num, row, body)
+                    future.add_done_callback(lambda _: window.release())
+        
+        if refreshed:
+            self.resolver.save()
+        
+        for endpoint, count in self.resolver.created.items():
+            result.references_created[endpoint] = count
+        self.resolver.created.clear()
+        stats = Counter(self.client.stats)
+        stats.subtract(stats_before)
+        result.requests = stats['requests']
+        result.retries = stats['retries']
+        result.throttled = stats['throttled']
+        result.seconds = time.perf_counter() - started
+        return result
+
+class MockSnipeIT:
+    """In-memory stand-in for the parts of the Snipe-IT REST API used by push"""
+    
+    def __init__(self, address: Tuple[str, int], rate_limit: int = 0, latency: float = 0.0):
+        """Start serving on address (port 0 picks a free one) with empty tables"""
+        # Imported here: only the mock serves HTTP, pushing needs the client side alone
+        from http.server import ThreadingHTTPServer
+        self.httpd = ThreadingHTTPServer(address, _mock_handler())
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.server_address = self.httpd.server_address
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.records = {}
+        self.last_id = 0
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.stats = Counter()
+    
+    @property
+    def url(self) -> str:
+        """Base URL of the mock"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def serve_forever(self) -> None:
+        self.httpd.serve_forever()
+    
+    def shutdown(self) -> None:
+        self.httpd.shutdown()
+    
+    def server_close(self) -> None:
+        self.httpd.server_close()
+    
+    def throttled(self) -> bool:
+        """Count a request, reporting whether it exceeds the rate limit"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if not self.rate_limit:
+                return False
+            now = time.monotonic()
+            while self.recent and self.recent[0] <= now - 1.0:
+                self.recent.popleft()
+            if len(self.recent) >= self.rate_limit:
+                self.stats['throttled'] += 1
+                return True
+            self.recent.append(now)
+            return False
+    
+    def create(self, endpoint: str, body: Dict) -> Tuple[int, Dict]:
+        """Store a record, rejecting duplicate asset tags and usernames and unknown related IDs"""
+        with self.lock:
+            invalid = {name: [f"The selected {name.replace('_', ' ')} is invalid."] for name, value in body.items()
+                       if name in ID_REQUEST_FIELDS and value is not None
+                       and not any(r['id'] == value for r in self.records.get(ID_REQUEST_FIELDS[name], []))}
+            if invalid:
+                return 422, {"status": "error", "messages": invalid, "payload": None}
+            records = self.records.setdefault(endpoint, [])
+            for unique_field in ('asset_tag', 'username'):
+                if body.get(unique_field) and any(r.get(unique_field) == body[unique_field] for r in records):
+                    return 200, {"status": "error", "messages": {unique_field: [f"The {unique_field} must be unique."]},
+                                 "payload": None}
+            # IDs are never reused, so a deleted record's cached ID stays invalid
+            self.last_id += 1
+            record = dict(body, id=self.last_id)
+            records.append(record)
+            self.stats['created'] += 1
+        return 200, {"status": "success", "messages": "Created", "payload": record}
+    
+    def delete(self, endpoint: str, record_id: int) -> Tuple[int, Dict]:
+        """Remove a record"""
+        with self.lock:
+            records = self.records.get(endpoint, [])
+            remaining = [r for r in records if r['id'] != record_id]
+            if len(remaining) == len(records):
+                return 404, {"status": "error", "messages": "Not found", "payload": None}
+            self.records[endpoint] = remaining
+        return 200, {"status": "success", "messages": "Deleted", "payload": None}
+    
+    def list(self, endpoint: str, query: Dict[str, List[str]]) -> Dict:
+        """Return a filtered page of records"""
+        filters = {name: values[0] for name, values in query.items()
+                   if name in ('name', 'category_type', 'model_number', 'asset_tag')}
+        with self.lock:
+            rows = [r for r in self.records.get(endpoint, [])
+                    if all(str(r.get(name) or '') == value for name, value in filters.items())]
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', ['50'])[0])
+        return {"total": len(rows), "rows": rows[offset:offset + limit]}
+
+# Request handler class of MockSnipeIT, built by _mock_handler()
+_MockHandler = None
+
+def _mock_handler():
+    """Return the request handler class of MockSnipeIT, built on first use like the server"""
+    global _MockHandler
+    if _MockHandler is not None:
+        return _MockHandler
+    from http.server import BaseHTTPRequestHandler
+    
+    class Handler(BaseHTTPRequestHandler):
+        """Request handler of MockSnipeIT"""
+        
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; with Nagle on, keep-alive clients stall on delayed ACKs
+        disable_nagle_algorithm = True
+        
+        def send_json(self, status: int, data: Dict, headers: Optional[Dict] = None) -> None:
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def route(self) -> Optional[Tuple[str, Dict]]:
+            """Check auth and throttling, returning the endpoint and query of an API request"""
+            mock = self.server.mock
+            if mock.latency:
+                time.sleep(mock.latency)
+            parts = urlsplit(self.path)
+            if not parts.path.startswith('/api/v1/'):
+                self.send_json(404, {"status": "error", "messages": "Not found"})
+                return None
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                self.send_json(401, {"status": "error", "messages": "Unauthorized"})
+                return None
+            if mock.throttled():
+                self.send_json(429, {"status": "error", "messages": "Too Many Requests"}, {"Retry-After": "1"})
+                return None
+            return parts.path[len('/api/v1/'):].strip('/'), parse_qs(parts.query)
+        
+        def do_GET(self):
+            routed = self.route()
+            if routed is not None:
+                self.send_json(200, self.server.mock.list(*routed))
+        
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            routed = self.route()
+            if routed is not None:
+                self.send_json(*self.server.mock.create(routed[0], json.loads(body or b'{}')))
+        
+        def do_DELETE(self):
+            routed = self.route()
+            if routed is not None:
+                endpoint, _, record_id = routed[0].rpartition('/')
+                if record_id.isdigit():
+                    self.send_json(*self.server.mock.delete(endpoint, int(record_id)))
+                else:
+                    self.send_json(405, {"status": "error", "messages": "Method not allowed"})
+        
+        def log_message(self, format, *args):
+            pass
+    
+    _MockHandler = Handler
+    return _MockHandler
+
+# Columns whose values must be unique (asset_tag, username), per asset type
+UNIQUE_COLUMNS = {'assets': 'Asset Tag', 'users': 'Username'}
+
+def check_push(file_path: str, asset_type: str = 'assets') -> bool:
+    """Push a converted CSV file to a local MockSnipeIT three times and check the counts"""
+    with load_tool('encoding-converter.py').open_text(file_path, encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [row for row in reader if any(value.strip() for value in row)]
+    names = [name.strip().lower() for name in header]
+    unique = UNIQUE_COLUMNS.get(asset_type, '').lower()
+    unique_position = names.index(unique) if unique in names else None
+    duplicates = len(rows) if unique_position is not None else 0
+    
+    failures = []
+    
+    def expect(label: str, actual, expected) -> None:
+        if actual == expected:
+            print(f"  ✓ {label}: {actual}")
+        else:
+            print(f"  ✗ {label}: {actual} (expected {expected})")
+            failures.append(label)
+    
+    server = MockSnipeIT(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            args = argparse.Namespace(url=server.url, token='check', type=asset_type, concurrency=4, retries=2,
+                                      no_create=False, default_status='Ready to Deploy',
+                                      id_cache=os.path.join(directory, 'api-ids.json'))
+            first = push_files([file_path], args)[0]
+            print("First push, empty server:")
+            expect("rows created", first.created, len(rows))
+            expect("rows failed", first.failed, 0)
+            expect("reference errors", first.reference_errors, [])
+            
+            second = push_files([file_path], args)[0]
+            print("Second push, same rows:")
+            expect("rows created", second.created, len(rows) - duplicates)
+            expect("rows rejected as duplicates", second.failed, duplicates)
+            expect("related records created", second.references_created, {})
+            
+            client = SnipeITClient(server.url, 'check')
+            try:
+                for endpoint in first.references_created:
+                    for record in list(client.iter_rows(endpoint)):
+                        client.request('DELETE', f"{endpoint}/{record['id']}")
+            finally:
+                client.close()
+            retagged = os.path.join(directory, 'check_converted.csv')
+            with open(retagged, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for row in rows:
+                    if unique_position is not None and unique_position < len(row):
+                        row = row[:unique_position] + [row[unique_position] + '-2'] + row[unique_position + 1:]
+                    writer.writerow(row)
+            third = push_files([retagged], args)[0]
+            print("Third push, related records deleted:")
+            expect("rows created", third.created, len(rows))
+            expect("rows failed", third.failed, 0)
+            expect("related records re-created", third.references_created, first.references_created)
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    print(f"Push check {'failed' if failures else 'passed'} ({server.stats['requests']} requests)")
+    return not failures
+
+def main():
+    """Main function for command line interface"""
+    parser = argparse.ArgumentParser(
+        description='Push converted CSV files to Snipe-IT through its REST API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  export SNIPEIT_API_TOKEN=...
+  python snipeit-push.py push assets_converted.csv --url https://snipeit.example.com
+  python snipeit-push.py push users_converted.csv --url https://snipeit.example.com --type users
+  python snipeit-push.py push assets_converted.csv --url https://snipeit.example.com --concurrency 8
+  python snipeit-push.py mock --port 8765 --rate-limit 20
+  python snipeit-push.py push assets_converted.csv --url http://127.0.0.1:8765 --token test
+  python snipeit-push.py check sample_csvs/assets-sample.csv
+        """
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    # Push command
+    push_parser = subparsers.add_parser('push', help='Create the rows of converted CSV files through the API')
+    push_parser.add_argument('files', nargs='+', help='Converted CSV files (English headers, UTF-8)')
+    add_push_arguments(push_parser)
+    
+    # Mock command
+    mock_parser = subparsers.add_parser('mock', help='Run a local mock of the Snipe-IT API for trying push')
+    mock_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    mock_parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    mock_parser.add_argument('--rate-limit', type=int, default=0,
+                             help='Answer requests beyond this many per second with 429 (default: no limit)')
+    mock_parser.add_argument('--latency', type=float, default=0.0, help='Seconds to delay every response')
+    
+    # Check command
+    check_parser = subparsers.add_parser('check', help='Push a converted CSV file to a local mock and check the counts')
+    check_parser.add_argument('file', nargs='?',
+                              default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_csvs',
+                                                   'assets-sample.csv'),
+                              help='Converted CSV file (default: sample_csvs/assets-sample.csv)')
+    check_parser.add_argument('--type', choices=list(ENDPOINTS), default='assets', help='Asset type (default: assets)')
+    
+    args = parser.parse_args()
+    
+    if not args.command:
+        parser.print_help()
+        return
+    
+    if args.command == 'push':
+        results = push_files(args.files, args)
+        for result in results:
+            print(result.render())
+        if any(result.failed or result.reference_errors for result in results):
+            sys.exit(1)
+    
+    elif args.command == 'mock':
+        server = MockSnipeIT((args.host, args.port), args.rate_limit, args.latency)
+        print(f"Mock Snipe-IT API listening on http://{args.host}:{args.port}/api/v1/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            print(f"Requests: {server.stats['requests']}, created: {server.stats['created']}, "
+                  f"throttled: {server.stats['throttled']}")
+    
+    elif args.command == 'check':
+        if not check_push(args.file, args.type):
+            sys.exit(1)
+
+def add_push_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of a push to a command (shared with batch-convert.py)"""
+    parser.add_argument('--url', required=True, help='Snipe-IT base URL, e.g. https://snipeit.example.com')
+    parser.add_argument('--token', help='API token (default: $SNIPEIT_API_TOKEN)')
+    parser.add_argument('--type', choices=list(ENDPOINTS), default='assets', help='Asset type (default: assets)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Parallel requests and pooled connections (default: 4)')
+    parser.add_argument('--retries', type=int, default=5,
+                        help='Retries of throttled or failed requests (default: 5)')
+    parser.add_argument('--no-create', action='store_true',
+                        help='Fail rows naming categories, manufacturers, etc. that do not exist instead of creating them')
+    parser.add_argument('--default-status', default='Ready to Deploy',
+                        help="Status label of assets without a Status (default: 'Ready to Deploy')")
+    parser.add_argument('--id-cache', help=f'ID cache file (default: $SNIPEIT_API_ID_CACHE or {DEFAULT_ID_CACHE_FILE})')
+
+def push_files(files: List[str], args) -> List[PushResult]:
+    """Push files with the options added by add_push_arguments"""
+    token = args.token or os.environ.get('SNIPEIT_API_TOKEN')
+    if not token:
+        raise SystemExit("Error: no API token; pass --token or set SNIPEIT_API_TOKEN")
+    client = SnipeITClient(args.url, token, args.concurrency, args.retries)
+    resolver = IDResolver(client, args.id_cache, create_missing=not args.no_create)
+    pusher = CSVPusher(client, resolver, args.type, args.concurrency, args.default_status)
+    try:
+        results = []
+        for file_path in files:
+            print(f"Pushing {file_path} to {client.base_url}/api/v1/{pusher.endpoint}...")
+            try:
+                results.append(pusher.push_file(file_path))
+            except UnicodeDecodeError:
+                raise SystemExit(f"Error: {file_path} is not UTF-8; convert it with csv-field-converter.py first")
+        return results
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Chunked, passthrough and delta conversion of csv-field-converter.py"""
+
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from tools import REPO_DIR, load_tool
+
+converter_tools = load_tool('csv-field-converter.py')
+
+HEADER = ['资产名称', '类别', '制造商', '状态', '资产标签', '购买日期', '购买成本', '备注']
+
+
+def asset_rows(count: int, notes: str = '多行\n备注, 含逗号 "引号"') -> list:
+    """Rows for HEADER, every one with a quoted multi-line note"""
+    return [[f'电脑{i}', '笔记本电脑', '戴尔', '可部署', f'A{i:06d}', '2024-01-02', '1,200.50', f'{notes} {i}']
+            for i in range(count)]
+
+
+def csv_bytes(rows: list, line_terminator: str = '\r\n', encoding: str = 'utf-8') -> bytes:
+    buffer = io.StringIO(newline='')
+    csv.writer(buffer, lineterminator=line_terminator).writerows(rows)
+    return buffer.getvalue().encode(encoding)
+
+
+class ConverterTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        self.converter = converter_tools.CSVFieldConverter(
+            os.path.join(REPO_DIR, 'chinese-field-mapping.json'), mapping_cache=False)
+    
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+    
+    def read(self, path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def convert(self, input_file: str, **options) -> bytes:
+        output_file = f"{input_file}.out"
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.converter.convert_csv_result(input_file, output_file, **options)
+        self.assertTrue(result.success, result.message)
+        return self.read(output_file)
+
+
+class ChunkBoundaryTest(ConverterTestCase):
+    
+    def test_boundaries_skip_newlines_in_quoted_fields(self):
+        data = csv_bytes([HEADER] + asset_rows(50))
+        path = self.write('notes.csv', data)
+        expected = list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+        # Tiny blocks make quoted fields straddle block reads as well as chunk targets
+        for chunk_size, block_size in ((1, 7), (40, 16), (100, 1 << 20)):
+            boundaries = converter_tools.record_boundaries(path, 0, chunk_size, block_size=block_size)
+            self.assertEqual(boundaries[-1], len(data))
+            rows = []
+            for start, end in zip(boundaries, boundaries[1:]):
+                rows.extend(csv.reader(io.StringIO(data[start:end].decode('utf-8'), newline='')))
+            self.assertEqual(rows, expected, f"chunk_size={chunk_size} block_size={block_size}")
+    
+    def test_parallel_output_matches_single_process(self):
+        # Long notes put a quoted newline across most 64 KiB chunk boundaries
+        path = self.write('big.csv', csv_bytes([HEADER] + asset_rows(2000, '说明\n' * 40), encoding='gbk'))
+        single = self.convert(path, encoding='gbk')
+        parallel_file = os.path.join(self.dir, 'parallel.csv')
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.converter.convert_csv_parallel_result(path, parallel_file, encoding='gbk', jobs=2,
+                                                                chunk_size=64 * 1024)
+        self.assertTrue(result.success, result.message)
+        self.assertEqual(self.read(parallel_file), single)
+        self.assertEqual(result.rows, 2001)
+
+
+class LineEndingTest(ConverterTestCase):
+    
+    def test_crlf_and_lf_files_convert_alike(self):
+        rows = [HEADER] + asset_rows(20)
+        crlf = self.convert(self.write('crlf.csv', csv_bytes(rows, '\r\n')))
+        lf = self.convert(self.write('lf.csv', csv_bytes(rows, '\n')))
+        self.assertEqual(crlf, lf)
+        self.assertTrue(crlf.endswith(b'\r\n'))
+    
+    def test_lf_boundaries_match_crlf(self):
+        rows = [HEADER] + asset_rows(30)
+        for line_terminator in ('\r\n', '\n'):
+            data = csv_bytes(rows, line_terminator)
+            path = self.write('endings.csv', data)
+            boundaries = converter_tools.record_boundaries(path, 0, 1)
+            self.assertEqual(len(boundaries), len(rows) + 1)
+            for boundary in boundaries[1:]:
+                self.assertTrue(data[:boundary].endswith(line_terminator.encode()))
+
+
+class PassthroughTest(ConverterTestCase):
+    
+    def canonical(self) -> bytes:
+        """A converted file, which is already what convert_csv would write"""
+        return self.convert(self.write('source.csv', csv_bytes([HEADER] + asset_rows(200))))
+    
+    def test_converted_output_passes_through(self):
+        data = self.canonical()
+        self.assertTrue(converter_tools.is_canonical_csv(data, *self.converter.passthrough_screen()))
+        self.assertTrue(self.converter.is_passthrough(self.write('clean.csv', data)))
+    
+    def test_near_canonical_files_are_converted(self):
+        data = self.canonical()
+        lines = data.split(b'\r\n')
+        middle = len(lines) // 2
+        
+        def with_line(line: bytes) -> bytes:
+            return b'\r\n'.join(lines[:middle] + [line] + lines[middle + 1:])
+        
+        variants = {
+            "lf line endings": data.replace(b'\r\n', b'\n'),
+            "no final line break": data[:-2],
+            "bom": b'\xef\xbb\xbf' + data,
+            "needless quotes": with_line(b'"PC",Laptop,Dell,Ready to Deploy,B1,2024-01-02,1200,x'),
+            "padded quoted value": with_line(b'PC,Laptop,"Dell ",Ready to Deploy,B1,2024-01-02,1200,"a,b"'),
+            "padded value": with_line(b'PC ,Laptop,Dell,Ready to Deploy,B1,2024-01-02,1200,x'),
+            "ideographic space": with_line('PC,Laptop,Dell,Ready to Deploy,B1,2024-01-02,1200,x　'.encode()),
+            "untranslated status": with_line('PC,Laptop,Dell,可部署,B1,2024-01-02,1200,x'.encode()),
+            "quoted empty field": with_line(b'PC,Laptop,Dell,Ready to Deploy,"",2024-01-02,1200,x'),
+            "stray quote": with_line(b'PC,Lap"top,Dell,Ready to Deploy,B1,2024-01-02,1200,x'),
+        }
+        screen = self.converter.passthrough_screen()
+        for name, variant in variants.items():
+            with self.subTest(name):
+                path = self.write('variant.csv', variant)
+                self.assertNotEqual(self.convert(path, fast_path=False), variant)
+                if name != "bom":
+                    # A BOM is rejected with the sampled head, before the byte screen
+                    self.assertFalse(converter_tools.is_canonical_csv(variant, *screen))
+                self.assertFalse(self.converter.is_passthrough(path))
+
+
+class DeltaTest(ConverterTestCase):
+    
+    def test_second_run_writes_changed_and_added_rows(self):
+        index_file = os.path.join(self.dir, 'delta.idx')
+        rows = [HEADER] + asset_rows(10)
+        path = self.write('export.csv', csv_bytes(rows))
+        first = self.convert(path, delta=converter_tools.DeltaIndex(index_file))
+        self.assertEqual(len(list(csv.reader(io.StringIO(first.decode('utf-8'), newline='')))), 11)
+        
+        rows[3][3] = '已部署'
+        rows[7][1] = '台式机'
+        del rows[5]
+        rows.append(['新电脑', '笔记本', '苹果', '可部署', 'A999999', '2024-05-06', '9,999.00', '新增'])
+        self.write('export.csv', csv_bytes(rows))
+        delta = converter_tools.DeltaIndex(index_file)
+        second = list(csv.reader(io.StringIO(self.convert(path, delta=delta).decode('utf-8'), newline='')))
+        
+        self.assertEqual([row[4] for row in second[1:]], ['A000002', 'A000006', 'A999999'])
+        self.assertEqual(second[1][3], 'Deployed')
+        self.assertEqual(second[2][1], 'Desktop')
+        self.assertEqual(second[3][2], 'Apple')
+        self.assertEqual({key: delta.stats[key] for key in ('new', 'changed', 'unchanged', 'removed')},
+                         {"new": 1, "changed": 2, "unchanged": 7, "removed": 1})
+        
+        # Nothing changed since: only the header is written
+        third = self.convert(path, delta=converter_tools.DeltaIndex(index_file))
+        self.assertEqual(third.count(b'\r\n'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
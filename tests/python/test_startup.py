@@ -0,0 +1,51 @@
+"""Startup budget of the command line tools"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+from tools import REPO_DIR, load_tool
+
+# Run in a fresh interpreter: which modules `batch-convert.py <argv>` has imported once argparse is done
+BATCH_IMPORT_CHECK = """
+import json, sys
+sys.path.insert(0, 'tests/python')
+from tools import load_tool
+batch = load_tool('batch-convert.py')
+sys.argv = ['batch-convert.py'] + sys.argv[1:]
+try:
+    batch.main()
+except SystemExit:
+    pass
+print(json.dumps({name: name in sys.modules for name in ('asyncio', 'snipeit_push')}), file=sys.stderr)
+"""
+
+
+class StartupBudgetTest(unittest.TestCase):
+    
+    def test_commands_within_budget(self):
+        runner = load_tool('benchmark-convert.py').BenchmarkRunner(
+            os.path.join(REPO_DIR, 'chinese-field-mapping.json'), os.path.join(REPO_DIR, 'sample_csvs'))
+        report = runner.run_startup(runs=5)
+        over = [result for result in report["results"] if not result["within_budget"]]
+        self.assertEqual(over, [], f"over the {report['meta']['budget_ms']} ms budget")
+        self.assertEqual(report["eager_loads"], [])
+        self.assertIsNone(report["lazy_import_error"])
+    
+    def loaded_modules(self, *argv: str) -> dict:
+        check = subprocess.run([sys.executable, '-c', BATCH_IMPORT_CHECK, *argv], cwd=REPO_DIR,
+                               capture_output=True, text=True)
+        return json.loads(check.stderr.strip().splitlines()[-1])
+    
+    def test_batch_help_skips_push_and_asyncio(self):
+        self.assertEqual(self.loaded_modules('--help'), {"asyncio": False, "snipeit_push": False})
+        self.assertEqual(self.loaded_modules('process', '--help'), {"asyncio": False, "snipeit_push": False})
+    
+    def test_push_loads_push_module(self):
+        self.assertTrue(self.loaded_modules('push', '--help')["snipeit_push"])
+
+
+if __name__ == '__main__':
+    unittest.main()
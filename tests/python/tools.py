@@ -0,0 +1,14 @@
+"""Load the converter scripts at the repository root as modules"""
+
+import importlib.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The tools load each other through encoding-converter.py's load_tool
+if 'encoding_converter' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location('encoding_converter', os.path.join(REPO_DIR, 'encoding-converter.py'))
+    sys.modules['encoding_converter'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['encoding_converter'])
+load_tool = sys.modules['encoding_converter'].load_tool